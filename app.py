@@ -1,12 +1,23 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
+import json
 import os
 import numpy as np
 from models.squad_simulation import run_simulation
-import pprint
-
-pp = pprint.PrettyPrinter(indent=4)
+from models.monte_carlo import run_adaptive, run_monte_carlo, summarize_run
+from models.jobs import JobQueue, expand_spec
+from models.result_cache import ResultCache, cache_key, default_max_bytes, default_max_disk_bytes
+from models.serialization import binary_mimetype, dumps, pack, pack_simulation
+from models.sweep import stream_sweep
 
 app = Flask(__name__)
+job_queue = JobQueue()
+# Seeded results are deterministic, so repeated requests are served from here. Point
+# SQUAD_CACHE_DIR at a shared directory to share results between server processes.
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get("SQUAD_CACHE_BYTES", default_max_bytes)),
+    directory=os.environ.get("SQUAD_CACHE_DIR") or None,
+    max_disk_bytes=int(os.environ.get("SQUAD_CACHE_DISK_BYTES", default_max_disk_bytes)),
+)
 
 def load_html(filename):
     html_path = os.path.join(os.path.dirname(__file__), f"view/{filename}")
@@ -17,6 +28,34 @@ def load_html(filename):
 def landing():
     return load_html("landing.html")
 
+def read_config_overrides(params):
+    """ Adds the request's config overrides, a JSON object in the config query parameter, to params.
+    They apply to this request only; see models.config.merge_config."""
+    overrides = request.args.get("config")
+    if overrides:
+        try:
+            params["config_overrides"] = json.loads(overrides)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"config is not valid JSON: {error}")
+    return params
+
+def cached_response(kind, params, options, compute):
+    """ Response for compute(), which returns (mimetype, body bytes), through result_cache.
+    Requests without a seed are random, so they are always computed. The X-Cache header says which
+    happened. A ValueError from compute becomes a 400."""
+    try:
+        if options.get("seed") is None:
+            mimetype, body = compute()
+            status = "bypass"
+        else:
+            mimetype, body, hit = result_cache.get_or_compute(cache_key(kind, params, **options), compute)
+            status = "hit" if hit else "miss"
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    response = Response(body, mimetype=mimetype)
+    response.headers["X-Cache"] = status
+    return response
+
 @app.route("/simulation")
 def simulation_page():
     return load_html("simulation.html")
@@ -37,9 +76,27 @@ def run_simulation_endpoint():
         "environment": environment,
         "map_size": map_size
     }
-    results = run_simulation(params, full_log=True)
-    #pp.pprint(results)
-    return jsonify(results)
+    # Replays a run exactly when the same seed is passed again.
+    seed = request.args.get("seed", type=int)
+    # Map view decimation: keep every k-th minute, plus any minute with the listed events.
+    record_every = request.args.get("record_every", 1, type=int)
+    record_events = sorted({event for event in request.args.get("record_events", "").split(",") if event})
+    binary = request.args.get("format") == "binary"
+    try:
+        read_config_overrides(params)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    def compute():
+        results = run_simulation(params, full_log=True, rng=seed,
+                                 record_every=record_every, record_events=record_events)
+        # format=binary sends the trajectory as raw float32 arrays; see models/serialization.py.
+        if binary:
+            return binary_mimetype, pack_simulation(results)
+        return "application/json", dumps(results).encode("utf-8")
+
+    options = {"seed": seed, "record_every": record_every, "record_events": record_events, "binary": binary}
+    return cached_response("run_simulation", params, options, compute)
 
 @app.route("/monte_carlo")
 def monte_carlo_page():
@@ -60,24 +117,109 @@ def run_monte_carlo_endpoint():
         "armor_type": armor_type,
         "environment": environment
     }
-    results = []
-    for _ in range(num_runs):
-        sim_result = run_simulation(params, full_log=False)
-        results.append(sim_result)
-    squad_exhaustion = [r['blue']['exhaustion'] for r in results]
-    distance_traveled = [r['blue']['patrol_distance'] for r in results]  # or the correct field
-    blue_kills = [r['blue']['kills'] for r in results]
-    red_kills = [r['red']['kills'] for r in results]
-    
-    return jsonify({
-        "num_runs": num_runs,
-        "patrol_distance": distance_traveled,
-        "blue_kills": blue_kills,
-        "red_kills": red_kills,
-        "squad_exhaustion": squad_exhaustion,
-        "distance_traveled": distance_traveled,
-        "all_results": results
-    })
+    seed = request.args.get("seed", type=int)
+    workers = request.args.get("workers", type=int)
+    raw = request.args.get("raw", "false").lower() in ("1", "true", "yes")
+    # With rel_half_width set, num_runs is a cap and the run stops once every metric has converged.
+    rel_half_width = request.args.get("rel_half_width", type=float)
+    confidence = request.args.get("confidence", 0.95, type=float) if rel_half_width is not None else None
+    binary = raw and request.args.get("format") == "binary"
+    try:
+        read_config_overrides(params)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    def compute():
+        if rel_half_width is not None:
+            monte_carlo = run_adaptive(params, num_runs, rel_half_width=rel_half_width, confidence=confidence,
+                                       seed=seed, max_workers=workers, raw=raw)
+        else:
+            monte_carlo = run_monte_carlo(params, num_runs, seed=seed, max_workers=workers, raw=raw)
+        response = {
+            "num_runs": num_runs,
+            "runs_used": monte_carlo['runs_completed'],
+            "seed": monte_carlo['seed'],
+            "aggregates": monte_carlo['aggregate'].to_dict()
+        }
+        if rel_half_width is not None:
+            response["converged"] = monte_carlo['converged']
+            response["half_widths"] = monte_carlo['half_widths']
+        if raw:
+            # Per-run rows are opt-in because they grow with num_runs.
+            runs = [summarize_run(r) for r in monte_carlo['results']]
+            if binary:
+                # One array per metric instead of one object per run.
+                columns = {f"runs.{metric}": np.array([run[metric] for run in runs]) for metric in (runs[0] if runs else {})}
+                return binary_mimetype, pack(response, columns)
+            response["runs"] = runs
+        return "application/json", dumps(response).encode("utf-8")
+
+    # Results do not depend on the worker count, so workers is not part of the key.
+    options = {"seed": seed, "num_runs": num_runs, "raw": raw, "binary": binary,
+               "rel_half_width": rel_half_width, "confidence": confidence}
+    return cached_response("run_monte_carlo", params, options, compute)
+
+@app.route("/stream_sweep")
+def stream_sweep_endpoint():
+    """ Monte Carlo over an armor type x environment grid, streamed as NDJSON while it runs.
+    armor_type and environment may each be repeated and default to everything in the config. The
+    stream is a 'start' line with the cells and seed, one 'progress' line with a cell's running
+    aggregates (stats, histograms, quantiles) after every chunk_size replications of that cell, and
+    an 'end' line.
+    """
+    params = {
+        "blue_stock": int(request.args.get("blue_stock", 10)),
+        "red_stock": int(request.args.get("red_stock", 10)),
+        "direction_deviation": int(request.args.get("direction_deviation", 10)),
+    }
+    num_runs = int(request.args.get("num_runs", 1000))
+    chunk_size = int(request.args.get("chunk_size", 250))
+    workers = request.args.get("workers", type=int)
+    seed = request.args.get("seed", type=int)
+    if seed is None:
+        # Fixed up front and reported, so a stream can be replayed.
+        seed = np.random.SeedSequence().entropy
+    try:
+        read_config_overrides(params)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+        cells = expand_spec({"type": "sweep", "params": params, "num_runs": num_runs,
+                             "armor_types": request.args.getlist("armor_type"),
+                             "environments": request.args.getlist("environment")})
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    def lines():
+        yield dumps({"type": "start", "seed": seed, "num_runs": num_runs,
+                     "cells": [{"armor_type": c["armor_type"], "environment": c["environment"]} for c in cells]}) + "\n"
+        for cell, aggregate in stream_sweep(cells, num_runs, seed, max_workers=workers, chunk_size=chunk_size):
+            yield dumps({"type": "progress", "cell": cell, "runs_completed": aggregate.count,
+                         "aggregates": aggregate.to_dict()}) + "\n"
+        yield dumps({"type": "end", "runs_completed": num_runs * len(cells)}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+@app.route("/jobs", methods=["POST"])
+def submit_job_endpoint():
+    spec = request.get_json(silent=True) or {}
+    try:
+        job = job_queue.submit(spec)
+    except (ValueError, TypeError) as error:
+        return jsonify({"error": str(error)}), 400
+    return jsonify(job.to_dict()), 202
+
+@app.route("/jobs/<job_id>")
+def job_status_endpoint(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job_endpoint(job_id):
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job_queue.get(job_id).to_dict())
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from statistics import mean, median
+
+import numpy as np
+
+# Run from the repository root as `python -m benchmarks.suite`.
+import app as web
+from app import app
+from models.blue_patrol import Patrol
+from models.monte_carlo import run_monte_carlo
+from models.red_patrol import spawn_red_patrol
+from models.result_cache import ResultCache
+from models.rng import make_streams
+from models.scenario import Scenario
+from models.serialization import dumps
+from models.squad_simulation import attack_resolvers, make_json_safe, run_simulation
+
+# Representative scenario: a full squad against a larger red force in the default environment.
+benchmark_params = {
+    "blue_stock": 10,
+    "red_stock": 40,
+    "direction_deviation": 10,
+    "armor_type": "Basilone Ballistic Insert",
+    "environment": "Krulak’s Three Block War",
+    "map_size": 2000,
+}
+
+benchmark_seed = 2025
+
+# A ratio of current to baseline time above 1 + this is reported as a regression.
+default_tolerance = 0.10
+
+# name -> (group, setup). setup(quick) returns (callable, operations per call, unit).
+cases = {}
+
+
+def benchmark(name, group):
+    """ Registers a setup function as a benchmark case."""
+    def register(setup):
+        cases[name] = (group, setup)
+        return setup
+    return register
+
+
+def _patrol(full_log=False):
+    patrol = Patrol(benchmark_params, full_log=full_log, rng=benchmark_seed)
+    patrol.update_patrol_time(30)
+    patrol.step(benchmark_params["direction_deviation"])
+    return patrol
+
+
+@benchmark('patrol.move', 'micro')
+def _patrol_move(quick):
+    patrol = _patrol()
+    calls = 200 if quick else 2000
+    def run():
+        for _ in range(calls):
+            patrol.move(60, benchmark_params["direction_deviation"])
+    return run, calls, 'moves'
+
+
+@benchmark('patrol.set_exhaustion', 'micro')
+def _patrol_set_exhaustion(quick):
+    patrol = _patrol(full_log=True)
+    calls = 200 if quick else 2000
+    def run():
+        for _ in range(calls):
+            patrol.set_exhaustion()
+    return run, calls, 'calls'
+
+
+def _volleys(resolver, quick):
+    scenario = Scenario(benchmark_params)
+    streams = make_streams(benchmark_seed)
+    blue = _patrol()
+    red = spawn_red_patrol(benchmark_params, 0, rng=streams.red)
+    attack = attack_resolvers[resolver]
+    calls = 50 if quick else 500
+    def run():
+        for _ in range(calls):
+            attack(blue, red, benchmark_params["environment"], benchmark_params["armor_type"], 300,
+                   scenario=scenario, rng=streams.combat)
+    return run, calls, 'volleys'
+
+
+@benchmark('attack.per_shot', 'micro')
+def _attack_per_shot(quick):
+    return _volleys('per_shot', quick)
+
+
+@benchmark('attack.binomial', 'micro')
+def _attack_binomial(quick):
+    return _volleys('binomial', quick)
+
+
+def _full_result():
+    return run_simulation(benchmark_params, full_log=True, rng=benchmark_seed)
+
+
+@benchmark('make_json_safe', 'micro')
+def _make_json_safe(quick):
+    result = _full_result()
+    calls = 5 if quick else 50
+    def run():
+        for _ in range(calls):
+            make_json_safe(result)
+    return run, calls, 'results'
+
+
+@benchmark('serialization.dumps', 'micro')
+def _dumps(quick):
+    result = _full_result()
+    calls = 5 if quick else 50
+    def run():
+        for _ in range(calls):
+            dumps(result)
+    return run, calls, 'results'
+
+
+@benchmark('run_simulation.full_log', 'simulation')
+def _run_simulation_full_log(quick):
+    runs = 3 if quick else 20
+    def run():
+        for seed in range(runs):
+            run_simulation(benchmark_params, full_log=True, rng=benchmark_seed + seed)
+    return run, runs, 'runs'
+
+
+@benchmark('run_simulation.summary', 'simulation')
+def _run_simulation_summary(quick):
+    runs = 3 if quick else 20
+    def run():
+        for seed in range(runs):
+            run_simulation(benchmark_params, full_log=False, rng=benchmark_seed + seed)
+    return run, runs, 'runs'
+
+
+@benchmark('monte_carlo', 'throughput')
+def _monte_carlo(quick):
+    runs = 200 if quick else 2000
+    # One worker so the figure measures the engine, not the machine's core count.
+    def run():
+        run_monte_carlo(benchmark_params, runs, seed=benchmark_seed, max_workers=1)
+    return run, runs, 'runs'
+
+
+def _query(**extra):
+    return "&".join(f"{key}={value}" for key, value in {**benchmark_params, **extra}.items())
+
+
+def _with_cache(cache, run):
+    """ Wraps run so the app serves through cache while it runs, restoring the app's own cache after."""
+    def wrapped():
+        original = web.result_cache
+        web.result_cache = cache
+        try:
+            run()
+        finally:
+            web.result_cache = original
+    return wrapped
+
+
+@benchmark('http.run_simulation', 'http')
+def _http_run_simulation(quick):
+    client = app.test_client()
+    requests = 3 if quick else 20
+    def run():
+        for seed in range(requests):
+            response = client.get(f"/run_simulation?{_query(seed=benchmark_seed + seed)}")
+            assert response.status_code == 200, response.data
+    # The endpoints cache seeded results; a zero byte cache makes every request compute.
+    return _with_cache(ResultCache(max_bytes=0), run), requests, 'requests'
+
+
+@benchmark('http.run_monte_carlo', 'http')
+def _http_run_monte_carlo(quick):
+    client = app.test_client()
+    requests = 2 if quick else 10
+    def run():
+        for seed in range(requests):
+            response = client.get(f"/run_monte_carlo?{_query(num_runs=100, workers=1, seed=benchmark_seed + seed)}")
+            assert response.status_code == 200, response.data
+    return _with_cache(ResultCache(max_bytes=0), run), requests, 'requests'
+
+
+@benchmark('http.run_monte_carlo.cached', 'http')
+def _http_run_monte_carlo_cached(quick):
+    client = app.test_client()
+    url = f"/run_monte_carlo?{_query(num_runs=2000, workers=1, seed=benchmark_seed)}"
+    requests = 20 if quick else 200
+    def run():
+        for _ in range(requests):
+            response = client.get(url)
+            assert response.status_code == 200, response.data
+    # A cache of its own, warmed by the untimed first call.
+    return _with_cache(ResultCache(), run), requests, 'requests'
+
+
+def time_case(name, repeat=5, quick=False):
+    """ Times one registered case.
+    The callable runs once untimed to warm caches, then repeat times.
+    Args:
+        name (str): Key in cases.
+        repeat (int): Timed repetitions.
+        quick (bool): Use the smaller workload of every case.
+    Returns:
+        dict: Group, unit, operations per repetition, every repetition's time (s) and summary figures."""
+    group, setup = cases[name]
+    run, operations, unit = setup(quick)
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'group': group,
+        'unit': unit,
+        'operations': operations,
+        'times': times,
+        'min': best,
+        'median': median(times),
+        'mean': mean(times),
+        'per_operation': best / operations,
+        'per_second': operations / best,
+    }
+
+
+def run_benchmarks(names=None, repeat=5, quick=False, on_case=None):
+    """ Runs the benchmark suite.
+    Args:
+        names (list | None): Cases to run, or substrings of their names. Defaults to every case.
+        repeat (int): Timed repetitions per case.
+        quick (bool): Use the smaller workload of every case.
+        on_case (callable | None): Called as on_case(name, result) after each case.
+    Returns:
+        dict: 'environment' describing the machine and code, and 'benchmarks' mapping case name to
+            time_case output."""
+    selected = [name for name in cases if not names or any(part in name for part in names)]
+    if names and not selected:
+        raise ValueError(f"No benchmarks match {names}.")
+    results = {}
+    for name in selected:
+        results[name] = time_case(name, repeat, quick)
+        if on_case:
+            on_case(name, results[name])
+    return {
+        'environment': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': benchmark_seed,
+            'repeat': repeat,
+            'quick': quick,
+        },
+        'params': benchmark_params,
+        'benchmarks': results,
+    }
+
+
+def compare(current, baseline, tolerance=default_tolerance):
+    """ Compares two run_benchmarks results case by case on the best time per operation.
+    Args:
+        current (dict): The new results.
+        baseline (dict): Results to compare against.
+        tolerance (float): Slowdown, as a fraction, tolerated before a case counts as a regression.
+    Returns:
+        list: One dict per case present in both, with 'name', 'baseline' and 'current' time per
+            operation (s), their 'ratio' and whether it is a 'regression'."""
+    rows = []
+    for name, result in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        before = baseline['benchmarks'][name]['per_operation']
+        after = result['per_operation']
+        ratio = after / before
+        rows.append({'name': name, 'baseline': before, 'current': after, 'ratio': ratio,
+                     'regression': ratio > 1 + tolerance})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.suite',
+        description='Time the simulation engine and HTTP endpoints and store the results as JSON.'
+    )
+    parser.add_argument('names', nargs='*', help='Run only cases whose name contains one of these.')
+    parser.add_argument('--out', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against the results in this JSON file.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per case.')
+    parser.add_argument('--quick', action='store_true', help='Smaller workloads, for a smoke test.')
+    parser.add_argument('--tolerance', type=float, default=default_tolerance,
+                        help='Slowdown fraction reported as a regression.')
+    args = parser.parse_args(argv)
+
+    def report(name, result):
+        print(f"{name:28} {result['per_operation'] * 1e3:10.4f} ms/op {result['per_second']:12.1f} {result['unit']}/s")
+
+    results = run_benchmarks(args.names, repeat=args.repeat, quick=args.quick, on_case=report)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.out}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['name']:28} {row['ratio']:6.2f}x baseline{flag}")
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import numpy as np
+
+from .scenario import load_tables
+
+# Headline metrics folded for every replication, in the order they appear in summarize_run.
+metrics = ['blue_kills', 'red_kills', 'patrol_distance', 'squad_exhaustion']
+
+# Quantiles reported for every metric.
+reported_quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def _safe(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class RunningStats:
+    """ Welford running mean and variance, with min and max. Mergeable with Chan's parallel update."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        batch = RunningStats()
+        batch.count = values.size
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean)**2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self):
+        """ Sample variance, or nan with fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def half_width(self, z):
+        """ Half-width of the normal confidence interval on the mean, or nan with fewer than two values.
+        Args:
+            z (float): Standard normal quantile for the confidence level, e.g. 1.96 for 95%.
+        Returns:
+            float: z times the standard error of the mean."""
+        return z * np.sqrt(self.variance() / self.count) if self.count > 1 else float('nan')
+
+    def to_dict(self):
+        variance = self.variance()
+        return {
+            'count': self.count,
+            'mean': _safe(self.mean) if self.count else None,
+            'variance': _safe(variance),
+            'std': _safe(np.sqrt(variance)),
+            'min': _safe(self.min),
+            'max': _safe(self.max),
+        }
+
+
+class FixedHistogram:
+    """ Histogram with fixed, equal width bins plus underflow and overflow counts."""
+    def __init__(self, low, high, bins):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, value):
+        self.add_many([value])
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        low, high = self.edges[0], self.edges[-1]
+        self.underflow += int((values < low).sum())
+        self.overflow += int((values > high).sum())
+        inside = values[(values >= low) & (values <= high)]
+        # The top edge belongs to the last bin, as in numpy.histogram.
+        index = np.minimum(np.searchsorted(self.edges, inside, side='right') - 1, len(self.counts) - 1)
+        self.counts += np.bincount(index, minlength=len(self.counts))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def to_dict(self):
+        return {
+            'edges': self.edges.tolist(),
+            'counts': self.counts.tolist(),
+            'underflow': self.underflow,
+            'overflow': self.overflow,
+        }
+
+
+class QuantileSketch:
+    """ Mergeable quantile sketch that keeps at most max_centroids equal weight centroids.
+    Rank error is roughly 1 / max_centroids regardless of how many values are added."""
+    def __init__(self, max_centroids=200):
+        self.max_centroids = max_centroids
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer = []
+
+    def add(self, value):
+        self._buffer.append(value)
+        if len(self._buffer) >= self.max_centroids:
+            self._compress()
+
+    def add_many(self, values):
+        self._buffer.extend(np.asarray(values, dtype=float).tolist())
+        if len(self._buffer) >= self.max_centroids:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self._compress()
+        self.means = np.concatenate((self.means, other.means))
+        self.weights = np.concatenate((self.weights, other.weights))
+        self._compress()
+
+    def _compress(self):
+        means = np.concatenate((self.means, self._buffer))
+        weights = np.concatenate((self.weights, np.ones(len(self._buffer))))
+        self._buffer = []
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        if len(means) > self.max_centroids:
+            # Group neighbours so that every group holds about the same total weight.
+            midpoints = np.cumsum(weights) - weights / 2
+            group = np.minimum((midpoints / weights.sum() * self.max_centroids).astype(int), self.max_centroids - 1)
+            group_weights = np.bincount(group, weights=weights)
+            group_means = np.bincount(group, weights=weights * means)
+            keep = group_weights > 0
+            means, weights = group_means[keep] / group_weights[keep], group_weights[keep]
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        self._compress()
+        if len(self.means) == 0:
+            return float('nan')
+        positions = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return float(np.interp(q, positions, self.means))
+
+
+def histogram_specs(params):
+    """ Fixed histogram ranges for one parameter set, chosen so bins never depend on the data.
+    The ranges cover typical runs, not every possible one; values outside them are counted in each
+    histogram's underflow and overflow, which the Monte Carlo page reports.
+    Returns:
+        dict: metric -> (low, high, bins)."""
+    blue_stock = params['blue_stock']
+    red_stock = params['red_stock']
+    stop_time = load_tables(params.get('config_overrides')).stop_time
+    return {
+        # Ten red patrols' worth of hostiles. Red respawns until stop_time, so long runs can go past it.
+        'blue_kills': (0, 10 * red_stock, 50),
+        # One bin per warfighter
+        'red_kills': (-0.5, blue_stock + 0.5, blue_stock + 1),
+        # 1.4 m/s on paved ground for the whole patrol
+        'patrol_distance': (0, 1.4 * 60 * stop_time, 50),
+        'squad_exhaustion': (0, 1000, 50),
+    }
+
+
+class MonteCarloAggregate:
+    """ Running statistics, fixed bin histograms and quantile sketches for the headline metrics.
+    Memory use does not grow with the number of replications folded in."""
+    def __init__(self, params):
+        self.count = 0
+        self.stats = {metric: RunningStats() for metric in metrics}
+        self.histograms = {metric: FixedHistogram(*spec) for metric, spec in histogram_specs(params).items()}
+        self.sketches = {metric: QuantileSketch() for metric in metrics}
+
+    def add(self, summary):
+        """ Folds in one summarize_run row."""
+        self.add_many([summary])
+
+    def add_many(self, summaries):
+        """ Folds in a list of summarize_run rows."""
+        if not summaries:
+            return
+        self.count += len(summaries)
+        for metric in metrics:
+            values = np.array([s[metric] for s in summaries], dtype=float)
+            self.stats[metric].add_many(values)
+            self.histograms[metric].add_many(values)
+            self.sketches[metric].add_many(values)
+
+    def merge(self, other):
+        self.count += other.count
+        for metric in metrics:
+            self.stats[metric].merge(other.stats[metric])
+            self.histograms[metric].merge(other.histograms[metric])
+            self.sketches[metric].merge(other.sketches[metric])
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'stats': {metric: self.stats[metric].to_dict() for metric in metrics},
+            'histograms': {metric: self.histograms[metric].to_dict() for metric in metrics},
+            'quantiles': {
+                metric: {str(q): _safe(self.sketches[metric].quantile(q)) for q in reported_quantiles}
+                for metric in metrics
+            },
+        }
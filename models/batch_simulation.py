@@ -0,0 +1,212 @@
+import numpy as np
+
+from .movement import bounce_move
+from .rng import make_streams
+from .scenario import Scenario
+from .squad_state import pandolf_santee
+
+
+def _new_red_patrol(stock, position, sim_time):
+    return {
+        'stock': stock,
+        'current_position': position,
+        'stock_history': [(stock, sim_time)],
+        'spawn_time': sim_time,
+        'removal_time': None,
+        'shots': 0,
+        'warfighters_killed': 0,
+    }
+
+
+def run_batch(params, num_runs, rng=None):
+    """ Runs num_runs replications of run_simulation for one parameter set, advancing them all together as arrays.
+    Every replication follows the same rules as run_simulation, but volleys are drawn as binomials, so
+    individual runs are not reproducible against run_simulation.
+    Movement, terrain, encounter and red respawn draws are made for all num_runs rows every minute, so replication i
+    sees the same draws for any params given the same seed (common random numbers across a sweep).
+    Args:
+        params (dict): Simulation parameters, as for run_simulation.
+        num_runs (int): Number of replications.
+        rng: Seed, SeedSequence, numpy Generator or RandomStreams, as for run_simulation.
+            Defaults to fresh entropy.
+    Returns:
+        list: One result dict per replication, shaped like run_simulation(params, full_log=False)."""
+    streams = make_streams(rng)
+    spawn, movement, terrain_rng = streams.spawn, streams.movement, streams.terrain
+    scenario = Scenario(params)
+    if scenario.environment_id is None:
+        raise ValueError("The batch engine needs an environment.")
+    if params.get('red_patrols', 1) != 1 or params.get('red_speed', 0):
+        raise ValueError("The batch engine models one static red patrol; use run_simulation for more.")
+    size = scenario.map_size
+    deviation = params['direction_deviation']
+    blue_stock = params['blue_stock']
+    red_stock = params['red_stock']
+    n = num_runs
+
+    # Red spawns before the blue patrol, as in run_simulation.
+    red_position = spawn.uniform(0, size, (n, 2))
+    red_patrols = [[_new_red_patrol(red_stock, tuple(p), 0)] for p in red_position.tolist()]
+
+    position = spawn.uniform(0, size, (n, 2))
+    start_position = position.copy()
+    direction = spawn.uniform(0, 360, n)
+    change_interval = terrain_rng.integers(0, 10, n)
+    change_counter = np.zeros(n, dtype=int)
+    terrain = terrain_rng.integers(0, len(scenario.terrain_cost), n)
+    grade = terrain_rng.normal(0, 3, n)
+    mass = spawn.normal(76.6571, 11.06765, (n, blue_stock))
+    load = scenario.soldier_load
+    joules = np.zeros((n, blue_stock))
+    slots = np.arange(blue_stock)
+
+    stock = np.full(n, blue_stock)
+    red = np.full(n, red_stock)
+    move_speed = np.zeros(n)
+    exhaustion = np.zeros(n)
+    patrol_distance = np.zeros(n)
+    patrol_time = np.zeros(n, dtype=int)
+    shots = np.zeros(n, dtype=int)
+    hostiles_killed = np.zeros(n, dtype=int)
+    removal_time = np.full(n, np.inf)
+    stock_history = [[[blue_stock, 0]] for _ in range(n)]
+    active = (stock > 0) & (red > 0)
+
+    for sim_time in range(1, scenario.stop_time + 1):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        patrol_time[idx] = sim_time
+        threshold = scenario.exhaustion_threshold_list[sim_time]
+
+        # Full width draws keep row i on the same stream position whether or not other rows are active.
+        step_jitter, move_jitter, bounce_jitter = movement.uniform(-deviation, deviation, (3, n))[:, idx]
+        speed_roll = movement.uniform(0.8, 1.4, n)[idx]
+
+        # Patrol.step: heading jitter, terrain and exhaustion adjusted speed
+        heading = (direction[idx] + step_jitter) % 360
+        speed = speed_roll / scenario.terrain_cost[terrain[idx]]
+        speed *= 1 - exhaustion[idx] / (2 * threshold)
+
+        # Patrol.move
+        heading = (heading + move_jitter) % 360
+        new_position, heading, traveled = bounce_move(position[idx], heading, speed * 60, bounce_jitter, size)
+        position[idx] = new_position
+        direction[idx] = heading
+        patrol_distance[idx] += traveled
+        move_speed[idx] = traveled
+
+        # Patrol._update_terrain
+        grade[idx] = terrain_rng.normal(0, 3, n)[idx]
+        terrain_roll = terrain_rng.integers(1, 101, n)
+        next_interval = terrain_rng.integers(0, 10, n)
+        change = idx[change_counter[idx] >= change_interval[idx]]
+        if change.size:
+            pick = np.searchsorted(scenario.terrain_cdf, terrain_roll[change])
+            # A roll past the last bucket leaves the terrain unchanged.
+            terrain[change] = np.where(pick < len(scenario.terrain_cdf), pick, terrain[change])
+            change_counter[change] = 0
+            change_interval[change] = next_interval[change]
+        change_counter[idx] += 1
+
+        # Combat check against the current red patrol
+        offset = position[idx] - red_position[idx]
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        prob_attack = 1 / np.sqrt(np.where(distance > 0, distance, 1))
+        engaged = (distance <= 1000) & (streams.encounter.random(n)[idx] < prob_attack)
+        # Drawn full width every minute, so a row's respawn position does not depend on other rows' fights.
+        respawn_position = spawn.uniform(0, size, (n, 2))
+
+        fight = idx[engaged]
+        if fight.size:
+            _engage(fight, distance[engaged], sim_time, scenario, streams.combat, stock, red, shots,
+                    hostiles_killed, red_patrols, stock_history)
+            lost = fight[stock[fight] <= 0]
+            removal_time[lost] = sim_time
+            active[lost] = False
+            respawn = fight[(stock[fight] > 0) & (red[fight] <= 0)]
+            if respawn.size:
+                red_position[respawn] = respawn_position[respawn]
+                red[respawn] = red_stock
+                for i, p in zip(respawn.tolist(), red_position[respawn].tolist()):
+                    red_patrols[i][0]['removal_time'] = sim_time
+                    red_patrols[i].insert(0, _new_red_patrol(red_stock, tuple(p), sim_time))
+
+        # Patrol.set_exhaustion for everyone not in combat this minute
+        calm = idx[~engaged]
+        if calm.size:
+            power = pandolf_santee(
+                mass[calm], load, move_speed[calm][:, None], grade[calm][:, None],
+                scenario.terrain_cost[terrain[calm]][:, None]
+            )
+            alive = slots >= (blue_stock - stock[calm])[:, None]
+            joules[calm] += np.where(alive, power * 60, 0)
+            levels = (joules[calm] * 60 / sim_time / 4184) / threshold
+            exhaustion[calm] = (threshold + np.where(alive, levels, 0).sum(axis=1)) / (stock[calm] + 1)
+            spent = calm[exhaustion[calm] >= threshold]
+            removal_time[spent] = sim_time
+            active[spent] = False
+
+    # Every value below is already a plain int, float, list or None, so the results skip make_json_safe.
+    results = []
+    for i in range(n):
+        blue = {
+            'stock': int(stock[i]),
+            'current_position': position[i].tolist(),
+            'direction': float(direction[i]),
+            'spawn_time': 0,
+            'removal_time': int(removal_time[i]) if np.isfinite(removal_time[i]) else None,
+            'position_history': [start_position[i].tolist(), position[i].tolist()],
+            'stock_history': stock_history[i],
+            'exhaustion_data': [[0.0] * blue_stock],
+            'patrol_time': int(patrol_time[i]),
+            'patrol_distance': float(patrol_distance[i]),
+            'shots': int(shots[i]),
+            'hostiles_killed': int(hostiles_killed[i]),
+            'exhaustion': float(exhaustion[i]),
+        }
+        for patrol in red_patrols[i]:
+            patrol['stock_history'] = [list(s) for s in patrol['stock_history']]
+            patrol['current_position'] = list(patrol['current_position'])
+        results.append({
+            'blue': blue,
+            'red': red_patrols[i][0],
+            'red_patrols': red_patrols[i],
+            'combat_log': [],
+        })
+    return results
+
+
+def _engage(fight, distance, sim_time, scenario, rng, stock, red, shots, hostiles_killed, red_patrols, stock_history):
+    """ Resolves one volley for every engaged replication, mirroring _attack in squad_simulation.py."""
+    k = fight.size
+    blue_now = stock[fight]
+    red_now = red[fight]
+    prob_hit = np.exp(-0.005 * distance)
+
+    fire_rates = scenario.fire_rates
+    blue_shots = rng.integers(fire_rates["blue_min"], fire_rates["blue_max"] + 1, k) * blue_now
+    blue_hits = rng.binomial(blue_shots, prob_hit)
+    if scenario.filter_p < 1:
+        blue_hits = rng.binomial(blue_hits, scenario.filter_p)
+    red_casualties = np.minimum(red_now, blue_hits)
+
+    red_shots = rng.integers(fire_rates["red_min"], fire_rates["red_max"] + 1, k) * red_now
+    threat = rng.choice(len(scenario.threat_p), size=k, p=scenario.threat_p)
+    prob_defeat = scenario.defeat_at_distances(threat, distance)
+    red_hits = rng.binomial(red_shots, prob_hit)
+    blue_casualties = np.minimum(blue_now, rng.binomial(red_hits, prob_defeat))
+
+    stock[fight] -= blue_casualties
+    red[fight] -= red_casualties
+    hostiles_killed[fight] += red_casualties
+    shots[fight] = blue_shots
+    for i, blue_left, red_left, killed, fired in zip(
+            fight.tolist(), stock[fight].tolist(), red[fight].tolist(),
+            blue_casualties.tolist(), red_shots.tolist()):
+        stock_history[i].append([blue_left, sim_time])
+        current = red_patrols[i][0]
+        current['stock'] = red_left
+        current['warfighters_killed'] += killed
+        current['shots'] = fired
+        current['stock_history'].append((red_left, sim_time))
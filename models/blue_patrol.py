@@ -1,37 +1,48 @@
 import numpy as np
-from math import dist
-
-# Configure logging
-import logging
-import pprint
-pp = pprint.PrettyPrinter(indent=4)
-logging.basicConfig(
-    filename='simulation.log',        # Log file name
-    level=logging.INFO,               # Log level (INFO, DEBUG, etc.)
-    format='%(asctime)s %(levelname)s: %(message)s'
-)
-
-# Open config file
-import os
-import yaml
-yaml_path = os.path.join(os.path.dirname(__file__), "../config/simulation.yaml")
-with open(yaml_path, "r") as f:
-    config = yaml.safe_load(f)
-armor_profiles = config["armor_profiles"]
-map_size = config["map_size"]
-terrain_library = config["terrain_library"]
+
+from bisect import bisect_left
+
+from .config import load_config
+from .movement import bounce_step
+from .rng import make_streams
+from .scenario import Scenario
+from .squad_state import SquadState, exhaustion_threshold, pandolf_santee_terms
+from .trace import DEBUG, null_tracer
+from .trajectory import TrajectoryRecorder
+
+def __getattr__(name):
+    # Config sections are read from the cached config on access. A patrol's own map size is
+    # Patrol.map_size, from its scenario.
+    if name in ('armor_profiles', 'map_size', 'terrain_library'):
+        return load_config()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class Patrol:
-    def __init__(self, params, full_log=True):
-        global map_size
+    def __init__(self, params, full_log=True, tracer=None, scenario=None, rng=None, record_every=1, record_events=()):
+        """
+        With full_log set, position, terrain and exhaustion are kept in a TrajectoryRecorder sized by the
+        scenario stop_time; record_every and record_events set its decimation. Without it only the spawn
+        point and the current position are kept.
+        """
         self.full_log = full_log
-        map_size = params.get("map_size", map_size)
+        # Compiled config tables; raises ValueError for an unknown armor type.
+        self.scenario = scenario or Scenario(params)
+        self._terrain_cost = self.scenario.terrain_cost_list
+        self._thresholds = self.scenario.exhaustion_threshold_list
+        self.tracer = tracer or null_tracer
+        # Checked once here so disabled tracing costs nothing per step.
+        self._trace_debug = self.tracer.enabled(DEBUG)
+        # Seed, Generator or RandomStreams; every draw the patrol makes goes through these streams.
+        self.rng = make_streams(rng)
+        spawn = self.rng.spawn
+        # Per patrol, so runs with different map sizes can share a process or a thread pool.
+        self.map_size = self.scenario.map_size
         self.current_position = [
-            np.random.uniform(0, map_size), 
-            np.random.uniform(0, map_size)
+            spawn.uniform(0, self.map_size),
+            spawn.uniform(0, self.map_size)
         ]
-        self.position_history = [self.current_position]
-        self.direction = np.random.uniform(0, 360)
+        self._start_position = self.current_position
+        self.direction = spawn.uniform(0, 360)
         self.move_speed = 0 # m/dt
         self.spawn_time = 0
         self.removal_time = float('inf')
@@ -39,106 +50,115 @@ class Patrol:
         self.patrol_distance = 0
         self.shots = 0
         self.hostiles_killed = 0
-        self.terrain_change_interval = np.random.randint(10)
+        self.terrain_change_interval = int(self.rng.terrain.integers(10))
         self.terrain_change_counter = 0
-        self.current_terrain = np.random.choice(list(terrain_library.keys()))
-        self.terrain_history = [self.current_terrain]
-        self.grade = np.random.normal(0, 3)
-        armor = params['armor_type']
-        if armor not in armor_profiles:
-            raise ValueError(f"Armor type '{armor}' not found in armor profiles.")
+        self.terrain_id = int(self.rng.terrain.integers(len(self._terrain_cost)))
+        self.grade = self.rng.terrain.normal(0, 3)
         self.squad_exhaustion = 0
-        self.squad_data = []  # Stores data for active soldiers
-        for _ in range(params['blue_stock']):
-            soldier_mass = np.random.normal(76.6571, 11.06765)
-            soldier_load = 20.6497926 + armor_profiles[armor]['Mass'] # Base Combat Load (kg) (Fish and Scharre, 2018, p. 13)
-            self.squad_data.append({
-                'soldier': soldier_mass,
-                'load': soldier_load,
-                'joules_expended': 0, 
-                'exhaustion_level': 0,
-                'removal_time': None,
-                'exhausted': False,
-                'Killed': False
-            })
-        self.casualties = []    #stores the data for dead and exhausted soldiers
+        soldier_mass = spawn.normal(76.6571, 11.06765, params['blue_stock'])
+        self.squad = SquadState(soldier_mass, self.scenario.soldier_load)
         self.stock_history = [[self.get_stock(), 0]]
-        self.exhaustion_data = [[s['exhaustion_level'] for s in self.squad_data]]
+        self._initial_terrain = self.terrain_id
+        self.recorder = None
+        if full_log:
+            self.recorder = TrajectoryRecorder(self.scenario.stop_time, params['blue_stock'], record_every, record_events)
+            self.recorder.start(self.current_position, self.terrain_id, self.squad.exhaustion.tolist())
 
     def move(self, move_distance, deviation):
-        
-        self.direction = (self.direction + np.random.uniform(-deviation, deviation)) % 360
-        traveled = move_distance
-        x = self.current_position[0] + move_distance * np.cos(np.radians(self.direction))
-        y = self.current_position[1] + move_distance * np.sin(np.radians(self.direction))
-        x = np.clip(x, 0, map_size)
-        y = np.clip(y, 0, map_size)
-        new_position = [x,y]
-        traveled = dist(self.current_position, new_position)
-
-        # Edge bounce logic
-        bounced = False
-        if x <= 0:
-            logging.debug(f"Bounce off west wall at {new_position}")
-            self.direction = 0 + np.random.uniform(-deviation, deviation)
-            bounced = True
-        elif x >= map_size:
-            logging.debug(f"Bounce off east wall at {new_position}")
-            self.direction = 180 + np.random.uniform(-deviation, deviation)
-            bounced = True
-
-        # Catches the edge case when the patrol is directly on a corner.
-        if bounced: 
-            if y <= 0:
-                logging.debug(f"Bounce off south-west corner at {new_position}")
-                self.direction = 45 + np.random.uniform(-deviation, deviation)
-            elif y >= map_size:
-                logging.debug(f"Bounce off north-east corner at {new_position}")
-                self.direction = 225 + np.random.uniform(-deviation, deviation)
-        else:
-            if y <= 0:
-                logging.debug(f"Bounce off south wall at {new_position}")
-                self.direction = 90 + np.random.uniform(-deviation, deviation)
-                bounced = True
-            elif y >= map_size:
-                logging.debug(f"Bounce off north wall at {new_position}")
-                self.direction = 270 + np.random.uniform(-deviation, deviation)
-                bounced = True
-
-        if bounced:
-            # Move again in the new direction to use the full move distance.
-            x = self.current_position[0] + (move_distance-traveled) * np.cos(np.radians(self.direction))
-            y = self.current_position[1] + (move_distance-traveled) * np.sin(np.radians(self.direction))
-            x = np.clip(x, 0, map_size)
-            y = np.clip(y, 0, map_size)
-            traveled += dist(new_position, [x,y])
-
-        new_position = [float(x), float(y)]
+        movement = self.rng.movement
+        heading_jitter = movement.uniform(-deviation, deviation)
+        # Drawn every step, bounce or not, so the movement stream stays aligned across runs that share a seed.
+        bounce_jitter = movement.uniform(-deviation, deviation)
+        self._move(move_distance, heading_jitter, bounce_jitter)
+
+    def _move(self, move_distance, heading_jitter, bounce_jitter):
+        """ Moves the patrol with already drawn heading and bounce perturbations. """
+        self.direction = (self.direction + heading_jitter) % 360
+        start_x, start_y = self.current_position
+        x, y, self.direction, traveled, walls = bounce_step(
+            start_x, start_y, self.direction, move_distance, bounce_jitter, self.map_size
+        )
+        new_position = [x, y]
+        if walls and self._trace_debug:
+            for wall in walls:
+                self.tracer.emit(DEBUG, 'bounce', wall=wall, position=new_position)
         self.patrol_distance += traveled
         self.move_speed = traveled 
         self.current_position = new_position
-        self.position_history.append(new_position)
         self._update_terrain()
         return
 
+    @property
+    def current_terrain(self):
+        return self.scenario.terrain_names[self.terrain_id]
+
+    @current_terrain.setter
+    def current_terrain(self, name):
+        self.terrain_id = self.scenario.tables.terrain_ids[name]
+
+    @property
+    def terrain_history(self):
+        """
+        Terrain names at every recorded step when full_log is set, else just the starting terrain.
+        """
+        names = self.scenario.terrain_names
+        if self.recorder is None:
+            return [names[self._initial_terrain]]
+        return [names[i] for i in self.recorder.terrain_ids().tolist()]
+
+    @property
+    def position_history(self):
+        """
+        Recorded positions when full_log is set, else the spawn point and the current position.
+        """
+        if self.recorder is not None:
+            return self.recorder.position_list()
+        if self.current_position is self._start_position:
+            return [list(self._start_position)]
+        return [list(self._start_position), list(self.current_position)]
+
+    @property
+    def exhaustion_data(self):
+        """
+        The starting exhaustion levels, then [threshold, levels...] for every recorded minute out of combat.
+        """
+        if self.recorder is not None:
+            return self.recorder.exhaustion_list()
+        return [[0.0] * len(self.squad.mass)]
+
     def update_patrol_time(self, sim_time):
         self.patrol_time = sim_time - self.spawn_time
 
+    @property
+    def squad_data(self):
+        """
+        Dict view of the active soldiers. Assigning a list of dicts replaces the squad.
+        """
+        return self.squad.records(alive=True)
+
+    @squad_data.setter
+    def squad_data(self, records):
+        self.squad = SquadState.from_records(records)
+
+    @property
+    def casualties(self):
+        """
+        Dict view of the soldiers removed by take_casualties, in the order they fell.
+        """
+        return self.squad.records(alive=False)
+
     def get_stock(self):
-        return int(len(self.squad_data))
+        return self.squad.count
     
     def take_casualties(self, casualties, sim_time):
-        list_survivors = self.squad_data[casualties:]
-        list_casulties = self.squad_data[:casualties]
-        for soldier in list_casulties:
-            soldier['removal_time'] = sim_time
-        self.squad_data = list_survivors
-        self.casualties.extend(list_casulties)
+        self.squad.remove(casualties, sim_time)
         self.stock_history.append([self.get_stock(), sim_time])
         return
 
     def to_dict(self, full_log=True):
-        pos_hist = [list(pos) for pos in self.position_history] if full_log else [list(self.position_history[0]), list(self.position_history[-1])]
+        pos_hist = self.position_history
+        if not full_log:
+            pos_hist = [pos_hist[0], pos_hist[-1]]
         stock_hist = [list(stock) for stock in self.stock_history]
         return {
             'stock': self.get_stock(),
@@ -160,54 +180,25 @@ class Patrol:
         """
         Updates the exhaustion state for the patrol.
         """
-        # Calculate exhaustion threshold based on patrol time (in minutes)
-        data = self.squad_data
-        speed = self.move_speed 
-        terrain_factor = terrain_library[self.current_terrain][0]
-        grade = self.grade
-        downhill_adjustment = 1 if grade < 0 else 0 
-
-        for soldier in data:
-            mass = soldier['soldier']
-            load = soldier['load']
-            # Pandolf-Santee equation (Watts)
-            P = (
-                1.5 * mass +
-                2.0 * (mass + load) * (load / mass)**2 +
-                terrain_factor * (mass + load) * (1.5 * speed**2 + 0.35 * speed * grade) -
-                downhill_adjustment * terrain_factor * (
-                    (grade * speed * (mass + load) / 3.5) -
-                    ((mass + load) * (grade + 6)**2 / mass) +
-                    (25 - speed**2)
-                )
-            )
-            energy_expended = P * 60
-            soldier['joules_expended'] += energy_expended
-
-            # The 60x is to convert the output to Joules per hour
-            average_power_output = ( soldier['joules_expended'] * 60 ) / (self.patrol_time) if self.patrol_time > 0 else 0
-            
-            # Next we have to convert to Kcal to compare against the exhaustion level.
-            average_power_output = average_power_output / 4184
-
-            exhaustion_threshold = self.get_exhaustion_threshold()
-            soldier['exhaustion_level'] = average_power_output / exhaustion_threshold if exhaustion_threshold > 0 else 0
-
-
-        exhaustion_data = [s['exhaustion_level'] for s in data]
-        exhaustion_data.insert(0, self.get_exhaustion_threshold())
-        if self.full_log:
-            self.exhaustion_data.append(exhaustion_data)
-        self.squad_exhaustion = float(np.mean(exhaustion_data))
+        terrain_factor = self._terrain_cost[self.terrain_id]
+        threshold = self.get_exhaustion_threshold()
+        # Pandolf-Santee for the whole squad in one vectorized expression
+        levels = self.squad.expend(self.move_speed, self.grade, terrain_factor, self.patrol_time, threshold)
+
+        if self.recorder is not None:
+            self.recorder.set_exhaustion(threshold, levels, self.squad.alive)
+        self.squad_exhaustion = self.squad.mean_exhaustion(threshold, levels)
         return 
   
     def get_exhaustion_threshold(self):
         """
         Calculate the exhaustion threshold based on the patrol time.
+        Whole minutes within the run are read from the scenario's table.
         """
-        patrol_time = ( self.patrol_time / 60 ) # Convert to hours
-        power_max = 715.0154 * (patrol_time) ** -0.3869002
-        return power_max 
+        patrol_time = self.patrol_time
+        if type(patrol_time) is int and 0 < patrol_time < len(self._thresholds):
+            return self._thresholds[patrol_time]
+        return exhaustion_threshold(patrol_time)
 
     def is_exhausted(self):
         """
@@ -216,9 +207,10 @@ class Patrol:
         return self.squad_exhaustion >= self.get_exhaustion_threshold()
 
     def step(self, deviation):
-        self.direction = (self.direction + np.random.uniform(-deviation, deviation)) % 360
+        movement = self.rng.movement
+        self.direction = (self.direction + movement.uniform(-deviation, deviation)) % 360
         # Calculate move speed and distance. Adjust speed based on terrain factor
-        move_speed = np.random.uniform(0.8, 1.4) / terrain_library[self.current_terrain][0]  
+        move_speed = movement.uniform(0.8, 1.4) / self._terrain_cost[self.terrain_id]
         # Adjust speed based on exhaustion level
         move_speed *= ( 1 - ( self.squad_exhaustion / (2 * self.get_exhaustion_threshold()) ) )
         # Multiply by 60 to convert to meters per minute because the simulation runs in minutes.
@@ -227,24 +219,79 @@ class Patrol:
         self.move(move_distance, deviation)
         return
 
+    def advance_idle(self, sim_time, minutes, deviation, clearance):
+        """
+        Runs up to `minutes` minutes after sim_time in which the patrol provably cannot engage.
+        Each minute is step() followed by set_exhaustion() and the is_exhausted() check, but the squad
+        exhaustion comes from running sums of pandolf_santee_terms instead of a pass over every soldier,
+        and the per soldier energy is written back once at the end. The window stops before any move
+        that could take the patrol further than clearance (m) from where it started.
+        Only for full_log=False, since no per minute exhaustion data is recorded.
+        Returns:
+            tuple: Minutes advanced and whether the patrol became exhausted.
+        """
+        # One row per minute in the order step() and move() draw them, so the movement stream matches.
+        draws = self.rng.movement.random((minutes, 4)).tolist()
+        base, total, total_over_mass, joules = self.squad.power_sums()
+        count = self.squad.count
+        cost = self._terrain_cost
+        low, span = -deviation, deviation - -deviation
+        x1 = x2 = x3 = 0.0
+        done = 0
+        exhausted = False
+        threshold = None
+        for step_roll, speed_roll, heading_roll, bounce_roll in draws:
+            patrol_time = sim_time + done + 1 - self.spawn_time
+            minute_threshold = (self._thresholds[patrol_time] if patrol_time < len(self._thresholds)
+                                else exhaustion_threshold(patrol_time))
+            # step(): the speed uses this minute's threshold and the exhaustion from the minute before.
+            direction = (self.direction + (low + span * step_roll)) % 360
+            move_speed = (0.8 + (1.4 - 0.8) * speed_roll) / cost[self.terrain_id]
+            move_speed *= 1 - self.squad_exhaustion / (2 * minute_threshold)
+            move_distance = move_speed * 60
+            if move_distance >= clearance:
+                break
+            clearance -= move_distance
+            self.patrol_time = patrol_time
+            threshold = minute_threshold
+            self.direction = direction
+            self._move(move_distance, low + span * heading_roll, low + span * bounce_roll)
+            done += 1
+
+            # set_exhaustion(): the mean of the threshold and every living soldier's level.
+            t1, t2, t3 = pandolf_santee_terms(self.move_speed, self.grade, cost[self.terrain_id])
+            x1 += t1
+            x2 += t2
+            x3 += t3
+            squad_joules = joules + 60 * (base * done + total * x1 + total_over_mass * x2 + count * x3)
+            levels = (squad_joules * 60 / patrol_time / 4184) / threshold
+            self.squad_exhaustion = (threshold + levels) / (count + 1)
+            if self.squad_exhaustion >= threshold:
+                exhausted = True
+                break
+        if done:
+            self.squad.expend_terms(done, x1, x2, x3, self.patrol_time, threshold)
+        return done, exhausted
+
     def _update_terrain(self):
         """
         Change the terrain type for the patrol.
         """
-        self.grade = np.random.normal(0, 3)
+        terrain = self.rng.terrain
+        self.grade = terrain.normal(0, 3)
+        changed = False
         if self.terrain_change_counter >= self.terrain_change_interval:
-            terrain_roll = np.random.randint(1, 101)
-            for terrain_name, values in terrain_library.items():
-                prob = int(values[1] * 100)
-                if terrain_roll <= prob :
-                    self.current_terrain = terrain_name
-                    logging.debug(f"changing terrain to: {terrain_name} based on roll: {float(terrain_roll)} < prob: {prob}")
-                    break
-                else:
-                    terrain_roll -= prob
+            terrain_roll = terrain.integers(1, 101)
+            # First bucket whose cumulative percent covers the roll. Rolls past the last bucket keep the terrain.
+            terrain_id = bisect_left(self.scenario.terrain_cdf_list, terrain_roll)
+            if terrain_id < len(self._terrain_cost):
+                changed = terrain_id != self.terrain_id
+                self.terrain_id = terrain_id
+                if self._trace_debug:
+                    self.tracer.emit(DEBUG, 'terrain_change', terrain=self.current_terrain, roll=int(terrain_roll))
             self.terrain_change_counter = 0
-            self.terrain_change_interval = np.random.randint(10)
+            self.terrain_change_interval = int(terrain.integers(10))
 
         self.terrain_change_counter += 1    
-        if self.full_log:
-            self.terrain_history.append(self.current_terrain)
+        if self.recorder is not None:
+            self.recorder.step(self.current_position, self.terrain_id, changed)
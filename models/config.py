@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import math
+import os
+import threading
+
+import yaml
+
+config_path = os.path.join(os.path.dirname(__file__), "../config/simulation.yaml")
+
+# Top level sections of simulation.yaml. Overrides may only touch these.
+config_sections = ('map_size', 'stop_time', 'fire_rates', 'terrain_library', 'threat_library',
+                   'armor_profiles', 'threat_probs')
+
+# Probabilities that should sum to 1 may be off by this much.
+_probability_tolerance = 1e-6
+
+# Absolute path -> ((mtime_ns, size), validated config, content hash)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _numbers(values, count):
+    return isinstance(values, (list, tuple)) and len(values) == count and all(_number(v) for v in values)
+
+
+def validate_config(config):
+    """ Checks that a config has every section the simulation reads, with usable values.
+    Args:
+        config (dict): Parsed simulation.yaml, possibly with overrides merged in.
+    Returns:
+        dict: The same config.
+    Raises:
+        ValueError: Naming the first problem found."""
+    if not isinstance(config, dict):
+        raise ValueError("The simulation config must be a mapping.")
+    missing = [section for section in config_sections if section not in config]
+    if missing:
+        raise ValueError(f"Config is missing sections: {missing}.")
+    if not _number(config['map_size']) or config['map_size'] <= 0:
+        raise ValueError("map_size must be a positive number.")
+    if not isinstance(config['stop_time'], int) or config['stop_time'] < 1:
+        raise ValueError("stop_time must be a positive whole number of minutes.")
+
+    fire_rates = config['fire_rates']
+    for side in ('blue', 'red'):
+        low, high = fire_rates.get(f'{side}_min'), fire_rates.get(f'{side}_max')
+        if not isinstance(low, int) or not isinstance(high, int) or not 0 <= low <= high:
+            raise ValueError(f"fire_rates needs whole numbers 0 <= {side}_min <= {side}_max.")
+
+    terrain = config['terrain_library']
+    if not terrain:
+        raise ValueError("terrain_library is empty.")
+    for name, values in terrain.items():
+        if not _numbers(values, 2) or values[0] <= 0 or values[1] < 0:
+            raise ValueError(f"Terrain '{name}' needs [movement cost > 0, probability >= 0].")
+    if abs(sum(values[1] for values in terrain.values()) - 1) > _probability_tolerance:
+        raise ValueError("terrain_library probabilities must sum to 1.")
+
+    threats = config['threat_library']
+    for name, values in threats.items():
+        if not _numbers(values, 3):
+            raise ValueError(f"Threat '{name}' needs three velocity coefficients [a, b, c].")
+
+    for armor, profile in config['armor_profiles'].items():
+        if not _number(profile.get('Mass')) or profile['Mass'] < 0:
+            raise ValueError(f"Armor '{armor}' needs a Mass in kg.")
+        for threat in threats:
+            if not _numbers(profile.get(threat), 2):
+                raise ValueError(f"Armor '{armor}' has no [a, b] defeat coefficients for threat '{threat}'.")
+
+    for env, probs in config['threat_probs'].items():
+        unknown = set(probs) - set(threats)
+        if unknown:
+            raise ValueError(f"Environment '{env}' names unknown threats: {sorted(unknown)}.")
+        if any(not _number(p) or p < 0 for p in probs.values()):
+            raise ValueError(f"Environment '{env}' has a negative or non-numeric threat probability.")
+        if abs(sum(probs.values()) - 1) > _probability_tolerance:
+            raise ValueError(f"Threat probabilities for '{env}' must sum to 1.")
+    return config
+
+
+def _load(path):
+    """ The cache entry for an absolute path, reparsing the file if it changed since it was cached."""
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == stamp:
+            return cached
+        with open(path, "rb") as f:
+            content = f.read()
+        config = validate_config(yaml.safe_load(content.decode("utf-8")))
+        _cache[path] = (stamp, config, hashlib.sha256(content).hexdigest())
+        return _cache[path]
+
+
+def load_config(path=None):
+    """ The parsed and validated simulation config.
+    The file is parsed once per process and again only when its modification time or size changes,
+    so repeated calls are a stat and a dict lookup. The returned dict is shared; do not modify it,
+    use merge_config for a variant.
+    Args:
+        path (str): YAML file. Defaults to config/simulation.yaml.
+    Returns:
+        dict: The config."""
+    return _load(os.path.abspath(path or config_path))[1]
+
+
+def config_version(path=None):
+    """ Hash of the config file's contents as of the last load_config, reloading it if it changed.
+    Anything stored across runs, such as cached results, should be keyed on it.
+    Args:
+        path (str): YAML file. Defaults to config/simulation.yaml.
+    Returns:
+        str: Hex digest."""
+    return _load(os.path.abspath(path or config_path))[2]
+
+
+def merge_config(base, overrides):
+    """ A validated copy of base with overrides merged in. Nested mappings are merged key by key, and
+    any other value replaces the one in base.
+    Args:
+        base (dict): Config to start from; it is not modified.
+        overrides (dict): Values to change, e.g. {'stop_time': 240, 'fire_rates': {'red_max': 10}}.
+    Returns:
+        dict: The merged config."""
+    if not isinstance(overrides, dict):
+        raise ValueError("Config overrides must be a mapping.")
+    unknown = set(overrides) - set(config_sections)
+    if unknown:
+        raise ValueError(f"Unknown config sections: {sorted(unknown)}.")
+
+    def merge(into, changes):
+        for key, value in changes.items():
+            if isinstance(value, dict) and isinstance(into.get(key), dict):
+                merge(into[key], value)
+            else:
+                into[key] = copy.deepcopy(value)
+        return into
+
+    return validate_config(merge(copy.deepcopy(base), overrides))
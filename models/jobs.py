@@ -0,0 +1,194 @@
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .monte_carlo import adaptive_chunk_size, default_chunk_size, run_adaptive, run_monte_carlo
+from .scenario import load_tables
+
+# Finished jobs kept for polling before the oldest are dropped.
+max_finished_jobs = 100
+
+
+def expand_spec(spec):
+    """ Validates a job spec and lists the parameter sets it covers.
+    A 'monte_carlo' spec runs its params once. A 'sweep' spec runs its params for every
+    armor_types x environments combination, defaulting to everything in the config.
+    Args:
+        spec (dict): {'type', 'params', 'num_runs', optional 'seed', 'armor_types', 'environments',
+            'rel_half_width', 'confidence'}. With rel_half_width set, num_runs caps every cell and each
+            cell stops once its confidence intervals are tight enough.
+    Returns:
+        list: One params dict per cell."""
+    kind = spec.get('type', 'monte_carlo')
+    params = dict(spec.get('params', {}))
+    if int(spec.get('num_runs', 0)) < 1:
+        raise ValueError("num_runs must be at least 1.")
+    if spec.get('rel_half_width') is not None and float(spec['rel_half_width']) <= 0:
+        raise ValueError("rel_half_width must be positive.")
+    if kind == 'monte_carlo':
+        cells = [params]
+    elif kind == 'sweep':
+        tables = load_tables(params.get('config_overrides'))
+        armor_types = spec.get('armor_types') or tables.armor_names
+        environments = spec.get('environments') or tables.environment_names
+        cells = [dict(params, armor_type=armor, environment=env)
+                 for armor, env in itertools.product(armor_types, environments)]
+    else:
+        raise ValueError(f"Job type '{kind}' is not supported.")
+    for cell in cells:
+        # Also checks that any config_overrides are valid before the job is queued.
+        tables = load_tables(cell.get('config_overrides'))
+        if cell.get('armor_type') not in tables.armor_ids:
+            raise ValueError(f"Armor type '{cell.get('armor_type')}' not found in armor profiles.")
+        if cell.get('environment') not in tables.environment_ids:
+            raise ValueError(f"Environment '{cell.get('environment')}' not found in threat probabilities.")
+    return cells
+
+
+class Job:
+    """ One queued Monte Carlo or sweep run. Progress fields are guarded by the job's lock."""
+    def __init__(self, spec):
+        self.id = uuid.uuid4().hex
+        self.spec = spec
+        self.cells = expand_spec(spec)
+        self.num_runs = int(spec['num_runs'])
+        self.rel_half_width = spec.get('rel_half_width')
+        # Fix the seed up front so a job can always be replayed.
+        self.seed = spec.get('seed')
+        if self.seed is None:
+            self.seed = np.random.SeedSequence().entropy
+        self.status = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cell_runs = [0] * len(self.cells)
+        self.cell_aggregates = [None] * len(self.cells)
+        self.cell_converged = [None] * len(self.cells)
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def runs_requested(self):
+        return self.num_runs * len(self.cells)
+
+    def runs_completed(self):
+        return sum(self.cell_runs)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'type': self.spec.get('type', 'monte_carlo'),
+                'status': self.status,
+                'error': self.error,
+                'seed': self.seed,
+                'runs_completed': self.runs_completed(),
+                'runs_requested': self.runs_requested(),
+                'cells': [
+                    {
+                        'armor_type': cell['armor_type'],
+                        'environment': cell['environment'],
+                        'runs_completed': runs,
+                        'converged': converged,
+                        'aggregates': aggregate,
+                    }
+                    for cell, runs, converged, aggregate in zip(
+                        self.cells, self.cell_runs, self.cell_converged, self.cell_aggregates
+                    )
+                ],
+            }
+
+
+class JobQueue:
+    """ In-process job queue. Jobs run on background threads and each job spreads its chunks
+    over a process pool through run_monte_carlo."""
+    def __init__(self, max_jobs=2, pool_workers=None, chunk_size=default_chunk_size):
+        self.pool_workers = pool_workers
+        self.chunk_size = chunk_size
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='job')
+
+    def submit(self, spec):
+        """ Queues a job spec and returns the Job right away. Raises ValueError for a bad spec."""
+        job = Job(spec)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """ Asks a job to stop after its current chunk.
+        Returns:
+            bool: False if the job does not exist."""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished is not None]
+        finished.sort(key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - max_finished_jobs)]:
+            del self._jobs[job.id]
+
+    def _run(self, job):
+        with job._lock:
+            if job.cancelled():
+                job.status = 'cancelled'
+                job.finished = time.time()
+                return
+            job.status = 'running'
+        try:
+            for index, params in enumerate(job.cells):
+                def on_chunk(aggregate, runs_completed, index=index):
+                    snapshot = aggregate.to_dict()
+                    with job._lock:
+                        job.cell_runs[index] = runs_completed
+                        job.cell_aggregates[index] = snapshot
+                # Every cell uses the job seed, so cells differ only by their parameters.
+                if job.rel_half_width is None:
+                    run_monte_carlo(
+                        params, job.num_runs, seed=job.seed, max_workers=self.pool_workers,
+                        chunk_size=self.chunk_size, on_chunk=on_chunk, should_stop=job.cancelled
+                    )
+                else:
+                    monte_carlo = run_adaptive(
+                        params, job.num_runs, rel_half_width=float(job.rel_half_width),
+                        confidence=float(job.spec.get('confidence', 0.95)), seed=job.seed,
+                        max_workers=self.pool_workers, chunk_size=min(self.chunk_size, adaptive_chunk_size),
+                        on_chunk=on_chunk, should_stop=job.cancelled
+                    )
+                    with job._lock:
+                        job.cell_converged[index] = monte_carlo['converged']
+                if job.cancelled():
+                    break
+            status = 'cancelled' if job.cancelled() and job.runs_completed() < job.runs_requested() else 'completed'
+        except Exception as error:
+            status = 'failed'
+            job.error = str(error)
+        with job._lock:
+            job.status = status
+            job.finished = time.time()
@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from .aggregation import MonteCarloAggregate, _safe, metrics
+from .batch_simulation import run_batch
+
+# Replications per work unit. Chunk boundaries never depend on the worker count,
+# so a master seed gives the same results on any number of workers.
+# Chunk seeds do not depend on params either, so cells run with the same master seed
+# share common random numbers replication by replication.
+default_chunk_size = 250
+
+# Replications per work unit for run_adaptive. Smaller chunks check the stopping rule more often.
+adaptive_chunk_size = 100
+
+# Half-width per metric that run_adaptive always accepts, in the metric's units. Without it a metric whose
+# mean is near zero, such as red kills behind the heavier inserts, would never meet a relative target.
+default_abs_half_width = {
+    'blue_kills': 0.1,
+    'red_kills': 0.1,
+    'patrol_distance': 10.0,
+    'squad_exhaustion': 1.0,
+}
+
+
+def _run_chunk(task):
+    """ Runs one chunk of replications in a worker process and folds them into an aggregate.
+    Args:
+        task (tuple): (params, number of runs, numpy.random.SeedSequence for this chunk, keep raw results).
+    Returns:
+        tuple: The chunk's MonteCarloAggregate and its result dicts in replication order, or None."""
+    params, num_runs, seed_seq, raw = task
+    results = run_batch(params, num_runs, rng=seed_seq)
+    aggregate = MonteCarloAggregate(params)
+    aggregate.add_many([summarize_run(r) for r in results])
+    return aggregate, (results if raw else None)
+
+
+def chunk_tasks(params, num_runs, seed=None, chunk_size=default_chunk_size, raw=False):
+    """ Splits num_runs replications into fixed size chunks, each with an independent SeedSequence child.
+    Args:
+        params (dict): Simulation parameters.
+        num_runs (int): Total number of replications.
+        seed (int | numpy.random.SeedSequence | None): Master seed. Defaults to fresh entropy.
+        chunk_size (int): Replications per chunk.
+        raw (bool): Whether each chunk should send back its per-run results.
+    Returns:
+        tuple: The master SeedSequence and the list of (params, runs, seed, raw) tasks."""
+    master = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, num_runs - start) for start in range(0, num_runs, chunk_size)]
+    children = master.spawn(len(sizes))
+    return master, [(params, size, child, raw) for size, child in zip(sizes, children)]
+
+
+def run_monte_carlo(params, num_runs, seed=None, max_workers=None, chunk_size=default_chunk_size, raw=False,
+                    on_chunk=None, should_stop=None):
+    """ Runs num_runs replications of one parameter set across a process pool.
+    Each chunk is folded into a MonteCarloAggregate as it finishes, so memory stays flat unless raw is set.
+    Args:
+        params (dict): Simulation parameters, as for run_simulation.
+        num_runs (int): Number of replications.
+        seed (int | None): Master seed. Defaults to fresh entropy, which is reported back in the result.
+        max_workers (int | None): Worker processes. Defaults to the CPU count; 1 runs in the calling process.
+        chunk_size (int): Replications per work unit.
+        raw (bool): Also return every per-run result dict. Defaults to False.
+        on_chunk (callable | None): Called as on_chunk(aggregate, runs_completed) after each chunk is merged.
+        should_stop (callable | None): Checked after each chunk; returning True cancels the remaining chunks.
+    Returns:
+        dict: The master seed entropy, the merged aggregate, the runs completed, whether the run was
+            cancelled and, if raw, the results in replication order."""
+    master, tasks = chunk_tasks(params, num_runs, seed, chunk_size, raw)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(tasks))
+    aggregate = MonteCarloAggregate(params)
+    results = [] if raw else None
+    cancelled = False
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        # Chunks are merged in chunk order so the aggregate does not depend on scheduling.
+        chunks = pool.map(_run_chunk, tasks) if pool else map(_run_chunk, tasks)
+        for chunk_aggregate, chunk_results in chunks:
+            aggregate.merge(chunk_aggregate)
+            if raw:
+                results.extend(chunk_results)
+            if on_chunk:
+                on_chunk(aggregate, aggregate.count)
+            if should_stop and should_stop():
+                cancelled = aggregate.count < num_runs
+                break
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return {
+        'seed': master.entropy,
+        'aggregate': aggregate,
+        'runs_completed': aggregate.count,
+        'cancelled': cancelled,
+        'results': results,
+    }
+
+
+def confidence_half_widths(aggregate, confidence=0.95):
+    """ Confidence interval half-width on the mean of every headline metric.
+    Args:
+        aggregate (MonteCarloAggregate): Aggregate to read.
+        confidence (float): Two sided confidence level.
+    Returns:
+        dict: Half-width per metric, nan until a metric has two values."""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return {metric: aggregate.stats[metric].half_width(z) for metric in metrics}
+
+
+def run_adaptive(params, max_runs=1000, rel_half_width=0.05, confidence=0.95, min_runs=adaptive_chunk_size,
+                 seed=None, max_workers=None, chunk_size=adaptive_chunk_size, raw=False, on_chunk=None,
+                 should_stop=None, abs_half_width=None):
+    """ Runs chunks of replications until every headline metric's confidence interval is tight enough.
+    A metric has converged when its half-width is at most rel_half_width times the absolute value of
+    its mean, or at most its absolute floor; a metric with no spread at all always converges. Stops at
+    max_runs otherwise.
+    The stopping rule is checked after each chunk in chunk order, so the runs used for a given seed
+    do not depend on the worker count.
+    Args:
+        params (dict): Simulation parameters, as for run_simulation.
+        max_runs (int): Cap on replications.
+        rel_half_width (float): Target half-width as a fraction of the mean.
+        confidence (float): Two sided confidence level of the intervals.
+        min_runs (int): Replications to run before the stopping rule is checked.
+        seed, max_workers, chunk_size, raw, on_chunk, should_stop: As for run_monte_carlo.
+        abs_half_width (dict | None): Absolute floor per metric, merged over default_abs_half_width.
+            A floor of 0 leaves only the relative target for that metric.
+    Returns:
+        dict: The run_monte_carlo result plus 'converged' and the final 'half_widths' per metric."""
+    floors = {**default_abs_half_width, **(abs_half_width or {})}
+    unknown = set(floors) - set(metrics)
+    if unknown:
+        raise ValueError(f"Unknown metrics in abs_half_width: {sorted(unknown)}.")
+    state = {'converged': False, 'half_widths': {}}
+
+    def check(aggregate, runs_completed):
+        half_widths = confidence_half_widths(aggregate, confidence)
+        state['half_widths'] = half_widths
+        # nan compares False, so a metric without an interval yet is never converged.
+        state['converged'] = runs_completed >= min_runs and all(
+            half_widths[metric] <= max(rel_half_width * abs(aggregate.stats[metric].mean), floors[metric])
+            for metric in metrics
+        )
+        if on_chunk:
+            on_chunk(aggregate, runs_completed)
+
+    def stop():
+        return state['converged'] or bool(should_stop and should_stop())
+
+    monte_carlo = run_monte_carlo(params, max_runs, seed=seed, max_workers=max_workers, chunk_size=chunk_size,
+                                  raw=raw, on_chunk=check, should_stop=stop)
+    monte_carlo['cancelled'] = monte_carlo['cancelled'] and not state['converged']
+    monte_carlo['converged'] = state['converged']
+    monte_carlo['half_widths'] = {metric: _safe(value) for metric, value in state['half_widths'].items()}
+    return monte_carlo
+
+
+def summarize_run(result):
+    """ Pulls the headline metrics out of one run_simulation style result.
+    Returns:
+        dict: Kills on both sides, patrol distance and final squad exhaustion."""
+    return {
+        'blue_kills': result['blue']['hostiles_killed'],
+        'red_kills': sum(red['warfighters_killed'] for red in result['red_patrols']),
+        'patrol_distance': result['blue']['patrol_distance'],
+        'squad_exhaustion': result['blue']['exhaustion'],
+    }
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+
+# Heading (degrees) a patrol turns to after hitting each wall or corner, before the bounce jitter.
+# Every one points back into the map.
+bounce_headings = {
+    'west': 0, 'east': 180, 'south': 90, 'north': 270,
+    'south-west corner': 45, 'south-east corner': 135, 'north-east corner': 225, 'north-west corner': 315,
+}
+
+# Bounces followed within one move. A move only needs more than two when the bounce jitter keeps
+# turning the patrol back into a wall; whatever distance is left after the last one is dropped.
+max_bounces = 4
+
+# Wall hits closer together than this fraction of the move count as one corner hit.
+_corner_tolerance = 1e-9
+
+
+def _wall_name(hit_x, hit_y, east, north):
+    if hit_x and hit_y:
+        return ('north' if north else 'south') + '-' + ('east' if east else 'west') + ' corner'
+    if hit_x:
+        return 'east' if east else 'west'
+    return 'north' if north else 'south'
+
+
+def bounce_step(x, y, heading, distance, jitter, size):
+    """ Moves one patrol distance (m) along heading (degrees), bouncing off the map edges.
+    The patrol walks to the first wall it meets, turns to that wall's entry in bounce_headings plus
+    jitter, and carries on from the contact point with the distance that is left, so the distance
+    traveled equals the distance asked for unless the bounces run out.
+    Returns:
+        tuple: x, y, the final heading, the distance traveled and the walls hit, in order."""
+    remaining = distance
+    walls = []
+    for bounce in range(max_bounces + 1):
+        radians = math.radians(heading)
+        dx, dy = math.cos(radians), math.sin(radians)
+        # Distance along the heading to the wall each axis is moving toward.
+        to_x = (size - x) / dx if dx > 0 else (-x / dx if dx < 0 else math.inf)
+        to_y = (size - y) / dy if dy > 0 else (-y / dy if dy < 0 else math.inf)
+        leg = min(to_x, to_y, remaining)
+        x += leg * dx
+        y += leg * dy
+        remaining -= leg
+        if remaining <= 0 or bounce == max_bounces:
+            break
+        slack = _corner_tolerance * max(distance, 1)
+        hit_x, hit_y = to_x <= leg + slack, to_y <= leg + slack
+        # Snap onto the wall so rounding never leaves the patrol outside the map.
+        if hit_x:
+            x = size if dx > 0 else 0.0
+        if hit_y:
+            y = size if dy > 0 else 0.0
+        wall = _wall_name(hit_x, hit_y, dx > 0, dy > 0)
+        walls.append(wall)
+        heading = bounce_headings[wall] + jitter
+    x = min(max(x, 0.0), size)
+    y = min(max(y, 0.0), size)
+    return x, y, heading % 360, distance - remaining, walls
+
+
+def bounce_move(position, direction, move_distance, jitter, size):
+    """ bounce_step for many patrols at once.
+    Reflection is done with masks over all rows; each pass handles one wall contact for every row
+    that still has distance left, so the loop runs at most max_bounces + 1 times and usually once.
+    Args:
+        position (numpy.ndarray): (n, 2) start positions.
+        direction (numpy.ndarray): Headings in degrees.
+        move_distance (numpy.ndarray | float): Distance (m) for every row.
+        jitter (numpy.ndarray | float): Heading perturbation added after a bounce.
+        size (float): Map size (m).
+    Returns:
+        tuple: New positions, new headings and distance traveled for every row."""
+    n = len(position)
+    x = position[:, 0].astype(float)
+    y = position[:, 1].astype(float)
+    heading = np.array(direction, dtype=float)
+    distance = np.broadcast_to(np.asarray(move_distance, dtype=float), (n,))
+    jitter = np.broadcast_to(np.asarray(jitter, dtype=float), (n,))
+    remaining = distance.copy()
+    rows = np.arange(n)
+    for bounce in range(max_bounces + 1):
+        radians = np.radians(heading[rows])
+        dx, dy = np.cos(radians), np.sin(radians)
+        px, py, left = x[rows], y[rows], remaining[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            to_x = np.where(dx > 0, (size - px) / dx, np.where(dx < 0, -px / dx, np.inf))
+            to_y = np.where(dy > 0, (size - py) / dy, np.where(dy < 0, -py / dy, np.inf))
+        leg = np.minimum(np.minimum(to_x, to_y), left)
+        px = px + leg * dx
+        py = py + leg * dy
+        left = left - leg
+        walled = left > 0
+        if bounce < max_bounces and walled.any():
+            slack = _corner_tolerance * np.maximum(distance[rows], 1)
+            hit_x = walled & (to_x <= leg + slack)
+            hit_y = walled & (to_y <= leg + slack)
+            px = np.where(hit_x, np.where(dx > 0, size, 0.0), px)
+            py = np.where(hit_y, np.where(dy > 0, size, 0.0), py)
+            # Same table as bounce_headings: corners first, then the single walls.
+            turned = np.select(
+                [hit_x & hit_y & (dx <= 0) & (dy <= 0), hit_x & hit_y & (dx > 0) & (dy <= 0),
+                 hit_x & hit_y & (dx > 0) & (dy > 0), hit_x & hit_y & (dx <= 0) & (dy > 0),
+                 hit_x & (dx <= 0), hit_x & (dx > 0), hit_y & (dy <= 0), hit_y & (dy > 0)],
+                [45, 135, 225, 315, 0, 180, 90, 270],
+            )
+            heading[rows] = np.where(walled, turned + jitter[rows], heading[rows])
+        x[rows], y[rows], remaining[rows] = px, py, left
+        rows = rows[walled]
+        if bounce == max_bounces or rows.size == 0:
+            break
+    new_position = np.column_stack((np.clip(x, 0, size), np.clip(y, 0, size)))
+    return new_position, heading % 360, distance - remaining
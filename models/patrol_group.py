@@ -0,0 +1,265 @@
+import numpy as np
+
+from .movement import bounce_move
+from .red_patrol import RedForce
+from .rng import make_streams
+from .scenario import Scenario, compile_scenario
+from .squad_simulation import attack_resolvers, make_json_safe
+from .squad_state import pandolf_santee
+
+
+class PatrolGroup:
+    """ Several blue squads on one map, advanced together as arrays.
+    Every squad follows the same rules as a Patrol: step() is Patrol.step and move for every active
+    squad, set_exhaustion() is Patrol.set_exhaustion, and to_dict() returns one Patrol.to_dict shaped
+    dict per squad. Soldiers live in (squads, blue_stock) arrays with an alive mask, and all squads share
+    one Scenario. Movement draws are made for every squad each minute, so squad i sees the same draws
+    whichever squads are still active, and a group of one squad reproduces a Patrol with the same seed."""
+    def __init__(self, params, count, full_log=True, scenario=None, rng=None):
+        if count < 1:
+            raise ValueError("A patrol group needs at least one squad.")
+        self.count = count
+        self.full_log = full_log
+        self.scenario = scenario or Scenario(params)
+        self._terrain_cost = self.scenario.terrain_cost
+        self.rng = make_streams(rng)
+        spawn, terrain = self.rng.spawn, self.rng.terrain
+        size = self.map_size = self.scenario.map_size
+        stock = params['blue_stock']
+
+        # Drawn in the same order as Patrol.__init__ so one squad matches a Patrol.
+        self.position = spawn.uniform(0, size, (count, 2))
+        self.direction = spawn.uniform(0, 360, count)
+        self.change_interval = terrain.integers(0, 10, count)
+        self.terrain_id = terrain.integers(0, len(self._terrain_cost), count)
+        self.grade = terrain.normal(0, 3, count)
+        self.mass = spawn.normal(76.6571, 11.06765, (count, stock))
+        self.load = self.scenario.soldier_load
+        self.joules = np.zeros((count, stock))
+        self.alive = np.ones((count, stock), dtype=bool)
+        self.stock = np.full(count, stock)
+        self.change_counter = np.zeros(count, dtype=int)
+        self.move_speed = np.zeros(count)
+        self.squad_exhaustion = np.zeros(count)
+        self.patrol_time = np.zeros(count, dtype=int)
+        self.patrol_distance = np.zeros(count)
+        self.shots = np.zeros(count, dtype=int)
+        self.hostiles_killed = np.zeros(count, dtype=int)
+        self.spawn_time = 0
+        self.removal_time = np.full(count, np.inf)
+        self.active = np.ones(count, dtype=bool)
+
+        self.start_position = self.position.tolist()
+        self.position_history = [[p] for p in self.start_position]
+        self.stock_history = [[[stock, 0]] for _ in range(count)]
+        self.exhaustion_data = [[[0.0] * stock] for _ in range(count)]
+
+    def get_stock(self):
+        return self.stock.copy()
+
+    def update_patrol_time(self, sim_time):
+        self.patrol_time[self.active] = sim_time - self.spawn_time
+
+    def get_exhaustion_threshold(self):
+        """ Exhaustion threshold for every squad, from its patrol time."""
+        return self.scenario.exhaustion_threshold[self.patrol_time]
+
+    def step(self, deviation):
+        """ One minute of Patrol.step, move and terrain update for every active squad."""
+        draws = self.rng.movement.random((self.count, 4))
+        idx = np.flatnonzero(self.active)
+        if idx.size == 0:
+            return
+        step_roll, speed_roll, heading_roll, bounce_roll = draws[idx].T
+        low, span = -deviation, deviation - -deviation
+        threshold = self.get_exhaustion_threshold()[idx]
+        direction = (self.direction[idx] + (low + span * step_roll)) % 360
+        move_speed = (0.8 + (1.4 - 0.8) * speed_roll) / self._terrain_cost[self.terrain_id[idx]]
+        move_speed *= 1 - self.squad_exhaustion[idx] / (2 * threshold)
+        direction = (direction + (low + span * heading_roll)) % 360
+        position, direction, traveled = bounce_move(
+            self.position[idx], direction, move_speed * 60, low + span * bounce_roll, self.map_size
+        )
+        self.position[idx] = position
+        self.direction[idx] = direction
+        self.patrol_distance[idx] += traveled
+        self.move_speed[idx] = traveled
+        if self.full_log:
+            for i, p in zip(idx.tolist(), position.tolist()):
+                self.position_history[i].append(p)
+        self._update_terrain(idx)
+
+    def _update_terrain(self, idx):
+        """ Patrol._update_terrain for the squads in idx."""
+        terrain = self.rng.terrain
+        self.grade[idx] = terrain.normal(0, 3, idx.size)
+        change = idx[self.change_counter[idx] >= self.change_interval[idx]]
+        if change.size:
+            rolls = terrain.integers(1, 101, change.size)
+            pick = np.searchsorted(self.scenario.terrain_cdf, rolls)
+            # A roll past the last bucket leaves the terrain unchanged.
+            self.terrain_id[change] = np.where(pick < len(self._terrain_cost), pick, self.terrain_id[change])
+            self.change_counter[change] = 0
+            self.change_interval[change] = terrain.integers(0, 10, change.size)
+        self.change_counter[idx] += 1
+
+    def set_exhaustion(self, squads=None):
+        """ Patrol.set_exhaustion for the given squad indices, defaulting to every active squad."""
+        idx = np.flatnonzero(self.active) if squads is None else np.asarray(squads, dtype=int)
+        if idx.size == 0:
+            return
+        threshold = self.get_exhaustion_threshold()[idx]
+        # Pandolf-Santee for every soldier of every squad in one expression; dead soldiers are masked out.
+        power = pandolf_santee(
+            self.mass[idx], self.load, self.move_speed[idx][:, None], self.grade[idx][:, None],
+            self._terrain_cost[self.terrain_id[idx]][:, None]
+        )
+        alive = self.alive[idx]
+        joules = self.joules[idx] + np.where(alive, power * 60, 0)
+        self.joules[idx] = joules
+        levels = (joules * 60 / self.patrol_time[idx][:, None] / 4184) / threshold[:, None]
+        self.squad_exhaustion[idx] = (threshold + np.where(alive, levels, 0).sum(axis=1)) / (self.stock[idx] + 1)
+        if self.full_log:
+            for i, t, row, mask in zip(idx.tolist(), threshold.tolist(), levels.tolist(), alive.tolist()):
+                self.exhaustion_data[i].append([t] + [level for level, a in zip(row, mask) if a])
+
+    def is_exhausted(self):
+        """ Whether each squad's exhaustion has reached its threshold."""
+        return self.squad_exhaustion >= self.get_exhaustion_threshold()
+
+    def take_casualties(self, squad, casualties, sim_time):
+        """ Removes the first living soldiers of one squad, as Patrol.take_casualties does."""
+        rows = np.flatnonzero(self.alive[squad])[:max(0, casualties)]
+        self.alive[squad, rows] = False
+        self.stock[squad] -= len(rows)
+        self.stock_history[squad].append([int(self.stock[squad]), sim_time])
+
+    def remove(self, squads, sim_time):
+        """ Takes squads out of the patrol; they stop moving and expending energy."""
+        self.active[squads] = False
+        self.removal_time[squads] = sim_time
+
+    def member(self, squad):
+        """ A read-only stand in for one squad's Patrol, for the engagement resolvers."""
+        return _Member(self, squad)
+
+    def to_dict(self, full_log=True):
+        """ One dict per squad, shaped like Patrol.to_dict."""
+        squads = []
+        for i in range(self.count):
+            history = self.position_history[i]
+            if not full_log:
+                history = [self.start_position[i], self.position[i].tolist()]
+            squads.append({
+                'stock': int(self.stock[i]),
+                'current_position': self.position[i].tolist(),
+                'direction': float(self.direction[i]),
+                'spawn_time': self.spawn_time,
+                'removal_time': float(self.removal_time[i]) if np.isinf(self.removal_time[i]) else int(self.removal_time[i]),
+                'position_history': [list(p) for p in history],
+                'stock_history': [list(s) for s in self.stock_history[i]],
+                'exhaustion_data': self.exhaustion_data[i],
+                'patrol_time': int(self.patrol_time[i]),
+                'patrol_distance': float(self.patrol_distance[i]),
+                'shots': int(self.shots[i]),
+                'hostiles_killed': int(self.hostiles_killed[i]),
+                'exhaustion': float(self.squad_exhaustion[i]),
+            })
+        return squads
+
+
+class _Member:
+    """ What the engagement resolvers read from a blue patrol, for one squad of a PatrolGroup."""
+    def __init__(self, group, squad):
+        self.group = group
+        self.squad = squad
+
+    def get_stock(self):
+        return int(self.group.stock[self.squad])
+
+
+def run_group_simulation(params, num_squads, full_log=True, resolver='per_shot', rng=None):
+    """ Runs run_simulation with num_squads blue squads patrolling the same map as one PatrolGroup.
+    Each minute every active squad moves, then each one in range of a red patrol rolls for an
+    engagement against the nearest one, and the squads that did not fight add exhaustion together.
+    A squad that is wiped out or exhausted drops out; the run ends when none are left or at stop_time.
+    Args:
+        params (dict): Simulation parameters, as for run_simulation.
+        num_squads (int): Number of blue squads.
+        full_log (bool): Keep every squad's position and exhaustion history and the combat log.
+        resolver (str): Name of the engagement resolver in attack_resolvers.
+        rng: Seed, SeedSequence, numpy Generator or RandomStreams, as for run_simulation.
+    Returns:
+        dict: 'blue_squads' with one Patrol.to_dict shaped dict per squad, plus 'red', 'red_patrols'
+            and 'combat_log' as for run_simulation. Combat log entries name their 'squad'."""
+    if resolver not in attack_resolvers:
+        raise ValueError(f"Resolver '{resolver}' not found in attack resolvers.")
+    attack = attack_resolvers[resolver]
+    scenario = compile_scenario(params)
+    streams = make_streams(rng)
+    deviation = params['direction_deviation']
+
+    sim_time = 0
+    red_force = RedForce(params, sim_time, streams, scenario.map_size)
+    group = PatrolGroup(params, num_squads, full_log, scenario=scenario, rng=streams)
+    combat_log = []
+
+    while sim_time < scenario.stop_time and group.active.any():
+        sim_time += 1
+        group.update_patrol_time(sim_time)
+        group.step(deviation)
+        red_force.advance()
+
+        # One roll per squad every minute keeps each squad's encounter draws aligned.
+        encounter_rolls = streams.encounter.random(group.count)
+        engaged = np.zeros(group.count, dtype=bool)
+        for i in np.flatnonzero(group.active).tolist():
+            slot, distance = red_force.in_range(group.position[i])
+            if slot is None or encounter_rolls[i] >= (1 / np.sqrt(distance) if distance != 0 else 1):
+                continue
+            engaged[i] = True
+            red = red_force.live[slot]
+            attack_result = attack(
+                group.member(i), red, params['environment'], params['armor_type'], distance,
+                scenario=scenario, rng=streams.combat
+            )
+            group.take_casualties(i, attack_result['blue_casualites'], sim_time)
+            red['stock'] -= attack_result['red_casualites']
+            group.hostiles_killed[i] += attack_result['red_casualites']
+            red['warfighters_killed'] += attack_result['blue_casualites']
+            group.shots[i] = attack_result['blue_shots']
+            red['shots'] = attack_result['red_shots']
+            red['stock_history'].append((red['stock'], sim_time))
+            if group.stock[i] <= 0:
+                group.remove(i, sim_time)
+            if red['stock'] <= 0:
+                red_force.replace(slot, sim_time)
+            if full_log:
+                combat_log.append({
+                    'combat_time': sim_time,
+                    'squad': i,
+                    'blue_shots': attack_result['blue_shots'],
+                    'red_shots': attack_result['red_shots'],
+                    'blue_casualites': attack_result['blue_casualites'],
+                    'red_casualites': attack_result['red_casualites'],
+                    'blue_position': group.position[i].tolist(),
+                    'red_position': red_force.positions[slot].tolist(),
+                    'distance': distance
+                })
+
+        # Exhaustion checks only happen for squads that were not engaged in combat.
+        calm = np.flatnonzero(group.active & ~engaged)
+        group.set_exhaustion(calm)
+        group.remove(calm[group.is_exhausted()[calm]], sim_time)
+
+    red_force.sync()
+    red_patrols = red_force.history
+    for patrol in red_patrols:
+        patrol['stock_history'] = [list(stock) for stock in patrol['stock_history']]
+        patrol['current_position'] = list(patrol['current_position'])
+    return make_json_safe({
+        'blue_squads': group.to_dict(full_log=full_log),
+        'red': red_patrols[0],
+        'red_patrols': red_patrols,
+        'combat_log': combat_log,
+    })
@@ -0,0 +1,135 @@
+from math import dist
+
+import numpy as np
+
+from .scenario import load_tables
+from .spatial import UniformGrid
+
+# Furthest distance (m) at which a blue and a red patrol can engage.
+engagement_range = 1000
+
+
+def spawn_red_patrol(params, sim_time, rng=None):
+    """ Spawns a red patrol at a random position on the map with the given stock.
+    Args:
+        params (dict): Simulation parameters including red stock.
+        rng (numpy.random.Generator): Random source for the position. Defaults to fresh entropy.
+    Returns:
+        dict: A dictionary representing the red patrol with its stock and position."""
+    local_map_size = params.get("map_size") or load_tables(params.get('config_overrides')).map_size
+    rng = np.random.default_rng() if rng is None else rng
+    return {
+        'stock': params['red_stock'],
+        'current_position': (
+            rng.uniform(0, local_map_size),
+            rng.uniform(0, local_map_size)
+        ),
+        'stock_history': [(params['red_stock'], 0)],
+        'spawn_time': sim_time,
+        'removal_time': None,
+        'shots': 0,
+        'warfighters_killed': 0,
+    }
+
+
+class RedForce:
+    """ The live red patrols of one run, indexed by a UniformGrid for engagement checks.
+    params['red_patrols'] (default 1) patrols are live at once, each in its own slot. A patrol that is
+    wiped out is replaced in its slot by a fresh spawn, so the count stays constant. With
+    params['red_speed'] (m/min, default 0) set, every patrol wanders like the blue patrol, turning by up
+    to direction_deviation degrees a minute and reflecting off the map edges.
+    Spawn positions come from the spawn stream and red movement from the red stream, so one static
+    red patrol reproduces the single patrol engine draw for draw."""
+    def __init__(self, params, sim_time, rng, map_size):
+        self.count = int(params.get('red_patrols', 1))
+        if self.count < 1:
+            raise ValueError("red_patrols must be at least 1.")
+        self.speed = float(params.get('red_speed', 0))
+        if self.speed < 0:
+            raise ValueError("red_speed cannot be negative.")
+        self.params = params
+        self.deviation = params.get('direction_deviation', 0)
+        self.map_size = map_size
+        self.rng = rng
+        self.grid = UniformGrid(engagement_range)
+        # Positions live in these arrays while the run goes; sync() copies them into the patrol dicts.
+        self.positions = np.zeros((self.count, 2))
+        self.headings = np.zeros(self.count)
+        self._cells = np.zeros((self.count, 2), dtype=int)
+        self.live = [None] * self.count
+        # Every patrol spawned during the run, newest first.
+        self.history = []
+        for slot in range(self.count):
+            self._spawn(slot, sim_time)
+
+    def _spawn(self, slot, sim_time):
+        patrol = spawn_red_patrol(self.params, sim_time, rng=self.rng.spawn)
+        self.live[slot] = patrol
+        self.history.insert(0, patrol)
+        self.positions[slot] = patrol['current_position']
+        if self.speed:
+            # Static patrols skip this draw, which keeps runs on one shared Generator unchanged.
+            self.headings[slot] = self.rng.red.uniform(0, 360)
+        self._cells[slot] = self.positions[slot] // self.grid.cell_size
+        if slot in self.grid:
+            self.grid.remove(slot)
+        self.grid.insert(slot, *patrol['current_position'])
+
+    def replace(self, slot, sim_time):
+        """ Marks the patrol in slot as removed and spawns its replacement.
+        Returns:
+            dict: The new patrol."""
+        self.sync(slot)
+        self.live[slot]['removal_time'] = sim_time
+        self._spawn(slot, sim_time)
+        return self.live[slot]
+
+    def in_range(self, position):
+        """ Nearest live patrol within engagement_range of position, checking only the 3 x 3 block of
+        grid cells around it.
+        Returns:
+            tuple: (slot, distance), or (None, inf) when no patrol is in range."""
+        best_slot, best = None, np.inf
+        for slot in self.grid.query(position[0], position[1]):
+            distance = dist(position, self.positions[slot])
+            if distance < best:
+                best_slot, best = slot, distance
+        if best > engagement_range:
+            return None, np.inf
+        return best_slot, best
+
+    def clearance(self, position):
+        """ Distance (m) position can close on the nearest live patrol before it comes into range."""
+        _, distance = self.grid.nearest(position[0], position[1], self.positions)
+        return distance - engagement_range
+
+    def advance(self, minutes=1):
+        """ Moves every live patrol for the given number of minutes. Static patrols draw nothing."""
+        if self.speed == 0 or minutes <= 0:
+            return
+        size = self.map_size
+        positions, headings = self.positions, self.headings
+        for _ in range(minutes):
+            headings += self.rng.red.uniform(-self.deviation, self.deviation, self.count)
+            radians = np.radians(headings)
+            positions[:, 0] += self.speed * np.cos(radians)
+            positions[:, 1] += self.speed * np.sin(radians)
+            # Reflect off the edges, turning the heading to match.
+            low_x, high_x = positions[:, 0] < 0, positions[:, 0] > size
+            low_y, high_y = positions[:, 1] < 0, positions[:, 1] > size
+            positions[:, 0] = np.where(low_x, -positions[:, 0], np.where(high_x, 2 * size - positions[:, 0], positions[:, 0]))
+            positions[:, 1] = np.where(low_y, -positions[:, 1], np.where(high_y, 2 * size - positions[:, 1], positions[:, 1]))
+            headings[:] = np.where(low_x | high_x, 180 - headings, headings)
+            headings[:] = np.where(low_y | high_y, -headings, headings) % 360
+        # Only patrols that crossed into another cell touch the index.
+        cells = (positions // self.grid.cell_size).astype(int)
+        for slot in np.flatnonzero((cells != self._cells).any(axis=1)).tolist():
+            self.grid.move(slot, *positions[slot])
+        self._cells = cells
+
+    def sync(self, slot=None):
+        """ Copies the current position of one slot, or every slot, into its patrol dict."""
+        slots = range(self.count) if slot is None else [slot]
+        for i in slots:
+            if self.speed:
+                self.live[i]['current_position'] = (float(self.positions[i, 0]), float(self.positions[i, 1]))
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .config import config_version
+
+# Default size of the in-memory cache.
+default_max_bytes = 64 * 2**20
+
+# Default size of the disk tier.
+default_max_disk_bytes = 1024 * 2**20
+
+
+def cache_key(kind, params, **options):
+    """ Key for one request: a hash of its kind, params, options and the config version in a canonical form.
+    Dict order and int/float spelling of the same number do not change the key; options set to None
+    are left out, so an option that was not given matches one given as its default None. Editing
+    simulation.yaml changes every key, so results computed under the old config are never served.
+    Args:
+        kind (str): What is computed, e.g. the endpoint name.
+        params (dict): Simulation parameters, including any config_overrides.
+        **options: Everything else that changes the result, such as seed and num_runs.
+    Returns:
+        str: Hex digest."""
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    canonical = json.dumps([kind, normalize(params), normalize(options), config_version()], sort_keys=True,
+                           ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class _Pending:
+    """ A computation in progress, for the requests that arrive while it runs."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """ Cache of finished responses, as (mimetype, body bytes) pairs.
+    The memory tier is an LRU that evicts the least recently used entries once the bodies add up to
+    more than max_bytes. With a directory, every entry is also written there, so processes serving the
+    same app share results and a restarted server starts warm. Once the files there add up to more than
+    max_disk_bytes, the least recently used ones are deleted. Concurrent requests for one key in a
+    process wait for the first one's computation instead of starting their own.
+    Only cache deterministic results: the key must pin everything, seed included.
+    Args:
+        max_bytes (int): Memory budget for bodies. 0 keeps nothing in memory.
+        directory (str | None): Directory for the shared disk tier. None disables it.
+        max_disk_bytes (int): Budget for the disk tier, shared by every process using the directory."""
+    def __init__(self, max_bytes=default_max_bytes, directory=None, max_disk_bytes=default_max_disk_bytes):
+        if max_bytes < 0 or max_disk_bytes < 0:
+            raise ValueError("max_bytes and max_disk_bytes cannot be negative.")
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0,
+                      'disk_evictions': 0, 'disk_errors': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._trim_disk()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key, entry):
+        # Caller holds the lock.
+        size = len(entry[1])
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[1])
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, body) = self._entries.popitem(last=False)
+            self._bytes -= len(body)
+            self.stats['evictions'] += 1
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mimetype, body = f.read().split(b'\n', 1)
+        except (OSError, ValueError):
+            return None
+        try:
+            # The modification time orders entries for _trim_disk, so a hit counts as a use.
+            os.utime(path)
+        except OSError:
+            pass
+        return mimetype.decode('utf-8'), body
+
+    def _disk_files(self):
+        """ (modification time, size, path) of every finished entry in the disk tier."""
+        files = []
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.partial'):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+        return files
+
+    def _trim_disk(self):
+        """ Deletes the least recently used files until the disk tier fits max_disk_bytes.
+        The directory is rescanned, since other processes may have written to it."""
+        with self._disk_lock:
+            files = sorted(self._disk_files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                self.stats['disk_evictions'] += 1
+            self._disk_bytes = total
+
+    def _write_disk(self, key, entry):
+        path = self._path(key)
+        data = entry[0].encode('utf-8') + b'\n' + entry[1]
+        if len(data) > self.max_disk_bytes:
+            return
+        # Written aside and renamed, so another process never reads half an entry.
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, path)
+        except OSError:
+            # The disk tier is optional: a full disk or an unwritable directory only loses this entry.
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            with self._lock:
+                self.stats['disk_errors'] += 1
+            return
+        with self._disk_lock:
+            # An estimate: rewrites and other processes' files are only counted by the next rescan.
+            self._disk_bytes += len(data)
+            full = self._disk_bytes > self.max_disk_bytes
+        if full:
+            self._trim_disk()
+
+    def get(self, key):
+        """ The cached (mimetype, body) for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+        if self.directory:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+                    self.stats['disk_hits'] += 1
+                return entry
+        return None
+
+    def put(self, key, mimetype, body):
+        entry = (mimetype, bytes(body))
+        with self._lock:
+            self._remember(key, entry)
+        if self.directory:
+            self._write_disk(key, entry)
+
+    def get_or_compute(self, key, compute):
+        """ The cached entry for key, computing and storing it on a miss.
+        Args:
+            key (str): From cache_key.
+            compute (callable): Returns (mimetype, body bytes). Exceptions reach every waiting caller
+                and nothing is cached.
+        Returns:
+            tuple: (mimetype, body, whether it came from the cache)."""
+        entry = self.get(key)
+        if entry is not None:
+            return entry[0], entry[1], True
+        with self._lock:
+            # Finished by another caller between the lookup above and here.
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0], entry[1], True
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value[0], pending.value[1], True
+        try:
+            mimetype, body = compute()
+            self.put(key, mimetype, body)
+            pending.value = (mimetype, bytes(body))
+        except BaseException as error:
+            pending.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+        return mimetype, pending.value[1], False
+
+    def clear(self):
+        """ Empties the memory tier. The disk tier is left for other processes."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
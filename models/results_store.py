@@ -0,0 +1,304 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+manifest_name = 'manifest.json'
+
+
+class ResultsStore:
+    """ Append-only columnar store for per-replication results.
+    Each append becomes a chunk directory holding one .npy file per column, so readers can memory-map
+    a column without loading the rest. String columns named in dictionary_columns are stored as integer
+    codes into a per-store dictionary. Chunks keep the range of their 'cell' column and the codes they
+    contain, so filtered reads skip chunks that cannot match.
+    Optional trajectories are stored per chunk as one (points, 2) float32 array plus row offsets."""
+    def __init__(self, path, dictionary_columns=('armor_type', 'environment')):
+        self.path = path
+        manifest_path = os.path.join(path, manifest_name)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.manifest = {
+                'columns': {},
+                'dictionaries': {column: [] for column in dictionary_columns},
+                'chunks': [],
+                'next_chunk': 0,
+                'metadata': {},
+            }
+            self._save_manifest()
+
+    def _save_manifest(self):
+        # Replaced in one step so a crash never leaves a half written manifest.
+        path = os.path.join(self.path, manifest_name)
+        partial = path + '.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+        os.replace(partial, path)
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def metadata(self):
+        """ Free-form JSON metadata saved with the manifest, such as the sweep settings."""
+        return self.manifest['metadata']
+
+    def set_metadata(self, **values):
+        self.manifest['metadata'].update(values)
+        self._save_manifest()
+
+    def __len__(self):
+        return sum(chunk['rows'] for chunk in self.manifest['chunks'])
+
+    def tags(self):
+        """ Every tag passed to append, in append order. Used to tell which work is already stored."""
+        return [tag for chunk in self.manifest['chunks'] for tag in chunk['tags']]
+
+    def _encode(self, column, values):
+        dictionary = self.manifest['dictionaries'][column]
+        index = {value: code for code, value in enumerate(dictionary)}
+        codes = np.empty(len(values), dtype=np.int16)
+        for i, value in enumerate(values):
+            if value not in index:
+                index[value] = len(dictionary)
+                dictionary.append(value)
+            codes[i] = index[value]
+        return codes
+
+    def append(self, columns, trajectories=None, tag=None):
+        """ Writes one chunk.
+        Args:
+            columns (dict): Column name -> sequence, all the same length. The first append fixes the columns.
+            trajectories (list | None): One (points, 2) array per row.
+            tag: JSON value recorded with the chunk, returned by tags().
+        Returns:
+            int: Number of rows written."""
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("Every column in an append needs the same number of rows.")
+        rows = lengths.pop()
+        if self.manifest['columns'] and set(columns) != set(self.manifest['columns']):
+            raise ValueError(f"Columns {sorted(columns)} do not match the store columns {self.columns}.")
+        if trajectories is not None and len(trajectories) != rows:
+            raise ValueError("Trajectories need one entry per row.")
+
+        arrays = {}
+        for name, values in columns.items():
+            if name in self.manifest['dictionaries']:
+                arrays[name] = self._encode(name, list(values))
+            else:
+                arrays[name] = np.asarray(values)
+        if not self.manifest['columns']:
+            self.manifest['columns'] = {name: array.dtype.str for name, array in arrays.items()}
+        else:
+            arrays = {name: arrays[name].astype(dtype, copy=False) for name, dtype in self.manifest['columns'].items()}
+
+        name = self._next_name()
+        partial = os.path.join(self.path, name + '.partial')
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        for column, array in arrays.items():
+            np.save(os.path.join(partial, column + '.npy'), array)
+        if trajectories is not None:
+            offsets = np.zeros(rows + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(points) for points in trajectories])
+            points = np.concatenate([np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in trajectories]) \
+                if rows else np.zeros((0, 2), dtype=np.float32)
+            np.save(os.path.join(partial, 'trajectory_points.npy'), points)
+            np.save(os.path.join(partial, 'trajectory_offsets.npy'), offsets)
+        self._commit(partial, name)
+
+        self.manifest['chunks'].append({
+            'name': name,
+            'rows': rows,
+            'tags': [] if tag is None else [tag],
+            'trajectories': trajectories is not None,
+            'cell_range': [int(arrays['cell'].min()), int(arrays['cell'].max())] if 'cell' in arrays and rows else None,
+            'codes': {column: sorted(set(arrays[column].tolist())) for column in self.manifest['dictionaries']
+                      if column in arrays},
+        })
+        self._save_manifest()
+        return rows
+
+    def _chunk_may_match(self, chunk, where):
+        for column, wanted in where.items():
+            if column == 'cell' and chunk['cell_range'] is not None:
+                low, high = chunk['cell_range']
+                if not any(low <= value <= high for value in wanted):
+                    return False
+            elif column in chunk['codes']:
+                if not set(wanted) & set(chunk['codes'][column]):
+                    return False
+        return True
+
+    def _normalize_where(self, where):
+        """ Turns {column: value or values} into {column: list of stored values}, encoding strings."""
+        normalized = {}
+        for column, values in (where or {}).items():
+            if column not in self.manifest['columns']:
+                raise ValueError(f"Column '{column}' not found in the results store.")
+            values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+            if column in self.manifest['dictionaries']:
+                dictionary = self.manifest['dictionaries'][column]
+                values = [dictionary.index(v) for v in values if v in dictionary]
+            normalized[column] = values
+        return normalized
+
+    def _next_name(self):
+        # Chunk names are never reused, even after compact removes chunks.
+        name = f"chunk{self.manifest['next_chunk']:06d}"
+        self.manifest['next_chunk'] += 1
+        return name
+
+    def _commit(self, partial, name):
+        # A directory under this name can only be left over from a crash before the manifest was saved.
+        target = os.path.join(self.path, name)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(partial, target)
+
+    def _load(self, chunk, column, mmap):
+        return np.load(os.path.join(self.path, chunk['name'], column + '.npy'), mmap_mode='r' if mmap else None)
+
+    def _selected(self, where, mmap):
+        """ Yields (chunk, row mask or None) for every chunk that can match."""
+        for chunk in self.manifest['chunks']:
+            if not self._chunk_may_match(chunk, where):
+                continue
+            mask = None
+            for column, values in where.items():
+                match = np.isin(self._load(chunk, column, mmap), values)
+                mask = match if mask is None else mask & match
+            if mask is None or mask.any():
+                yield chunk, mask
+
+    def read(self, columns=None, where=None, decode=True, mmap=True):
+        """ Reads columns for the rows matching where.
+        Args:
+            columns (list | None): Columns to return. Defaults to all.
+            where (dict | None): Column -> value or list of values. Rows must match every entry.
+            decode (bool): Return dictionary columns as strings instead of codes.
+            mmap (bool): Memory-map the chunk files instead of reading them.
+        Returns:
+            dict: Column name -> numpy array."""
+        columns = self.columns if columns is None else list(columns)
+        where = self._normalize_where(where)
+        parts = {column: [] for column in columns}
+        for chunk, mask in self._selected(where, mmap):
+            for column in columns:
+                array = self._load(chunk, column, mmap)
+                parts[column].append(array if mask is None else array[mask])
+        result = {}
+        for column in columns:
+            dtype = np.dtype(self.manifest['columns'][column])
+            array = np.concatenate(parts[column]) if parts[column] else np.zeros(0, dtype=dtype)
+            if decode and column in self.manifest['dictionaries']:
+                array = np.array(self.manifest['dictionaries'][column], dtype=object)[array] \
+                    if array.size else np.zeros(0, dtype=object)
+            result[column] = array
+        return result
+
+    def trajectories(self, where=None):
+        """ Trajectories of the rows matching where, as (points, 2) arrays, for chunks written with them."""
+        where = self._normalize_where(where)
+        paths = []
+        for chunk, mask in self._selected(where, mmap=True):
+            if not chunk['trajectories']:
+                continue
+            points = self._load(chunk, 'trajectory_points', True)
+            offsets = self._load(chunk, 'trajectory_offsets', True)
+            rows = range(chunk['rows']) if mask is None else np.flatnonzero(mask)
+            paths.extend(np.asarray(points[offsets[i]:offsets[i + 1]]) for i in rows)
+        return paths
+
+    def groups(self, keys, columns, where=None):
+        """ Splits the matching rows by the distinct values of the key columns.
+        Returns:
+            dict: Tuple of key values -> {column: array}, in first appearance order."""
+        data = self.read(list(keys) + list(columns), where=where)
+        labels = list(zip(*(data[key].tolist() for key in keys)))
+        order = {}
+        for i, label in enumerate(labels):
+            order.setdefault(label, []).append(i)
+        return {label: {column: data[column][rows] for column in columns} for label, rows in order.items()}
+
+    def to_pandas(self, columns=None, where=None):
+        """ Matching rows as a pandas DataFrame with categorical dictionary columns. Needs pandas."""
+        import pandas as pd
+        data = self.read(columns, where=where, decode=False)
+        frame = pd.DataFrame(data)
+        for column in self.manifest['dictionaries']:
+            if column in frame:
+                frame[column] = pd.Categorical.from_codes(frame[column], self.manifest['dictionaries'][column])
+        return frame
+
+    def order_by_tag(self):
+        """ Reorders chunks by their first tag, so reads come back in tag order whatever the append order."""
+        self.manifest['chunks'].sort(key=lambda chunk: (not chunk['tags'], chunk['tags'][:1]))
+        self._save_manifest()
+
+    def compact(self, target_rows=65536):
+        """ Merges runs of small chunks into chunks of about target_rows rows, keeping their tags."""
+        chunks = self.manifest['chunks']
+        merged, group = [], []
+
+        def flush():
+            if len(group) == 1:
+                merged.append(group[0])
+            elif group:
+                merged.append(self._merge(group))
+            group.clear()
+
+        for chunk in chunks:
+            if group and (sum(c['rows'] for c in group) + chunk['rows'] > target_rows
+                          or chunk['trajectories'] != group[0]['trajectories']):
+                flush()
+            group.append(chunk)
+        flush()
+        stale = {chunk['name'] for chunk in chunks} - {chunk['name'] for chunk in merged}
+        self.manifest['chunks'] = merged
+        self._save_manifest()
+        for name in stale:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _merge(self, group):
+        name = self._next_name()
+        partial = os.path.join(self.path, name + '.partial')
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        for column in self.columns:
+            np.save(os.path.join(partial, column + '.npy'),
+                    np.concatenate([self._load(chunk, column, False) for chunk in group]))
+        if group[0]['trajectories']:
+            points = [self._load(chunk, 'trajectory_points', False) for chunk in group]
+            offsets, base = [np.zeros(1, dtype=np.int64)], 0
+            for chunk, chunk_points in zip(group, points):
+                offsets.append(self._load(chunk, 'trajectory_offsets', False)[1:] + base)
+                base += len(chunk_points)
+            np.save(os.path.join(partial, 'trajectory_points.npy'), np.concatenate(points))
+            np.save(os.path.join(partial, 'trajectory_offsets.npy'), np.concatenate(offsets))
+        self._commit(partial, name)
+        ranges = [chunk['cell_range'] for chunk in group if chunk['cell_range'] is not None]
+        return {
+            'name': name,
+            'rows': sum(chunk['rows'] for chunk in group),
+            'tags': [tag for chunk in group for tag in chunk['tags']],
+            'trajectories': group[0]['trajectories'],
+            'cell_range': [min(r[0] for r in ranges), max(r[1] for r in ranges)] if ranges else None,
+            'codes': {column: sorted(set().union(*(chunk['codes'].get(column, []) for chunk in group)))
+                      for column in group[0]['codes']},
+        }
+
+    def export_csv(self, path, where=None):
+        """ Writes the matching rows to a CSV file with decoded dictionary columns."""
+        import csv
+        data = self.read(where=where)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(zip(*(data[column].tolist() for column in self.columns)))
+        return path
@@ -0,0 +1,30 @@
+import numpy as np
+
+# One independent stream per kind of draw. Keeping them apart means a change that alters how many
+# combat draws happen (say, a different armor type) does not shift the movement or encounter draws,
+# which is what common random numbers across a sweep rely on.
+# New names go at the end: SeedSequence children are numbered, so the earlier streams keep their draws.
+stream_names = ('spawn', 'movement', 'terrain', 'encounter', 'combat', 'red')
+
+
+class RandomStreams:
+    """ Named numpy Generators for one simulation run."""
+    def __init__(self, generators):
+        for name, generator in zip(stream_names, generators):
+            setattr(self, name, generator)
+
+
+def make_streams(seed=None):
+    """ Builds the random streams for a run.
+    Args:
+        seed: None for fresh entropy, an int or SeedSequence to spawn independent named streams,
+            a Generator to use one shared stream for everything, or an existing RandomStreams.
+    Returns:
+        RandomStreams: Generators for every entry of stream_names."""
+    if isinstance(seed, RandomStreams):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        return RandomStreams([seed] * len(stream_names))
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return RandomStreams([np.random.default_rng(child) for child in seed_seq.spawn(len(stream_names))])
+
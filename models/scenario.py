@@ -0,0 +1,255 @@
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from math import erf, exp, pi, sqrt
+
+import numpy as np
+
+from .config import load_config, merge_config
+from .squad_state import exhaustion_thresholds
+
+# Mean and standard deviation of the per-hit casualty filter applied in each environment.
+# None means every hit counts.
+casualty_filters = {
+    'Krulak’s Three Block War': None,
+    'Pershing’s Ghost': (0.75, 0.05),
+    'Nightmare from Mattis Street': (0.25, 0.05),
+}
+
+
+def _filter_probability(mean, sd):
+    """ Probability that a single hit passes the filter normal(mean, sd) > random().
+    The normal draw is independent for every hit, so this is P(X > U) = E[clip(X, 0, 1)].
+    Args:
+        mean (float): Mean of the normal draw.
+        sd (float): Standard deviation of the normal draw.
+    Returns:
+        float: Probability that the hit becomes a casualty."""
+    def antiderivative(z):
+        # Integral of the standard normal CDF: z * Phi(z) + phi(z)
+        cdf = 0.5 * (1 + erf(z / sqrt(2)))
+        pdf = exp(-0.5 * z * z) / sqrt(2 * pi)
+        return z * cdf + pdf
+    return 1 - sd * (antiderivative((1 - mean) / sd) - antiderivative(-mean / sd))
+
+
+# Engagements only happen within 1000 m, so the ballistic tables cover that range.
+ballistic_range = 1000
+# Distance step (m) of the ballistic tables.
+ballistic_step = 1.0
+
+
+def _velocity(coef, distance):
+    c1, c2, c3 = coef
+    return c1 * distance**2 + c2 * distance + c3
+
+
+def _logistic(beta, velocity):
+    beta0, beta1 = beta
+    return 1 / (1 + np.exp(-(beta0 + velocity * beta1)))
+
+
+@lru_cache(maxsize=4096)
+def _defeat_closed_form(velocity_coef, defeat_coef, distance):
+    """ Closed form defeat probability for a distance off the table grid. Arguments are tuples so they hash."""
+    return float(_logistic(defeat_coef, _velocity(velocity_coef, distance)))
+
+
+class ScenarioTables:
+    """ Every config lookup the simulation needs, flattened into arrays indexed by integer id.
+    Built once per config; individual runs share it through Scenario."""
+    def __init__(self, config):
+        self.map_size = config["map_size"]
+        self.stop_time = config["stop_time"]
+        self.fire_rates = dict(config["fire_rates"])
+        # Exhaustion threshold by whole minute of patrol time, so runs never evaluate the power law.
+        self.exhaustion_threshold_list = exhaustion_thresholds(self.stop_time)
+        self.exhaustion_threshold = np.array(self.exhaustion_threshold_list)
+
+        terrain_library = config["terrain_library"]
+        self.terrain_names = list(terrain_library.keys())
+        self.terrain_ids = {name: i for i, name in enumerate(self.terrain_names)}
+        self.terrain_cost = np.array([values[0] for values in terrain_library.values()], dtype=float)
+        # Cumulative integer percents, so a roll of 1-100 picks the first bucket with roll <= cdf.
+        self.terrain_cdf = np.cumsum([int(values[1] * 100) for values in terrain_library.values()])
+
+        threat_library = config["threat_library"]
+        self.threat_names = list(threat_library.keys())
+        self.threat_ids = {name: i for i, name in enumerate(self.threat_names)}
+        # Rows of [a, b, c] for v(x) = ax^2 + bx + c
+        self.velocity_coef = np.array([threat_library[t] for t in self.threat_names], dtype=float)
+
+        armor_profiles = config["armor_profiles"]
+        self.armor_names = list(armor_profiles.keys())
+        self.armor_ids = {name: i for i, name in enumerate(self.armor_names)}
+        self.armor_mass = np.array([profile['Mass'] for profile in armor_profiles.values()], dtype=float)
+        # [armor, threat] -> [beta0, beta1] of the logistic defeat probability
+        self.defeat_coef = np.array(
+            [[profile[t] for t in self.threat_names] for profile in armor_profiles.values()], dtype=float
+        )
+
+        threat_probs = config["threat_probs"]
+        self.environment_names = list(threat_probs.keys())
+        self.environment_ids = {name: i for i, name in enumerate(self.environment_names)}
+        # [environment, threat] probabilities in threat id order
+        self.threat_p = np.array(
+            [[probs.get(t, 0) for t in self.threat_names] for probs in threat_probs.values()], dtype=float
+        )
+        self.filter_p = np.array([
+            1.0 if casualty_filters.get(env) is None else _filter_probability(*casualty_filters[env])
+            for env in self.environment_names
+        ])
+
+        # Projectile velocity [threat, distance] and defeat probability [armor, threat, distance] on a fixed grid.
+        self.distance_grid = np.arange(0, ballistic_range + ballistic_step / 2, ballistic_step)
+        self.velocity_table = _velocity(self.velocity_coef.T[:, :, None], self.distance_grid)
+        self.defeat_table = _logistic(
+            np.moveaxis(self.defeat_coef, -1, 0)[:, :, :, None], self.velocity_table[None, :, :]
+        )
+        # Shared by every run in the process, including runs on other threads, so nothing may write to them.
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+
+
+class Scenario:
+    """ Compiled tables for one run: the shared ScenarioTables plus the rows picked by the run params.
+    Anything used inside the time step loop is a plain float, list or array indexed by integer id.
+    Everything a run needs from the config, its map size included, is read from here rather than from
+    module globals, and nothing changes it after construction, so concurrent runs cannot interfere."""
+    def __init__(self, params, tables=None):
+        # params may carry 'config_overrides', which picks a variant of the config for this run only.
+        tables = tables or load_tables(params.get('config_overrides'))
+        self.tables = tables
+        self.map_size = params.get("map_size", tables.map_size)
+        self.stop_time = tables.stop_time
+        self.fire_rates = tables.fire_rates
+        self.exhaustion_threshold = tables.exhaustion_threshold
+        self.exhaustion_threshold_list = tables.exhaustion_threshold_list
+        self.terrain_names = tables.terrain_names
+        self.terrain_cost = tables.terrain_cost
+        self.terrain_cost_list = tables.terrain_cost.tolist()
+        self.terrain_cdf = tables.terrain_cdf
+        self.terrain_cdf_list = tables.terrain_cdf.tolist()
+        self.threat_names = tables.threat_names
+        self.velocity_coef = tables.velocity_coef
+        self.velocity_rows = tables.velocity_coef.tolist()
+
+        armor = params.get('armor_type')
+        if armor not in tables.armor_ids:
+            raise ValueError(f"Armor type '{armor}' not found in armor profiles.")
+        self.armor_id = tables.armor_ids[armor]
+        self.defeat_coef = tables.defeat_coef[self.armor_id]
+        self.defeat_rows = self.defeat_coef.tolist()
+        self.distance_grid = tables.distance_grid
+        self.defeat_table = tables.defeat_table[self.armor_id]
+        # Python lists are faster than array indexing for one lookup at a time.
+        self._defeat_table_rows = self.defeat_table.tolist()
+        self._ballistic_keys = [
+            (tuple(velocity), tuple(defeat)) for velocity, defeat in zip(self.velocity_rows, self.defeat_rows)
+        ]
+        # Base Combat Load (kg) (Fish and Scharre, 2018, p. 13)
+        self.soldier_load = 20.6497926 + float(tables.armor_mass[self.armor_id])
+
+        # Patrol on its own does not need an environment.
+        env = params.get('environment')
+        self.environment_id = tables.environment_ids.get(env)
+        if env is not None and self.environment_id is None:
+            raise ValueError(f"Environment '{env}' not found in threat probabilities.")
+        if self.environment_id is not None:
+            self.threat_p = tables.threat_p[self.environment_id]
+            self.threat_cdf_list = np.cumsum(self.threat_p).tolist()
+            self.filter_p = float(tables.filter_p[self.environment_id])
+
+    def projectile_velocity(self, threat_id, distance):
+        """ Projectile velocity of a threat at distance (m), in the units of the threat library."""
+        c1, c2, c3 = self.velocity_rows[threat_id]
+        return c1 * distance**2 + c2 * distance + c3
+
+    def defeat_probability(self, threat_id, velocity):
+        """ Probability that a threat at the given velocity defeats this run's armor."""
+        beta0, beta1 = self.defeat_rows[threat_id]
+        return 1 / (1 + exp(-(beta0 + velocity * beta1)))
+
+    def defeat_at_distance(self, threat_id, distance):
+        """ Probability that a threat fired from distance (m) defeats this run's armor.
+        Reads the precomputed table with linear interpolation; distances off the grid use the cached closed form."""
+        position = distance / ballistic_step
+        i = int(position)
+        row = self._defeat_table_rows[threat_id]
+        last = len(row) - 1
+        if position < 0 or position > last:
+            return _defeat_closed_form(*self._ballistic_keys[threat_id], distance)
+        if i == last:
+            return row[i]
+        low = row[i]
+        return low + (position - i) * (row[i + 1] - low)
+
+    def defeat_at_distances(self, threat_ids, distances):
+        """ Vectorized defeat_at_distance for arrays of threat ids and distances."""
+        threat_ids = np.asarray(threat_ids)
+        distances = np.asarray(distances, dtype=float)
+        position = distances / ballistic_step
+        last = len(self.distance_grid) - 1
+        i = np.clip(np.floor(position).astype(int), 0, last - 1)
+        fraction = position - i
+        table = self.defeat_table
+        probability = table[threat_ids, i] + fraction * (table[threat_ids, i + 1] - table[threat_ids, i])
+        off_grid = (position < 0) | (position > last)
+        if off_grid.any():
+            probability[off_grid] = [
+                _defeat_closed_form(*self._ballistic_keys[t], d)
+                for t, d in zip(threat_ids[off_grid].tolist(), distances[off_grid].tolist())
+            ]
+        return probability
+
+
+# Compiled tables for override sets seen recently, keyed by their canonical JSON.
+max_override_tables = 16
+_tables = {'stamp': None, 'default': None, 'overrides': OrderedDict()}
+_tables_lock = threading.Lock()
+
+
+def load_tables(overrides=None):
+    """ ScenarioTables for the config file, or for the config with overrides merged in.
+    Tables are compiled on first use and kept until the config file changes, so importing the models
+    reads nothing and every later run shares one copy per process.
+    Args:
+        overrides (dict | None): Config sections to change, as for config.merge_config.
+    Returns:
+        ScenarioTables: Shared tables; treat them as read-only."""
+    config = load_config()
+    with _tables_lock:
+        if _tables['stamp'] is not config:
+            # A new config object means the file changed, so every compiled variant is stale.
+            _tables.update(stamp=config, default=None, overrides=OrderedDict())
+        if not overrides:
+            if _tables['default'] is None:
+                _tables['default'] = ScenarioTables(config)
+            return _tables['default']
+        key = json.dumps(overrides, sort_keys=True)
+        cached = _tables['overrides'].get(key)
+        if cached is not None:
+            _tables['overrides'].move_to_end(key)
+            return cached
+    tables = ScenarioTables(merge_config(config, overrides))
+    with _tables_lock:
+        _tables['overrides'][key] = tables
+        while len(_tables['overrides']) > max_override_tables:
+            _tables['overrides'].popitem(last=False)
+    return tables
+
+
+def __getattr__(name):
+    # default_tables and config stay importable without compiling anything at import time.
+    if name == 'default_tables':
+        return load_tables()
+    if name == 'config':
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def compile_scenario(params):
+    """ Builds the Scenario for one set of run params, against the config with any 'config_overrides' applied."""
+    return Scenario(params)
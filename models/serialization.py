@@ -0,0 +1,110 @@
+import json
+import math
+import struct
+
+import numpy as np
+
+# Leading bytes of the binary response format, followed by the header length.
+binary_magic = b'SQS1'
+binary_mimetype = 'application/x-squad-arrays'
+
+
+def _default(obj):
+    """ json.dumps hook for the NumPy values results can carry."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            finite = np.isfinite(obj)
+            if not finite.all():
+                # One vectorized mask instead of a check per element.
+                return np.where(finite, obj, None).tolist()
+        return obj.tolist()
+    if isinstance(obj, np.floating):
+        value = float(obj)
+        return value if math.isfinite(value) else None
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _replace_non_finite(obj):
+    # Only reached when a plain float somewhere is NaN or infinite; arrays are left for _default.
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _replace_non_finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(v) for v in obj]
+    return obj
+
+
+def dumps(obj):
+    """ JSON text for a result, with NaN and infinity written as null like make_json_safe.
+    Lists of plain floats go straight through the C encoder and NumPy arrays are converted in bulk,
+    so nothing is walked in Python unless a plain float in the result is not finite.
+    Returns:
+        str: Compact JSON."""
+    try:
+        return json.dumps(obj, default=_default, allow_nan=False, separators=(',', ':'), ensure_ascii=False)
+    except ValueError:
+        return json.dumps(_replace_non_finite(obj), default=_default, allow_nan=False,
+                          separators=(',', ':'), ensure_ascii=False)
+
+
+def pack(data, arrays):
+    """ Binary response: a JSON header followed by raw little-endian arrays.
+    Layout: binary_magic, a uint32 header length, the UTF-8 JSON header {'data': data, 'arrays':
+    {name: {'dtype', 'shape', 'offset'}}}, then the arrays. The array section starts at the first
+    multiple of 8 bytes after the header and every offset is counted from there and 8 byte aligned,
+    so a browser can view each array as a Float32Array without copying.
+    Args:
+        data: JSON serializable part of the response.
+        arrays (dict): Name -> numpy array. Float arrays are sent as float32.
+    Returns:
+        bytes: The packed response."""
+    specs, blobs, offset = {}, [], 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        dtype = np.dtype('<f4') if array.dtype.kind == 'f' else array.dtype.newbyteorder('<')
+        raw = np.ascontiguousarray(array, dtype=dtype).tobytes()
+        specs[name] = {'dtype': dtype.str, 'shape': list(array.shape), 'offset': offset}
+        blobs.append(raw + b'\0' * (-len(raw) % 8))
+        offset += len(blobs[-1])
+    header = dumps({'data': data, 'arrays': specs}).encode('utf-8')
+    padding = b' ' * (-(8 + len(header)) % 8)
+    return b''.join([binary_magic, struct.pack('<I', len(header)), header, padding] + blobs)
+
+
+def unpack(buffer):
+    """ Reverses pack.
+    Returns:
+        tuple: The data and a dict of name -> numpy array."""
+    buffer = memoryview(buffer)
+    if bytes(buffer[:4]) != binary_magic:
+        raise ValueError("Not a packed results buffer.")
+    (length,) = struct.unpack('<I', buffer[4:8])
+    header = json.loads(bytes(buffer[8:8 + length]).decode('utf-8'))
+    base = 8 + length + (-(8 + length) % 8)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=np.dtype(spec['dtype']), count=count, offset=base + spec['offset']
+        ).reshape(spec['shape'])
+    return header['data'], arrays
+
+
+def pack_simulation(result):
+    """ pack() for a run_simulation result, with the blue trajectory sent as arrays.
+    'blue.position_history' is (steps, 2). 'blue.exhaustion_data' is (rows, 1 + blue_stock): each
+    row is [threshold, levels of the living soldiers] padded with NaN, and the all zero starting row
+    is left out. Everything else goes in the JSON header unchanged.
+    Returns:
+        bytes: The packed response."""
+    blue = dict(result['blue'])
+    positions = np.asarray(blue.pop('position_history'), dtype=float).reshape(-1, 2)
+    exhaustion_data = blue.pop('exhaustion_data')[1:]
+    width = max((len(row) for row in exhaustion_data), default=1)
+    exhaustion = np.full((len(exhaustion_data), width), np.nan)
+    for i, row in enumerate(exhaustion_data):
+        exhaustion[i, :len(row)] = row
+    return pack(dict(result, blue=blue), {'blue.position_history': positions, 'blue.exhaustion_data': exhaustion})
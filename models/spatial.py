@@ -0,0 +1,84 @@
+import math
+
+
+class UniformGrid:
+    """ Spatial index that buckets keyed points into square cells.
+    With the cell size set to the engagement range, everything within range of a point lies in the
+    3 x 3 block of cells around it, so a range query touches a fixed number of cells however many
+    points are indexed. Moving a point only touches the index when it crosses into another cell."""
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive.")
+        self.cell_size = cell_size
+        self._cells = {}   # (column, row) -> set of keys
+        self._where = {}   # key -> (column, row)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, x, y):
+        if key in self._where:
+            raise ValueError(f"Key {key!r} is already in the grid.")
+        cell = self._cell(x, y)
+        self._where[key] = cell
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        cell = self._where.pop(key)
+        bucket = self._cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self._cells[cell]
+
+    def move(self, key, x, y):
+        cell = self._cell(x, y)
+        if self._where[key] != cell:
+            self.remove(key)
+            self._where[key] = cell
+            self._cells.setdefault(cell, set()).add(key)
+
+    def _ring(self, column, row, radius):
+        """ Keys in the cells exactly radius cells (Chebyshev) from (column, row)."""
+        cells = self._cells
+        if radius == 0:
+            yield from cells.get((column, row), ())
+            return
+        for i in range(column - radius, column + radius + 1):
+            yield from cells.get((i, row - radius), ())
+            yield from cells.get((i, row + radius), ())
+        for j in range(row - radius + 1, row + radius):
+            yield from cells.get((column - radius, j), ())
+            yield from cells.get((column + radius, j), ())
+
+    def query(self, x, y, rings=1):
+        """ Keys in the (2 * rings + 1)^2 block of cells centered on the cell holding (x, y).
+        Every key within rings * cell_size of the point is included, along with some further away."""
+        column, row = self._cell(x, y)
+        return [key for radius in range(rings + 1) for key in self._ring(column, row, radius)]
+
+    def nearest(self, x, y, positions):
+        """ Nearest key to (x, y), searching rings of cells outward until nothing closer can remain.
+        Args:
+            positions: Indexable by key, giving the (x, y) each key was last inserted or moved to.
+        Returns:
+            tuple: (key, distance), or (None, inf) for an empty grid."""
+        if not self._where:
+            return None, math.inf
+        column, row = self._cell(x, y)
+        best_key, best = None, math.inf
+        radius = 0
+        while True:
+            for key in self._ring(column, row, radius):
+                distance = math.dist((x, y), positions[key])
+                if distance < best:
+                    best_key, best = key, distance
+            # Keys beyond this ring are at least radius cell widths from the point.
+            if best <= radius * self.cell_size:
+                return best_key, best
+            radius += 1
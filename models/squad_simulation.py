@@ -1,68 +1,59 @@
 import numpy as np
-from math import exp, dist
-import os
-
-# Open config file
-import yaml
-yaml_path = os.path.join(os.path.dirname(__file__), "../config/simulation.yaml")
-with open(yaml_path, "r") as f:
-    config = yaml.safe_load(f)
-
-# Configure logging
-import logging
-import pprint
-pp = pprint.PrettyPrinter(indent=4)
-logging.basicConfig(
-    filename='simulation.log',        # Log file name
-    level=logging.INFO,               # Log level (INFO, DEBUG, etc.)
-    format='%(asctime)s %(levelname)s: %(message)s'
-)
+from bisect import bisect_right
+from math import exp
 
 from .blue_patrol import Patrol
+from .config import config_sections, load_config
+from .red_patrol import RedForce, spawn_red_patrol
+from .rng import make_streams
+from .scenario import Scenario, _filter_probability, casualty_filters, compile_scenario
+from .trace import INFO, null_tracer
 
-threat_library = config["threat_library"]
-armor_profiles = config["armor_profiles"]
-threat_probs = config["threat_probs"]
-terrain_library = config["terrain_library"]
-fire_rates = config["fire_rates"]
-map_size = config["map_size"]
-stop_time = config["stop_time"]
+def __getattr__(name):
+    # Config sections (armor_profiles, stop_time, ...) are read from the cached config on access.
+    if name in config_sections:
+        return load_config()[name]
+    if name == 'config':
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+# Generator used by the engagement resolvers when the caller does not supply one.
+_combat_rng = np.random.default_rng()
  
-# This is for projectile velocity calculation, not the patrol velocity.
-def _projectile_velocity(threat, distance):
-    c1, c2, c3 = threat_library[threat]
-    return c1 * distance**2 + c2 * distance + c3
+def _draw_threat(scenario, roll):
+    """ Picks a threat id for the scenario's environment from a uniform roll in [0, 1)."""
+    # Scaling by the total keeps rounding in the cumulative sum from selecting a zero-probability threat.
+    cdf = scenario.threat_cdf_list
+    return bisect_right(cdf, roll * cdf[-1])
 
-def _get_defeat_probability(armor, threat, velocity):
-    beta0, beta1 = armor_profiles[armor][threat]
-    exponent = beta0 + velocity * beta1
-    return np.exp(exponent) / (1 + np.exp(exponent))
+def _attack(blue_patrol, red_patrol, env, armor, distance, scenario=None, rng=None):
+    if scenario is None:
+        scenario = Scenario({'armor_type': armor, 'environment': env})
+    fire_rates = scenario.fire_rates
+    rng = _combat_rng if rng is None else rng
 
-def _attack(blue_patrol, red_patrol, env, armor, distance):
-
-    logging.info("Attack activated")
     # Blue shots
-    blue_shots = np.random.randint(fire_rates["blue_min"], fire_rates["blue_max"] + 1) * blue_patrol.get_stock()
+    blue_shots = int(rng.integers(fire_rates["blue_min"], fire_rates["blue_max"] + 1)) * blue_patrol.get_stock()
     prob_blue_hit = exp(-0.005 * distance)
-    blue_hits = sum(np.random.random() < prob_blue_hit for _ in range(blue_shots))
+    blue_hits = sum(rng.random() < prob_blue_hit for _ in range(blue_shots))
     if env == 'Krulak’s Three Block War':
         red_casualties = int(min(red_patrol['stock'], blue_hits))
     elif env == 'Pershing’s Ghost':
-        red_casualties = int(min(red_patrol['stock'], sum(np.random.normal(0.75, 0.05) > np.random.random() for _ in range(blue_hits))))
+        red_casualties = int(min(red_patrol['stock'], sum(rng.normal(0.75, 0.05) > rng.random() for _ in range(blue_hits))))
     elif env == 'Nightmare from Mattis Street':
-        red_casualties = int(min(red_patrol['stock'], sum(np.random.normal(0.25, 0.05) > np.random.random() for _ in range(blue_hits))))
+        red_casualties = int(min(red_patrol['stock'], sum(rng.normal(0.25, 0.05) > rng.random() for _ in range(blue_hits))))
     else:
         # Unknown env? treat it as the easiest. Need to figure out a way to throw an exception here.
         red_casualties = min(red_patrol['stock'], blue_hits)
         
     # red shots
-    red_shots = np.random.randint(fire_rates["red_min"], fire_rates["red_max"] + 1) * red_patrol['stock']
-    red_threat = np.random.choice(list(threat_probs[env].keys()), p=list(threat_probs[env].values()))
-    red_velocity = _projectile_velocity(red_threat, distance)
+    red_shots = int(rng.integers(fire_rates["red_min"], fire_rates["red_max"] + 1)) * red_patrol['stock']
+    red_threat = _draw_threat(scenario, rng.random())
     prob_red_hit = exp(-0.005 * distance)
-    red_hits = sum(np.random.random() < prob_red_hit for _ in range(red_shots))
-    red_defeats = sum(np.random.random() < _get_defeat_probability(armor, red_threat, red_velocity) for _ in range(red_hits))
+    red_hits = sum(rng.random() < prob_red_hit for _ in range(red_shots))
+    # Projectile velocity and armor defeat come from the scenario's precomputed ballistic table.
+    prob_defeat = scenario.defeat_at_distance(red_threat, distance)
+    red_defeats = sum(rng.random() < prob_defeat for _ in range(red_hits))
     blue_casualties = int(min(blue_patrol.get_stock(), red_defeats))
 
     # Return shots and deaths for both sides
@@ -72,9 +63,49 @@ def _attack(blue_patrol, red_patrol, env, armor, distance):
         'blue_shots': blue_shots,
         'red_shots': red_shots
     }
-    logging.info(f"Battle Results: {results}")
     return results
 
+def _attack_binomial(blue_patrol, red_patrol, env, armor, distance, scenario=None, rng=None):
+    """ Same engagement as _attack, with every stage drawn as one binomial instead of one draw per round.
+    Args:
+        scenario (Scenario): Compiled tables for the run. Built from env and armor when omitted.
+        rng (numpy.random.Generator): Random source. Defaults to a module level generator.
+    Returns:
+        dict: Shots and casualties for both sides, as for _attack."""
+    if scenario is None:
+        scenario = Scenario({'armor_type': armor, 'environment': env})
+    fire_rates = scenario.fire_rates
+    rng = _combat_rng if rng is None else rng
+    prob_hit = exp(-0.005 * distance)
+
+    # Blue shots
+    blue_shots = int(rng.integers(fire_rates["blue_min"], fire_rates["blue_max"] + 1)) * blue_patrol.get_stock()
+    blue_hits = int(rng.binomial(blue_shots, prob_hit))
+    if scenario.filter_p < 1:
+        blue_hits = int(rng.binomial(blue_hits, scenario.filter_p))
+    red_casualties = int(min(red_patrol['stock'], blue_hits))
+
+    # red shots
+    red_shots = int(rng.integers(fire_rates["red_min"], fire_rates["red_max"] + 1)) * red_patrol['stock']
+    red_threat = _draw_threat(scenario, rng.random())
+    red_hits = int(rng.binomial(red_shots, prob_hit))
+    red_defeats = int(rng.binomial(red_hits, scenario.defeat_at_distance(red_threat, distance)))
+    blue_casualties = int(min(blue_patrol.get_stock(), red_defeats))
+
+    results = {
+        'blue_casualites': blue_casualties,
+        'red_casualites': red_casualties,
+        'blue_shots': blue_shots,
+        'red_shots': red_shots
+    }
+    return results
+
+# Engagement resolvers selectable through run_simulation's resolver argument.
+attack_resolvers = {
+    'per_shot': _attack,
+    'binomial': _attack_binomial,
+}
+
 def make_json_safe(obj):
     if isinstance(obj, np.integer):
         return int(obj)
@@ -92,30 +123,15 @@ def make_json_safe(obj):
     if isinstance(obj, dict):
         return {k: make_json_safe(v) for k, v in obj.items()}
     if isinstance(obj, np.ndarray):
-        return make_json_safe(obj.tolist())
+        if obj.dtype.kind == 'f':
+            finite = np.isfinite(obj)
+            if not finite.all():
+                return np.where(finite, obj, None).tolist()
+        return obj.tolist()
     return obj
 
-def spawn_red_patrol(params, sim_time):
-    """ Spawns a red patrol at a random position on the map with the given stock.
-    Args:
-        params (dict): Simulation parameters including red stock.
-    Returns:
-        dict: A dictionary representing the red patrol with its stock and position."""
-    local_map_size = params.get("map_size", map_size)
-    return {
-        'stock': params['red_stock'],
-        'current_position': (
-            np.random.uniform(0, local_map_size),
-            np.random.uniform(0, local_map_size)
-        ),       
-        'stock_history': [(params['red_stock'], 0)],
-        'spawn_time': sim_time,
-        'removal_time': None,
-        'shots': 0,
-        'warfighters_killed': 0,
-    }
-
-def run_simulation(params, full_log=True):
+def run_simulation(params, full_log=True, resolver='per_shot', tracer=None, rng=None, skip_idle=False,
+                   record_every=1, record_events=()):
     """ Simulates a patrol operation between blue and red forces on a terrain defined by the map_size parmeter. 
     Origin is at the bottom left corner, direction 0 is to the right and rotates counter-clockwise.
     Args:
@@ -124,55 +140,99 @@ def run_simulation(params, full_log=True):
             True allows plotting the path of the squad on a map for visualization.
             False is less memory intensive and faster for multiple iterations (i.e. Monte Carlo simulations)
             Defaults to True. 
+        resolver (str): Name of the engagement resolver in attack_resolvers. 'binomial' draws each volley in closed form.
+            Defaults to 'per_shot'.
+        tracer (Tracer): Receives structured events for the run. Defaults to a disabled tracer.
+        rng: Seed, SeedSequence, numpy Generator or RandomStreams that every draw in the run comes from.
+            A seed spawns separate spawn, movement, terrain, encounter, combat and red streams, so runs that
+            share a seed but differ in armor_type see the same spawns, terrain and encounter rolls.
+            Defaults to fresh entropy.
+        skip_idle (bool): Jump over minutes in which the patrol is too far from every red patrol to engage,
+            given the furthest both sides can move in a minute. Skipped minutes still move the patrol and add
+            exhaustion, with the exhaustion summed in closed form. Needs full_log=False. Defaults to False.
+        record_every (int): With full_log, keep the blue patrol's position and exhaustion every k-th minute.
+            0 keeps only the minutes named in record_events. The last minute is always kept. Defaults to 1.
+        record_events (tuple): 'terrain' and/or 'engagement'; minutes with these events are always kept.
+    params may set 'red_patrols', the number of red patrols live at once (default 1), and 'red_speed',
+    how far (m) each one wanders a minute (default 0). Each minute the blue patrol can only engage the
+    nearest red patrol in range, found through the RedForce spatial index.
     Returns:
-        dict: A dictionary containing the simulation results."""
+        dict: A dictionary containing the simulation results. 'red_patrols' lists every red patrol spawned,
+            newest first, and 'red' is the newest."""
+
+    if resolver not in attack_resolvers:
+        raise ValueError(f"Resolver '{resolver}' not found in attack resolvers.")
+    attack = attack_resolvers[resolver]
+    if skip_idle and full_log:
+        raise ValueError("skip_idle records no per minute data, so it needs full_log=False.")
+    # All config lookups for the run are compiled once here.
+    scenario = compile_scenario(params)
+
+    tracer = tracer or null_tracer
+    # Trace levels are checked once per run; a disabled tracer costs nothing in the loop.
+    trace_info = tracer.enabled(INFO)
+    if trace_info:
+        tracer.emit(INFO, 'start', params=params, full_log=full_log, resolver=resolver)
 
-    logging.info("Start of Simulation")
+    streams = make_streams(rng)
+    encounter = streams.encounter
 
     sim_time = 0
     dt = 1
 
-    red_patrols = [spawn_red_patrol(params, sim_time)]
+    red_force = RedForce(params, sim_time, streams, scenario.map_size)
 
-    blue_patrol = Patrol(params, full_log)
+    blue_patrol = Patrol(params, full_log, tracer=tracer, scenario=scenario, rng=streams,
+                         record_every=record_every, record_events=record_events)
+    # Furthest a patrol can get in one minute: top speed on the cheapest terrain, before exhaustion slows it.
+    max_step = 1.4 * 60 / min(scenario.terrain_cost_list)
+    # Red patrols close the gap too, so an idle window shrinks by their step as well.
+    closing_step = max_step + red_force.speed
 
     combat_log = []
 
     # Simulate patrol movement and combat
-    while sim_time < stop_time and blue_patrol.get_stock() > 0 and red_patrols[0]['stock'] > 0:
+    while sim_time < scenario.stop_time and blue_patrol.get_stock() > 0:
         sim_time += dt
         blue_patrol.patrol_time = sim_time - blue_patrol.spawn_time
 
         deviation = params['direction_deviation']
         blue_patrol.step(deviation)
+        red_force.advance()
 
         #Combat section
-        distance_to_enemy = dist(blue_patrol.current_position, red_patrols[0]['current_position'])
+        slot, distance_to_enemy = red_force.in_range(blue_patrol.current_position)
         if distance_to_enemy != 0:
             prob_attack = 1 / np.sqrt(distance_to_enemy)
         else:
             prob_attack = 1
 
-        if distance_to_enemy <= 1000 and np.random.random() < prob_attack:
-            attack_result = _attack(
-                blue_patrol, red_patrols[0], params['environment'],
-                params['armor_type'], distance_to_enemy
+        # Rolled every minute so the encounter stream stays aligned across runs that share a seed.
+        encounter_roll = encounter.random()
+        if slot is not None and encounter_roll < prob_attack:
+            red = red_force.live[slot]
+            attack_result = attack(
+                blue_patrol, red, params['environment'],
+                params['armor_type'], distance_to_enemy, scenario=scenario, rng=streams.combat
             )
+            if trace_info:
+                tracer.emit(INFO, 'engagement', time=sim_time, distance=distance_to_enemy, **attack_result)
+            if blue_patrol.recorder is not None:
+                blue_patrol.recorder.mark('engagement')
             blue_patrol.take_casualties(attack_result['blue_casualites'], sim_time)
-            red_patrols[0]['stock'] -= attack_result['red_casualites']
+            red['stock'] -= attack_result['red_casualites']
             blue_patrol.hostiles_killed += attack_result['red_casualites']
-            red_patrols[0]['warfighters_killed'] += attack_result['blue_casualites']
+            red['warfighters_killed'] += attack_result['blue_casualites']
             blue_patrol.shots = attack_result['blue_shots']
-            red_patrols[0]['shots'] = attack_result['red_shots']
+            red['shots'] = attack_result['red_shots']
             # set_stock logs the stock history, so we don't need to do it here.
-            red_patrols[0]['stock_history'].append((red_patrols[0]['stock'], sim_time))
+            red['stock_history'].append((red['stock'], sim_time))
 
             if blue_patrol.get_stock() <= 0:
                 blue_patrol.removal_time = sim_time
                 break # Blue patrol is defeated, end simulation
-            if red_patrols[0]['stock'] <= 0:
-                red_patrols[0]['removal_time'] = sim_time
-                red_patrols.insert(0, spawn_red_patrol(params, sim_time)) 
+            if red['stock'] <= 0:
+                red = red_force.replace(slot, sim_time)
             if full_log:
                 # Log all details of this combat event
                 combat_log.append({
@@ -182,32 +242,57 @@ def run_simulation(params, full_log=True):
                     'blue_casualites': attack_result['blue_casualites'],
                     'red_casualites': attack_result['red_casualites'],
                     'blue_position': list(blue_patrol.current_position),
-                    'red_position': list(red_patrols[0]['current_position']),
+                    'red_position': red_force.positions[slot].tolist(),
                     'distance': distance_to_enemy
                 })
-            logging.info(f"Blue Stock: {blue_patrol.get_stock()}")
-            logging.info(f"Red Stock: {red_patrols[0]['stock']}")
+            if trace_info:
+                tracer.emit(INFO, 'stock', time=sim_time, blue=blue_patrol.get_stock(), red=red['stock'])
         else:
             # Exhaustion checks only happen if the patrol is not engaged in combat.
             blue_patrol.set_exhaustion()
             if blue_patrol.is_exhausted():
                 blue_patrol.removal_time = sim_time
                 break # Blue patrol is exhausted, end simulation
+            if not skip_idle:
+                continue
+            clearance = red_force.clearance(blue_patrol.current_position)
+            if clearance > closing_step:
+                # No engagement is possible until the patrols have closed the clearance between them.
+                window = min(int(clearance // closing_step), scenario.stop_time - sim_time)
+                skipped, exhausted = blue_patrol.advance_idle(
+                    sim_time, window, deviation, clearance - window * red_force.speed
+                )
+                red_force.advance(skipped)
+                # Keeps the encounter stream where the minute by minute loop would have left it.
+                encounter.random(skipped)
+                sim_time += skipped
+                if exhausted:
+                    blue_patrol.removal_time = sim_time
+                    break
         
     
     # Convert all tuples to lists for JSON serialization
-    blue_patrol.position_history = [list(pos) for pos in blue_patrol.position_history]
     blue_patrol.stock_history = [list(stock) for stock in blue_patrol.stock_history]
+    red_force.sync()
+    red_patrols = red_force.history
     for patrol in red_patrols:
         patrol['stock_history'] = [list(stock) for stock in patrol['stock_history']]
         patrol['current_position'] = list(patrol['current_position'])
 
+    blue = blue_patrol.to_dict(full_log=full_log)
+    # The recorded histories come straight from float arrays as lists of finite floats, so they skip
+    # the make_json_safe walk below.
+    histories = {key: blue.pop(key) for key in ('position_history', 'exhaustion_data')}
     result = {
-        'blue': blue_patrol.to_dict(full_log=full_log),
+        'blue': blue,
         'red': red_patrols[0],
         'red_patrols': red_patrols,
         'combat_log': combat_log # will be empty if full_log is False.
     }
-    logging.info(pp.pformat(result))
-    return make_json_safe(result)
+    if trace_info:
+        tracer.emit(INFO, 'end', time=sim_time, blue_stock=blue_patrol.get_stock(), red_stock=red_patrols[0]['stock'],
+                    patrol_distance=blue_patrol.patrol_distance, exhaustion=blue_patrol.squad_exhaustion)
+    result = make_json_safe(result)
+    result['blue'].update(histories)
+    return result
 
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+
+
+def exhaustion_threshold(patrol_time):
+    """ Highest sustainable average power (kcal/h) after patrol_time minutes on patrol.
+    Args:
+        patrol_time: Minutes on patrol, a scalar or an array.
+    Returns:
+        The threshold a soldier's average power is measured against."""
+    return 715.0154 * (patrol_time / 60) ** -0.3869002
+
+
+def exhaustion_thresholds(stop_time):
+    """ exhaustion_threshold for every whole minute up to stop_time, indexed by patrol time.
+    Minute 0 is infinite: nobody is exhausted before moving.
+    Returns:
+        list: stop_time + 1 floats."""
+    return [math.inf] + [exhaustion_threshold(minute) for minute in range(1, stop_time + 1)]
+
+
+def pandolf_santee(mass, load, speed, grade, terrain_factor):
+    """ Pandolf-Santee metabolic power (Watts). Works elementwise on scalars or broadcastable arrays.
+    Args:
+        mass: Soldier body mass (kg).
+        load: Carried load (kg).
+        speed: Movement speed.
+        grade: Slope in percent. Negative grades add the Santee downhill correction.
+        terrain_factor: Terrain movement cost.
+    Returns:
+        Power for every soldier (Watts)."""
+    total = mass + load
+    downhill_adjustment = np.where(grade < 0, 1, 0)
+    return (
+        1.5 * mass +
+        2.0 * total * (load / mass)**2 +
+        terrain_factor * total * (1.5 * speed**2 + 0.35 * speed * grade) -
+        downhill_adjustment * terrain_factor * (
+            (grade * speed * total / 3.5) -
+            (total * (grade + 6)**2 / mass) +
+            (25 - speed**2)
+        )
+    )
+
+
+def pandolf_santee_terms(speed, grade, terrain_factor):
+    """ Step dependent factors of pandolf_santee for scalar inputs.
+    For every soldier, pandolf_santee(mass, load, ...) == base + total * x1 + total / mass * x2 + x3,
+    with total = mass + load and base = 1.5 * mass + 2 * total * (load / mass)**2, so sums of these
+    factors over many steps give every soldier's energy without evaluating each step per soldier.
+    Returns:
+        tuple: (x1, x2, x3)."""
+    x1 = terrain_factor * (1.5 * speed**2 + 0.35 * speed * grade)
+    if grade < 0:
+        x1 -= terrain_factor * grade * speed / 3.5
+        return x1, terrain_factor * (grade + 6)**2, -terrain_factor * (25 - speed**2)
+    return x1, 0.0, 0.0
+
+
+class SquadState:
+    """ Structure of arrays for the soldiers of one squad.
+    Soldiers keep their slot for the whole run; casualties only clear their alive flag."""
+    def __init__(self, mass, load):
+        self.mass = np.array(mass, dtype=float)
+        size = len(self.mass)
+        self.load = np.broadcast_to(np.asarray(load, dtype=float), (size,)).copy()
+        self.joules = np.zeros(size)
+        self.exhaustion = np.zeros(size)
+        self.removal_time = np.full(size, np.nan)
+        self.exhausted = np.zeros(size, dtype=bool)
+        self.alive = np.ones(size, dtype=bool)
+        self.count = size
+        self._living = None
+
+    @classmethod
+    def from_records(cls, records):
+        """ Builds the arrays from the list-of-dicts form used by Patrol.squad_data."""
+        squad = cls([r['soldier'] for r in records], [r['load'] for r in records])
+        squad.joules[:] = [r.get('joules_expended', 0) for r in records]
+        squad.exhaustion[:] = [r.get('exhaustion_level', 0) for r in records]
+        squad.exhausted[:] = [r.get('exhausted', False) for r in records]
+        return squad
+
+    def records(self, alive=True):
+        """ Dict view of the living (or dead) soldiers, in slot order.
+        The dicts are copies; changing them does not change the squad."""
+        rows = np.flatnonzero(self.alive if alive else ~self.alive)
+        return [
+            {
+                'soldier': float(self.mass[i]),
+                'load': float(self.load[i]),
+                'joules_expended': float(self.joules[i]),
+                'exhaustion_level': float(self.exhaustion[i]),
+                'removal_time': None if np.isnan(self.removal_time[i]) else int(self.removal_time[i]),
+                'exhausted': bool(self.exhausted[i]),
+                'Killed': not alive,
+            }
+            for i in rows
+        ]
+
+    def remove(self, casualties, sim_time):
+        """ Marks the first living soldiers as casualties, matching the old list slicing order."""
+        rows = np.flatnonzero(self.alive)[:max(0, casualties)]
+        self.alive[rows] = False
+        self.removal_time[rows] = sim_time
+        self.count -= len(rows)
+        if len(rows):
+            self._living = None
+
+    def living(self):
+        """ Slots of the living soldiers and their constant pandolf_santee factors, built once per
+        change of the living set instead of every minute.
+        Returns:
+            tuple: (slots, mass, total, base, scratch) with total = mass + load, base the speed
+                independent part of pandolf_santee and scratch a row one longer than the squad."""
+        if self._living is None:
+            rows = np.flatnonzero(self.alive)
+            mass, load = self.mass[rows], self.load[rows]
+            total = mass + load
+            base = 1.5 * mass + 2.0 * total * (load / mass)**2
+            self._living = (rows, mass, total, base, np.empty(len(rows) + 1))
+        return self._living
+
+    def expend(self, speed, grade, terrain_factor, patrol_time, threshold):
+        """ Adds one minute of Pandolf-Santee energy to every living soldier and updates their exhaustion.
+        Only the speed, grade and terrain dependent part of pandolf_santee is evaluated here; the rest
+        comes from living(). The terms are grouped as in pandolf_santee, so the result is identical.
+        Returns:
+            numpy.ndarray: Exhaustion levels of the living soldiers."""
+        rows, mass, total, base, _ = self.living()
+        power = base + terrain_factor * total * (1.5 * speed**2 + 0.35 * speed * grade)
+        if grade < 0:
+            power -= terrain_factor * ((grade * speed * total / 3.5) - (total * (grade + 6)**2 / mass) + (25 - speed**2))
+        joules = self.joules[rows] + power * 60
+        self.joules[rows] = joules
+        # The 60x is to convert the output to Joules per hour, then to Kcal.
+        average_power_output = (joules * 60 / patrol_time if patrol_time > 0 else joules * 0) / 4184
+        levels = average_power_output / threshold if threshold > 0 else average_power_output * 0
+        self.exhaustion[rows] = levels
+        return levels
+
+    def mean_exhaustion(self, threshold, levels):
+        """ Mean of the threshold and the living soldiers' levels, the squad's exhaustion.
+        Reduces over a reused row with the threshold first, the same sum np.mean of the list
+        [threshold, *levels] would do, without building the list every minute."""
+        row = self.living()[4]
+        row[0] = threshold
+        row[1:] = levels
+        return float(np.add.reduce(row) / len(row))
+
+    def power_sums(self):
+        """ Sums over the living soldiers of the per soldier factors in pandolf_santee_terms.
+        Returns:
+            tuple: (base, total, total / mass, joules) summed over the living soldiers."""
+        rows, mass, total, base, _ = self.living()
+        return float(base.sum()), float(total.sum()), float((total / mass).sum()), float(self.joules[rows].sum())
+
+    def expend_terms(self, minutes, x1, x2, x3, patrol_time, threshold):
+        """ Adds several minutes of energy at once from summed pandolf_santee_terms and updates exhaustion.
+        Args:
+            minutes (int): Minutes covered by the sums.
+            x1, x2, x3 (float): pandolf_santee_terms summed over those minutes.
+            patrol_time (int): Patrol time at the last of those minutes.
+            threshold (float): Exhaustion threshold at the last of those minutes.
+        Returns:
+            numpy.ndarray: Exhaustion levels of the living soldiers."""
+        rows, mass, total, base, _ = self.living()
+        joules = self.joules[rows] + 60 * (base * minutes + total * x1 + total / mass * x2 + x3)
+        self.joules[rows] = joules
+        levels = (joules * 60 / patrol_time / 4184) / threshold
+        self.exhaustion[rows] = levels
+        return levels
@@ -0,0 +1,299 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .batch_simulation import run_batch
+from .aggregation import MonteCarloAggregate
+from .monte_carlo import _run_chunk, chunk_tasks, default_chunk_size, summarize_run
+from .results_store import ResultsStore
+from .scenario import load_tables
+
+# Parameters a sweep grid can vary, in the order they appear in the results table.
+grid_axes = ['armor_type', 'environment', 'blue_stock', 'red_stock', 'direction_deviation', 'map_size']
+
+# Values used for any axis the grid leaves out. Armor and environment default to every entry in the config
+# and map_size to the config's map_size.
+default_params = {
+    'blue_stock': 10,
+    'red_stock': 10,
+    'direction_deviation': 10,
+}
+
+# Per replication columns written after the cell columns.
+result_columns = ['replication', 'blue_kills', 'red_kills', 'patrol_distance', 'squad_exhaustion',
+                  'blue_remaining', 'red_spawned', 'patrol_time']
+table_columns = ['cell'] + grid_axes + result_columns
+
+
+def _whole_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool) \
+        and float(value).is_integer()
+
+
+def expand_grid(grid):
+    """ Lists every cell of a full factorial grid.
+    Args:
+        grid (dict): Axis name -> list of values (a single value is a one level axis). Missing axes use
+            default_params, or every armor type and environment in the config.
+    Returns:
+        list: One params dict per cell, with the last axis varying fastest."""
+    unknown = set(grid) - set(grid_axes)
+    if unknown:
+        raise ValueError(f"Unknown sweep axes: {sorted(unknown)}.")
+    tables = load_tables()
+    levels = []
+    for axis in grid_axes:
+        if axis in grid:
+            values = grid[axis] if isinstance(grid[axis], (list, tuple)) else [grid[axis]]
+        elif axis == 'armor_type':
+            values = tables.armor_names
+        elif axis == 'environment':
+            values = tables.environment_names
+        elif axis == 'map_size':
+            values = [tables.map_size]
+        else:
+            values = [default_params[axis]]
+        if not values:
+            raise ValueError(f"Sweep axis '{axis}' has no values.")
+        # The results table stores numeric axes as int32, as the CLI parses them.
+        if axis not in ('armor_type', 'environment') and not all(_whole_number(v) for v in values):
+            raise ValueError(f"Sweep axis '{axis}' needs whole numbers, got {values}.")
+        levels.append(list(values))
+    cells = [dict(zip(grid_axes, combination)) for combination in itertools.product(*levels)]
+    for cell in cells:
+        if cell['armor_type'] not in tables.armor_ids:
+            raise ValueError(f"Armor type '{cell['armor_type']}' not found in armor profiles.")
+        if cell['environment'] not in tables.environment_ids:
+            raise ValueError(f"Environment '{cell['environment']}' not found in threat probabilities.")
+    return cells
+
+
+def sweep_units(cells, num_runs, seed, chunk_size=default_chunk_size):
+    """ Splits every cell into chunk sized work units.
+    Chunk seeds come from chunk_tasks with the same master seed for every cell, so each cell matches
+    run_monte_carlo(cell, num_runs, seed) and cells share common random numbers.
+    Returns:
+        list: (cell index, chunk index, params, runs, first replication, SeedSequence) tuples."""
+    units = []
+    for cell_index, params in enumerate(cells):
+        _, tasks = chunk_tasks(params, num_runs, seed, chunk_size)
+        start = 0
+        for chunk_index, (_, size, seed_seq, _) in enumerate(tasks):
+            units.append((cell_index, chunk_index, params, size, start, seed_seq))
+            start += size
+    return units
+
+
+def replication_columns(results, params, cell_index=0, start=0):
+    """ Builds the results table columns for a list of run_simulation style results from one cell.
+    Args:
+        results (list): Result dicts in replication order.
+        params (dict): The cell's parameters.
+        cell_index (int): Cell number written to the 'cell' column.
+        start (int): Replication number of the first result.
+    Returns:
+        dict: Column name -> list or array, in table_columns order."""
+    size = len(results)
+    summaries = [summarize_run(result) for result in results]
+    columns = {'cell': np.full(size, cell_index, dtype=np.int32)}
+    for axis in grid_axes:
+        value = params.get(axis, default_params.get(axis))
+        columns[axis] = [value] * size if isinstance(value, str) else np.full(size, value, dtype=np.int32)
+    columns['replication'] = np.arange(start, start + size, dtype=np.int32)
+    for metric in ['blue_kills', 'red_kills']:
+        columns[metric] = np.array([summary[metric] for summary in summaries], dtype=np.int32)
+    for metric in ['patrol_distance', 'squad_exhaustion']:
+        columns[metric] = np.array([summary[metric] for summary in summaries], dtype=float)
+    columns['blue_remaining'] = np.array([result['blue']['stock'] for result in results], dtype=np.int32)
+    columns['red_spawned'] = np.array(
+        [params['red_stock'] * len(result['red_patrols']) for result in results], dtype=np.int32
+    )
+    columns['patrol_time'] = np.array([result['blue']['patrol_time'] for result in results], dtype=np.int32)
+    return columns
+
+
+def _run_unit(unit):
+    """ Runs one work unit in a worker process.
+    Returns:
+        tuple: The cell and chunk index and the unit's table columns in replication order."""
+    cell_index, chunk_index, params, size, start, seed_seq = unit
+    results = run_batch(params, size, rng=seed_seq)
+    return cell_index, chunk_index, replication_columns(results, params, cell_index, start)
+
+
+def run_sweep(grid, num_runs, out_dir=None, seed=None, max_workers=None, chunk_size=default_chunk_size,
+              on_unit=None):
+    """ Runs num_runs replications of every cell of a full factorial grid across a process pool.
+    Work units are (cell, chunk) pairs handed to workers as they free up, so slow cells do not hold
+    up the rest. With out_dir set, every finished unit is appended to a ResultsStore there and a rerun
+    with the same arguments skips the units it already holds, which resumes an interrupted sweep.
+    Args:
+        grid (dict): Axis values, as for expand_grid.
+        num_runs (int): Replications per cell.
+        out_dir (str | None): ResultsStore directory for the results.
+        seed (int | None): Master seed. Required to resume; defaults to fresh entropy otherwise.
+        max_workers (int | None): Worker processes. Defaults to the CPU count; 1 runs in the calling process.
+        chunk_size (int): Replications per work unit.
+        on_unit (callable | None): Called as on_unit(units_done, units_total) after each unit.
+    Returns:
+        dict: The seed, the cells, the units run and skipped, and either the table rows
+            (without out_dir) or the ResultsStore."""
+    if num_runs < 1:
+        raise ValueError("num_runs must be at least 1.")
+    cells = expand_grid(grid)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    units = sweep_units(cells, num_runs, seed, chunk_size)
+
+    finished = {}
+    skipped = 0
+    store = None
+    pending = units
+    if out_dir is not None:
+        store = ResultsStore(out_dir)
+        settings = {'grid': grid, 'num_runs': num_runs, 'seed': seed, 'chunk_size': chunk_size}
+        if 'sweep' not in store.metadata:
+            store.set_metadata(sweep=settings)
+        elif store.metadata['sweep'] != json.loads(json.dumps(settings)):
+            raise ValueError(f"'{out_dir}' holds a different sweep; use a new output directory.")
+        stored = {tuple(tag) for tag in store.tags()}
+        pending = [unit for unit in units if (unit[0], unit[1]) not in stored]
+        skipped = len(units) - len(pending)
+
+    def save(cell_index, chunk_index, columns):
+        if store is None:
+            finished[(cell_index, chunk_index)] = columns
+        else:
+            store.append(columns, tag=[cell_index, chunk_index])
+        if on_unit:
+            on_unit(skipped + done, len(units))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(pending)))
+    done = 0
+    if max_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [pool.submit(_run_unit, unit) for unit in pending]
+            for future in as_completed(futures):
+                done += 1
+                save(*future.result())
+        finally:
+            # An interrupted sweep drops its queued units; the saved ones are picked up on resume.
+            pool.shutdown(cancel_futures=True)
+    else:
+        for unit in pending:
+            done += 1
+            save(*_run_unit(unit))
+
+    result = {'seed': seed, 'cells': cells, 'units_run': done, 'units_skipped': skipped,
+              'rows': None, 'store': store}
+    if store is None:
+        rows = []
+        for unit in units:
+            columns = finished[(unit[0], unit[1])]
+            lists = [columns[name].tolist() if hasattr(columns[name], 'tolist') else columns[name]
+                     for name in table_columns]
+            rows.extend(dict(zip(table_columns, values)) for values in zip(*lists))
+        result['rows'] = rows
+    else:
+        # Units finish in any order; put them back in cell and replication order, then merge small chunks.
+        store.order_by_tag()
+        store.compact()
+    return result
+
+
+def _aggregate_unit(unit):
+    """ Runs one work unit in a worker process and returns only its aggregate."""
+    cell_index, _, params, size, _, seed_seq = unit
+    aggregate, _ = _run_chunk((params, size, seed_seq, False))
+    return cell_index, aggregate
+
+
+def stream_sweep(cells, num_runs, seed, max_workers=None, chunk_size=default_chunk_size):
+    """ Runs num_runs replications of every cell and yields each cell's running aggregate as it grows.
+    Units are taken round robin across cells, chunk 0 of every cell first, so every cell has early
+    numbers. Each cell's chunks are merged in chunk order, so its final aggregate equals
+    run_monte_carlo(cell, num_runs, seed, chunk_size=chunk_size). Only the aggregates are kept, and
+    closing the generator cancels the queued units.
+    Args:
+        cells (list): Params dicts, e.g. from expand_grid or jobs.expand_spec.
+        num_runs (int): Replications per cell.
+        seed (int): Master seed.
+        max_workers (int | None): Worker processes. Defaults to the CPU count; 1 runs in the calling process.
+        chunk_size (int): Replications per update.
+    Yields:
+        tuple: (cell index, the cell's MonteCarloAggregate so far) after every chunk."""
+    if num_runs < 1:
+        raise ValueError("num_runs must be at least 1.")
+    units = sweep_units(cells, num_runs, seed, chunk_size)
+    # Stable sort on chunk index keeps cell order within each round.
+    units.sort(key=lambda unit: unit[1])
+    aggregates = [MonteCarloAggregate(params) for params in cells]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(units)))
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        # map yields in submission order, which keeps every cell's chunks in order.
+        chunks = pool.map(_aggregate_unit, units) if pool else map(_aggregate_unit, units)
+        for cell_index, aggregate in chunks:
+            aggregates[cell_index].merge(aggregate)
+            yield cell_index, aggregates[cell_index]
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m models.sweep',
+        description='Run a full factorial Monte Carlo sweep into a columnar results store.'
+    )
+    parser.add_argument('--grid', help='JSON file mapping axis names to lists of values.')
+    parser.add_argument('--armor-type', nargs='+', dest='armor_type')
+    parser.add_argument('--environment', nargs='+')
+    parser.add_argument('--blue-stock', nargs='+', type=int, dest='blue_stock')
+    parser.add_argument('--red-stock', nargs='+', type=int, dest='red_stock')
+    parser.add_argument('--direction-deviation', nargs='+', type=int, dest='direction_deviation')
+    parser.add_argument('--map-size', nargs='+', type=int, dest='map_size')
+    parser.add_argument('--runs', type=int, default=1000, help='Replications per cell.')
+    parser.add_argument('--seed', type=int, help='Master seed. Needed to resume with a fresh command line.')
+    parser.add_argument('--workers', type=int, help='Worker processes. Defaults to the CPU count.')
+    parser.add_argument('--chunk-size', type=int, default=default_chunk_size)
+    parser.add_argument('--out', required=True, help='Results store directory. Rerunning into it resumes the sweep.')
+    parser.add_argument('--csv', help='Also export the results table to this CSV file.')
+    args = parser.parse_args(argv)
+
+    grid = {}
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+    for axis in grid_axes:
+        if getattr(args, axis) is not None:
+            grid[axis] = getattr(args, axis)
+
+    seed = args.seed
+    if seed is None and os.path.exists(os.path.join(args.out, 'manifest.json')):
+        # Resuming without --seed reuses the seed the sweep was started with.
+        seed = ResultsStore(args.out).metadata.get('sweep', {}).get('seed')
+
+    def progress(done, total):
+        print(f"\r{done}/{total} units", end='', flush=True)
+
+    sweep = run_sweep(grid, args.runs, out_dir=args.out, seed=seed, max_workers=args.workers,
+                      chunk_size=args.chunk_size, on_unit=progress)
+    print(f"\n{len(sweep['cells'])} cells, {sweep['units_run']} units run, {sweep['units_skipped']} resumed")
+    print(f"seed {sweep['seed']}, {len(sweep['store'])} rows in {args.out}")
+    if args.csv:
+        sweep['store'].export_csv(args.csv)
+        print(f"exported to {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
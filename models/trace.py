@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Trace levels, same numbering as the logging module.
+DEBUG = 10
+INFO = 20
+OFF = 100
+
+level_names = {DEBUG: 'DEBUG', INFO: 'INFO'}
+
+
+class RingBufferSink:
+    """ Keeps the most recent events in memory, dropping the oldest once capacity is reached."""
+    def __init__(self, capacity=1000):
+        self.events = deque(maxlen=capacity)
+
+    def write(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """ Appends one JSON object per event to a file. The file is opened on the first event."""
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        line = json.dumps(event, default=float) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Tracer:
+    """ Structured event tracer for simulation runs.
+    Callers check enabled(level) once per run and skip emit entirely when it is False,
+    so a disabled tracer costs nothing inside the time step loop."""
+    def __init__(self, sink=None, level=INFO):
+        self.sink = sink
+        self.level = level if sink is not None else OFF
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def emit(self, level, event, **fields):
+        if level < self.level:
+            return
+        fields['event'] = event
+        fields['level'] = level_names.get(level, str(level))
+        fields['wall_time'] = time.time()
+        self.sink.write(fields)
+
+
+# Shared tracer with no sink. Everything is disabled.
+null_tracer = Tracer()
@@ -0,0 +1,114 @@
+import numpy as np
+
+# Events that can force a step to be kept whatever the decimation interval.
+record_events = ('terrain', 'engagement')
+
+
+class TrajectoryRecorder:
+    """ Per step record of one patrol's position, terrain and exhaustion in preallocated arrays.
+    Row 0 is the spawn point and each move writes the next row. With every=k only every k-th step is
+    kept (0 keeps none), and steps that see one of the named events are kept as well, so a decimated
+    map still shows every terrain change or engagement. The latest step is always included when the
+    record is read, so the path ends where the patrol is. The buffers are sized for capacity steps
+    and grow if a patrol moves more often than that.
+    Args:
+        capacity (int): Steps to allocate for, normally the scenario stop_time.
+        squad_size (int): Soldiers in the squad, which fixes the width of an exhaustion row.
+        every (int): Keep every k-th step.
+        events (tuple): Entries of record_events whose steps are always kept."""
+    def __init__(self, capacity, squad_size, every=1, events=()):
+        if every < 0:
+            raise ValueError("every cannot be negative.")
+        unknown = set(events) - set(record_events)
+        if unknown:
+            raise ValueError(f"Unknown record events: {sorted(unknown)}.")
+        self.every = int(every)
+        self.events = frozenset(events)
+        rows = capacity + 1
+        self.position = np.empty((rows, 2))
+        self.terrain = np.empty(rows, dtype=np.int16)
+        # One row per set_exhaustion call. Column 0 is the threshold, then one column per soldier;
+        # NaN marks soldiers already removed.
+        self.exhaustion = np.full((rows, squad_size + 1), np.nan)
+        self.initial_exhaustion = [0.0] * squad_size
+        self.row = 0
+        self.exhaustion_rows = 0
+        self.steps = 0
+        self._keep = True
+        # First exhaustion row written during the current step, for dropping them with the step.
+        self._step_exhaustion = 0
+
+    def start(self, position, terrain_id, exhaustion):
+        """ Writes the spawn row."""
+        self.position[0] = position
+        self.terrain[0] = terrain_id
+        self.initial_exhaustion = list(exhaustion)
+
+    def _grow(self):
+        rows = 2 * len(self.position)
+        self.position = np.resize(self.position, (rows, 2))
+        self.terrain = np.resize(self.terrain, rows)
+
+    def _resize_exhaustion(self, rows, columns):
+        exhaustion = np.full((rows, columns), np.nan)
+        exhaustion[:len(self.exhaustion), :self.exhaustion.shape[1]] = self.exhaustion
+        self.exhaustion = exhaustion
+
+    def step(self, position, terrain_id, terrain_changed=False):
+        """ Starts the row for a new step. The previous row stays only if it was due or saw an event."""
+        if self._keep:
+            self.row += 1
+            if self.row == len(self.position):
+                self._grow()
+        else:
+            self.exhaustion_rows = self._step_exhaustion
+        self._step_exhaustion = self.exhaustion_rows
+        self.position[self.row] = position
+        self.terrain[self.row] = terrain_id
+        self.steps += 1
+        self._keep = self.every > 0 and self.steps % self.every == 0
+        if terrain_changed and 'terrain' in self.events:
+            self._keep = True
+
+    def set_exhaustion(self, threshold, levels, alive):
+        """ Records an exhaustion threshold and the levels of the soldiers flagged alive for this step."""
+        rows, columns = self.exhaustion.shape
+        if self.exhaustion_rows == rows or len(alive) >= columns:
+            # Out of rows, or the squad was replaced by a bigger one.
+            self._resize_exhaustion(2 * rows, max(columns, len(alive) + 1))
+        row = self.exhaustion[self.exhaustion_rows]
+        row[:] = np.nan
+        row[0] = threshold
+        row[1:len(alive) + 1][alive] = levels
+        self.exhaustion_rows += 1
+
+    def mark(self, event):
+        """ Keeps the current step if event is one of the recorder's events."""
+        if event in self.events:
+            self._keep = True
+
+    def __len__(self):
+        return self.row + 1
+
+    def positions(self):
+        """ (rows, 2) view of the recorded positions, without copying."""
+        return self.position[:self.row + 1]
+
+    def terrain_ids(self):
+        return self.terrain[:self.row + 1]
+
+    def position_list(self):
+        return self.positions().tolist()
+
+    def exhaustion_list(self):
+        """ The initial levels followed by the [threshold, levels of the living soldiers] rows of the
+        recorded steps, as in Patrol.exhaustion_data."""
+        rows = self.exhaustion[:self.exhaustion_rows]
+        removed = np.isnan(rows)
+        if not removed.any():
+            return [self.initial_exhaustion] + rows.tolist()
+        return [self.initial_exhaustion] + [row[~gone].tolist() for row, gone in zip(rows, removed)]
+
+    @property
+    def nbytes(self):
+        return self.position.nbytes + self.terrain.nbytes + self.exhaustion.nbytes
@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+from models.aggregation import RunningStats, FixedHistogram, QuantileSketch, MonteCarloAggregate
+
+def test_running_stats_matches_numpy():
+    values = np.random.default_rng(0).normal(10, 3, 1000)
+    stats = RunningStats()
+    for v in values[:400]:
+        stats.add(v)
+    rest = RunningStats()
+    rest.add_many(values[400:])
+    stats.merge(rest)
+    assert stats.count == 1000
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.variance() == pytest.approx(values.var(ddof=1))
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+
+def test_fixed_histogram_matches_numpy():
+    values = np.random.default_rng(1).uniform(-5, 105, 2000)
+    histogram = FixedHistogram(0, 100, 20)
+    histogram.add_many(values[:1000])
+    other = FixedHistogram(0, 100, 20)
+    other.add_many(values[1000:])
+    histogram.merge(other)
+    expected, _ = np.histogram(values, bins=20, range=(0, 100))
+    assert histogram.counts.tolist() == expected.tolist()
+    assert histogram.underflow == int((values < 0).sum())
+    assert histogram.overflow == int((values > 100).sum())
+
+def test_quantile_sketch_accuracy():
+    values = np.random.default_rng(2).exponential(100, 50000)
+    sketch = QuantileSketch(max_centroids=200)
+    for part in np.array_split(values, 7):
+        piece = QuantileSketch(max_centroids=200)
+        piece.add_many(part)
+        sketch.merge(piece)
+    assert len(sketch.means) <= 200
+    for q in [0.05, 0.25, 0.5, 0.75, 0.95]:
+        # Compare in rank space: the estimate should sit within 1% of the true rank.
+        rank = (values < sketch.quantile(q)).mean()
+        assert rank == pytest.approx(q, abs=0.01)
+
+def test_monte_carlo_aggregate_to_dict():
+    params = {'blue_stock': 10, 'red_stock': 10}
+    aggregate = MonteCarloAggregate(params)
+    aggregate.add({'blue_kills': 3, 'red_kills': 1, 'patrol_distance': 5000.0, 'squad_exhaustion': 400.0})
+    aggregate.add_many([{'blue_kills': 5, 'red_kills': 0, 'patrol_distance': 7000.0, 'squad_exhaustion': 450.0}])
+    result = aggregate.to_dict()
+    assert result['count'] == 2
+    assert result['stats']['blue_kills']['mean'] == 4
+    assert result['histograms']['red_kills']['counts'][:2] == [1, 1]
+    assert result['quantiles']['patrol_distance']['0.5'] == pytest.approx(6000)
+
+def test_running_stats_half_width():
+    values = np.random.default_rng(2).normal(10, 3, 400)
+    stats = RunningStats()
+    stats.add_many(values)
+    assert stats.half_width(1.96) == pytest.approx(1.96 * values.std(ddof=1) / np.sqrt(400))
+    assert np.isnan(RunningStats().half_width(1.96))
@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+from models.batch_simulation import run_batch
+from models.squad_simulation import run_simulation
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 10,
+        "direction_deviation": 10,
+        "armor_type": "Hathcock Ballistic Insert",
+        "environment": "Pershing’s Ghost",
+        "map_size": 2000
+    }
+
+def assert_same_types(batch, single, path='result'):
+    """ Same keys and value types, recursing into dicts and the first item of lists. None, as in a
+    removal_time that was never set, matches any type."""
+    if batch is None or single is None:
+        return
+    assert type(batch) is type(single), f"{path}: {type(batch).__name__} != {type(single).__name__}"
+    if isinstance(batch, dict):
+        assert batch.keys() == single.keys(), path
+        for key in batch:
+            assert_same_types(batch[key], single[key], f"{path}.{key}")
+    elif isinstance(batch, list) and batch and single:
+        assert_same_types(batch[0], single[0], f"{path}[0]")
+
+def test_run_batch_matches_run_simulation_shape(default_params):
+    batch = run_batch(default_params, 20, rng=1)
+    single = run_simulation(default_params, full_log=False, rng=1)
+    assert len(batch) == 20
+    for result in batch:
+        assert_same_types(result, single)
+        assert len(result['blue']['position_history']) == 2
+
+def test_run_batch_is_reproducible(default_params):
+    first = run_batch(default_params, 50, rng=7)
+    second = run_batch(default_params, 50, rng=7)
+    assert first == second
+
+def test_run_batch_bookkeeping(default_params):
+    for result in run_batch(default_params, 200, rng=3):
+        blue = result['blue']
+        red_remaining = sum(red['stock'] for red in result['red_patrols'])
+        red_spawned = default_params['red_stock'] * len(result['red_patrols'])
+        warfighters_killed = sum(red['warfighters_killed'] for red in result['red_patrols'])
+        assert blue['hostiles_killed'] == red_spawned - red_remaining
+        assert warfighters_killed == default_params['blue_stock'] - blue['stock']
+        assert 0 < blue['patrol_time'] <= 480
+        for x, y in blue['position_history']:
+            assert 0 <= x <= default_params['map_size']
+            assert 0 <= y <= default_params['map_size']
+
+def test_run_batch_matches_serial_means(default_params):
+    serial = [run_simulation(default_params, full_log=False, rng=100 + i) for i in range(100)]
+    batch = run_batch(default_params, 2000, rng=11)
+    for key in ['patrol_distance', 'hostiles_killed', 'stock', 'patrol_time']:
+        serial_values = [r['blue'][key] for r in serial]
+        batch_values = [r['blue'][key] for r in batch]
+        # Five standard errors of the serial mean
+        tolerance = 5 * np.std(serial_values) / np.sqrt(len(serial_values)) + 1e-9
+        assert abs(np.mean(batch_values) - np.mean(serial_values)) < tolerance
+
+def test_run_batch_rejects_unknown_armor(default_params):
+    default_params['armor_type'] = 'Cardboard'
+    with pytest.raises(ValueError):
+        run_batch(default_params, 5)
+
+def test_run_batch_common_random_numbers(default_params):
+    light = run_batch(default_params, 50, rng=5)
+    default_params['armor_type'] = 'Basilone Ballistic Insert'
+    heavy = run_batch(default_params, 50, rng=5)
+    for a, b in zip(light, heavy):
+        assert a['blue']['position_history'][0] == b['blue']['position_history'][0]
+        assert a['red_patrols'][-1]['current_position'] == b['red_patrols'][-1]['current_position']
+
+def test_run_batch_common_random_respawns(default_params):
+    default_params.update(red_stock=3, armor_type='Basilone Ballistic Insert')
+    heavy = run_batch(default_params, 300, rng=7)
+    default_params['armor_type'] = 'Hathcock Ballistic Insert'
+    light = run_batch(default_params, 300, rng=7)
+    shared = 0
+    for a, b in zip(heavy, light):
+        respawns = {red['spawn_time']: red['current_position'] for red in a['red_patrols'] if red['spawn_time']}
+        for red in b['red_patrols']:
+            if red['spawn_time'] in respawns:
+                assert red['current_position'] == respawns[red['spawn_time']]
+                shared += 1
+    assert shared > 0
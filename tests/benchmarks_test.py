@@ -0,0 +1,24 @@
+import json
+
+import app as web
+from benchmarks.suite import compare, run_benchmarks
+
+def test_benchmarks_round_trip(tmp_path):
+    results = run_benchmarks(['patrol', 'json'], repeat=1, quick=True)
+    assert set(results['benchmarks']) == {'patrol.move', 'patrol.set_exhaustion', 'make_json_safe'}
+    for result in results['benchmarks'].values():
+        assert len(result['times']) == 1
+        assert result['per_second'] > 0
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps(results))
+    baseline = json.loads(path.read_text())
+    baseline['benchmarks']['patrol.move']['per_operation'] /= 2
+    rows = {row['name']: row for row in compare(results, baseline)}
+    assert rows['patrol.move']['regression']
+    assert not rows['make_json_safe']['regression']
+
+def test_benchmarks_keep_the_app_cache():
+    cache = web.result_cache
+    results = run_benchmarks(['attack', 'http.run_simulation'], repeat=1, quick=True)
+    assert set(results['benchmarks']) == {'attack.per_shot', 'attack.binomial', 'http.run_simulation'}
+    assert web.result_cache is cache
@@ -210,4 +210,17 @@ def test_move(patrol):
     assert patrol.current_position[1] > (map_size - 10) - 0.1
     assert patrol.move_speed > 9.9
     assert patrol.move_speed < 10.1
- 
\ No newline at end of file
+ 
+def test_patrol_seeded_draws():
+    params = {
+        'armor_type': 'Basilone Ballistic Insert',
+        'blue_stock': 5
+    }
+    first, second = Patrol(params, rng=3), Patrol(params, rng=3)
+    for sim_time in range(1, 21):
+        for patrol in (first, second):
+            patrol.update_patrol_time(sim_time)
+            patrol.step(10)
+    assert first.position_history == second.position_history
+    assert first.terrain_history == second.terrain_history
+    assert first.squad_data == second.squad_data
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import yaml
+
+from models.config import config_path, load_config, merge_config, validate_config
+from models.scenario import Scenario, load_tables
+from models.squad_simulation import run_simulation
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 20,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War",
+        "map_size": 2000
+    }
+
+def test_import_reads_no_config():
+    # Fresh interpreter, so nothing earlier in the session has loaded the config.
+    code = ("import app, models.config, models.scenario; "
+            "print(len(models.config._cache), models.scenario._tables['default'] is None)")
+    root = os.path.join(os.path.dirname(__file__), "..")
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.split() == ["0", "True"]
+
+def test_load_config_cached_by_mtime(tmp_path):
+    path = tmp_path / "simulation.yaml"
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    first = load_config(str(path))
+    assert load_config(str(path)) is first
+    config['stop_time'] = 60
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert load_config(str(path))['stop_time'] == 60
+
+def test_validate_config_rejects_bad_values():
+    config = load_config()
+    with pytest.raises(ValueError, match="sum to 1"):
+        merge_config(config, {'terrain_library': {'paved': [1.0, 0.5]}})
+    with pytest.raises(ValueError, match="Unknown config sections"):
+        merge_config(config, {'red_speed': 5})
+    with pytest.raises(ValueError, match="fire_rates"):
+        merge_config(config, {'fire_rates': {'blue_min': 30}})
+    with pytest.raises(ValueError, match="missing"):
+        validate_config({'map_size': 100})
+
+def test_overrides_apply_to_one_run(default_params):
+    base = load_config()
+    merged = merge_config(base, {'stop_time': 30, 'fire_rates': {'red_max': 5}})
+    assert merged['fire_rates'] == dict(base['fire_rates'], red_max=5)
+    assert base['stop_time'] == 480
+    assert load_tables({'stop_time': 30}) is load_tables({'stop_time': 30})
+
+    default_params['armor_type'] = 'Hathcock Ballistic Insert'
+    short = run_simulation(dict(default_params, config_overrides={'stop_time': 30}), full_log=False, rng=2)
+    assert short['blue']['patrol_time'] <= 30
+    assert Scenario(default_params).stop_time == 480
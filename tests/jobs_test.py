@@ -0,0 +1,70 @@
+import time
+import pytest
+from models.jobs import JobQueue, expand_spec
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 10,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War"
+    }
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_jobs=1, pool_workers=1, chunk_size=20)
+    yield queue
+    queue.shutdown()
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while job.to_dict()['status'] in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.01)
+    return job.to_dict()
+
+def test_expand_spec(default_params):
+    assert len(expand_spec({'type': 'monte_carlo', 'params': default_params, 'num_runs': 5})) == 1
+    cells = expand_spec({'type': 'sweep', 'params': default_params, 'num_runs': 5})
+    assert len(cells) == 9
+    with pytest.raises(ValueError):
+        expand_spec({'type': 'lottery', 'params': default_params, 'num_runs': 5})
+    with pytest.raises(ValueError):
+        expand_spec({'type': 'monte_carlo', 'params': default_params, 'num_runs': 0})
+
+def test_job_runs_to_completion(queue, default_params):
+    job = queue.submit({'type': 'monte_carlo', 'params': default_params, 'num_runs': 50, 'seed': 1})
+    status = wait_for(job)
+    assert status['status'] == 'completed'
+    assert status['runs_completed'] == status['runs_requested'] == 50
+    assert status['cells'][0]['aggregates']['count'] == 50
+    assert queue.get(job.id) is job
+
+def test_sweep_job_progress(queue, default_params):
+    job = queue.submit({
+        'type': 'sweep', 'params': default_params, 'num_runs': 20, 'seed': 1,
+        'armor_types': ['Basilone Ballistic Insert', 'Hathcock Ballistic Insert'],
+    })
+    status = wait_for(job)
+    assert status['runs_requested'] == 2 * 3 * 20
+    assert status['runs_completed'] == status['runs_requested']
+    assert all(cell['runs_completed'] == 20 for cell in status['cells'])
+
+def test_cancel_job(queue, default_params):
+    job = queue.submit({'type': 'monte_carlo', 'params': default_params, 'num_runs': 100000, 'seed': 1})
+    assert queue.cancel(job.id)
+    status = wait_for(job)
+    assert status['status'] == 'cancelled'
+    assert status['runs_completed'] < status['runs_requested']
+    assert not queue.cancel('missing')
+
+def test_adaptive_job(queue, default_params):
+    job = queue.submit({'type': 'monte_carlo', 'params': default_params, 'num_runs': 5000, 'seed': 1,
+                        'rel_half_width': 0.2})
+    status = wait_for(job)
+    assert status['status'] == 'completed'
+    assert status['cells'][0]['converged']
+    assert status['runs_completed'] < 5000
+    with pytest.raises(ValueError):
+        expand_spec({'params': default_params, 'num_runs': 5, 'rel_half_width': 0})
@@ -0,0 +1,72 @@
+import pytest
+from models.monte_carlo import default_abs_half_width, run_adaptive, run_monte_carlo, summarize_run, chunk_tasks
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 10,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War"
+    }
+
+def test_chunk_tasks_cover_all_runs(default_params):
+    _, tasks = chunk_tasks(default_params, 1001, seed=1, chunk_size=250)
+    assert [size for _, size, _, _ in tasks] == [250, 250, 250, 250, 1]
+
+def test_monte_carlo_reproducible_across_workers(default_params):
+    serial = run_monte_carlo(default_params, 120, seed=42, max_workers=1, chunk_size=25, raw=True)
+    parallel = run_monte_carlo(default_params, 120, seed=42, max_workers=3, chunk_size=25, raw=True)
+    assert len(serial['results']) == 120
+    assert serial['results'] == parallel['results']
+    assert serial['aggregate'].to_dict() == parallel['aggregate'].to_dict()
+
+def test_monte_carlo_reports_seed(default_params):
+    first = run_monte_carlo(default_params, 10, max_workers=1, raw=True)
+    again = run_monte_carlo(default_params, 10, seed=first['seed'], max_workers=1, raw=True)
+    assert first['results'] == again['results']
+
+def test_summarize_run(default_params):
+    result = run_monte_carlo(default_params, 1, seed=3, max_workers=1, raw=True)['results'][0]
+    summary = summarize_run(result)
+    assert summary['blue_kills'] == result['blue']['hostiles_killed']
+    assert summary['patrol_distance'] == result['blue']['patrol_distance']
+
+def test_monte_carlo_aggregates_without_raw(default_params):
+    monte_carlo = run_monte_carlo(default_params, 300, seed=8, max_workers=1, chunk_size=100)
+    assert monte_carlo['results'] is None
+    aggregate = monte_carlo['aggregate'].to_dict()
+    assert aggregate['count'] == 300
+    histogram = aggregate['histograms']['red_kills']
+    assert sum(histogram['counts']) + histogram['underflow'] + histogram['overflow'] == 300
+
+def test_adaptive_stops_when_converged(default_params):
+    monte_carlo = run_adaptive(default_params, 5000, rel_half_width=0.2, seed=4, max_workers=1, chunk_size=50)
+    assert monte_carlo['converged']
+    assert monte_carlo['runs_completed'] < 5000
+    assert not monte_carlo['cancelled']
+    stats = monte_carlo['aggregate'].to_dict()['stats']
+    for metric, half_width in monte_carlo['half_widths'].items():
+        assert half_width <= max(0.2 * abs(stats[metric]['mean']), default_abs_half_width[metric])
+
+def test_adaptive_floor_for_near_zero_means(default_params):
+    # Red kills average near zero behind the Basilone insert, so only the absolute floor can be met.
+    monte_carlo = run_adaptive(default_params, 2000, rel_half_width=0.05, seed=4, max_workers=1)
+    assert monte_carlo['converged']
+    assert monte_carlo['runs_completed'] < 2000
+    red_kills = monte_carlo['aggregate'].to_dict()['stats']['red_kills']
+    assert monte_carlo['half_widths']['red_kills'] > 0.05 * red_kills['mean']
+    with pytest.raises(ValueError):
+        run_adaptive(default_params, 100, abs_half_width={'blue_casualties': 1})
+
+def test_adaptive_caps_runs(default_params):
+    monte_carlo = run_adaptive(default_params, 100, rel_half_width=1e-6, seed=4, max_workers=1, chunk_size=50)
+    assert not monte_carlo['converged']
+    assert monte_carlo['runs_completed'] == 100
+
+def test_adaptive_runs_used_independent_of_workers(default_params):
+    serial = run_adaptive(default_params, 2000, rel_half_width=0.1, seed=6, max_workers=1, chunk_size=50)
+    parallel = run_adaptive(default_params, 2000, rel_half_width=0.1, seed=6, max_workers=3, chunk_size=50)
+    assert serial['runs_completed'] == parallel['runs_completed']
+    assert serial['aggregate'].to_dict() == parallel['aggregate'].to_dict()
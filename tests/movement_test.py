@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pytest
+
+from models.movement import bounce_headings, bounce_move, bounce_step
+
+size = 2000.0
+
+def random_moves(seed, n=5000):
+    """ Random starts, with a share placed exactly on walls and corners, headings, distances and jitters."""
+    rng = np.random.default_rng(seed)
+    position = rng.uniform(0, size, (n, 2))
+    edge = rng.random((n, 2)) < 0.15
+    position[edge] = rng.choice([0.0, size], edge.sum())
+    direction = rng.uniform(0, 360, n)
+    distance = rng.uniform(0, 150, n)
+    jitter = rng.uniform(-45, 45, n)
+    return position, direction, distance, jitter
+
+@pytest.mark.parametrize("seed", range(5))
+def test_positions_stay_on_the_map(seed):
+    position, direction, distance, jitter = random_moves(seed)
+    for _ in range(20):
+        position, direction, _ = bounce_move(position, direction, distance, jitter, size)
+        assert ((position >= 0) & (position <= size)).all()
+        assert ((direction >= 0) & (direction < 360)).all()
+
+@pytest.mark.parametrize("seed", range(5))
+def test_distance_traveled_matches_request(seed):
+    position, direction, distance, jitter = random_moves(seed)
+    new_position, _, traveled = bounce_move(position, direction, distance, jitter, size)
+    np.testing.assert_allclose(traveled, distance, rtol=1e-12, atol=1e-9)
+    # Straight line distance can only fall short of the path length when the patrol bounced.
+    assert (np.hypot(*(new_position - position).T) <= traveled + 1e-9).all()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_vector_kernel_matches_scalar(seed):
+    position, direction, distance, jitter = random_moves(seed, n=2000)
+    new_position, new_direction, traveled = bounce_move(position, direction, distance, jitter, size)
+    for i in range(len(position)):
+        x, y, heading, moved, _ = bounce_step(*position[i], direction[i], distance[i], jitter[i], size)
+        assert new_position[i] == pytest.approx([x, y], abs=1e-9)
+        assert math.cos(math.radians(new_direction[i] - heading)) == pytest.approx(1)
+        assert traveled[i] == pytest.approx(moved)
+
+@pytest.mark.parametrize("corner, heading, wall", [
+    ((0, 0), 225, 'south-west corner'),
+    ((size, 0), 315, 'south-east corner'),
+    ((size, size), 45, 'north-east corner'),
+    ((0, size), 135, 'north-west corner'),
+])
+def test_corners_turn_back_into_the_map(corner, heading, wall):
+    x, y, new_heading, traveled, walls = bounce_step(*corner, heading, 10, 0, size)
+    assert walls == [wall]
+    assert new_heading == bounce_headings[wall]
+    assert math.dist(corner, (x, y)) == pytest.approx(10)
+    new_position, direction, moved = bounce_move(np.array([corner], dtype=float), [heading], 10, 0, size)
+    assert new_position[0] == pytest.approx([x, y])
+    assert direction[0] == new_heading
+    assert moved[0] == pytest.approx(10)
+
+def test_bounce_continues_from_the_wall():
+    # 30 m west from x=10: 10 m to the wall, then 20 m back east along the same line.
+    x, y, heading, traveled, walls = bounce_step(10, 500, 180, 30, 0, size)
+    assert (x, y) == pytest.approx((20, 500))
+    assert heading == 0 and traveled == pytest.approx(30) and walls == ['west']
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from models.blue_patrol import Patrol
+from models.patrol_group import PatrolGroup, run_group_simulation
+from models.scenario import Scenario
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 8,
+        "red_stock": 10,
+        "direction_deviation": 15,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War",
+        "map_size": 1500
+    }
+
+def test_group_of_one_matches_patrol(default_params):
+    for seed in range(3):
+        patrol = Patrol(default_params, rng=seed)
+        group = PatrolGroup(default_params, 1, rng=seed)
+        for sim_time in range(1, 150):
+            patrol.update_patrol_time(sim_time)
+            group.update_patrol_time(sim_time)
+            patrol.step(15)
+            group.step(15)
+            patrol.set_exhaustion()
+            group.set_exhaustion()
+            assert group.terrain_id[0] == patrol.terrain_id
+        patrol.take_casualties(3, 150)
+        group.take_casualties(0, 3, 150)
+        expected, squad = patrol.to_dict(), group.to_dict()[0]
+        assert squad.keys() == expected.keys()
+        assert squad['stock'] == expected['stock'] == 5
+        assert squad['stock_history'] == expected['stock_history']
+        np.testing.assert_allclose(squad['position_history'], expected['position_history'])
+        for row, expected_row in zip(squad['exhaustion_data'], expected['exhaustion_data'], strict=True):
+            np.testing.assert_allclose(row, expected_row)
+        assert squad['exhaustion'] == pytest.approx(expected['exhaustion'])
+
+def test_removed_squads_stop(default_params):
+    group = PatrolGroup(default_params, 3, full_log=False, rng=1)
+    group.update_patrol_time(1)
+    group.step(10)
+    group.remove([1], 1)
+    frozen = group.position[1].copy()
+    for sim_time in range(2, 20):
+        group.update_patrol_time(sim_time)
+        group.step(10)
+        group.set_exhaustion()
+    assert (group.position[1] == frozen).all()
+    assert group.patrol_time.tolist() == [19, 1, 19]
+    assert len(group.to_dict(full_log=False)[0]['position_history']) == 2
+
+def test_run_group_simulation(default_params):
+    first = run_group_simulation(default_params, 4, rng=5)
+    assert first == run_group_simulation(default_params, 4, rng=5)
+    assert len(first['blue_squads']) == 4
+    # A shorter day leaves squads on patrol at the end, so both outcomes are checked.
+    short_params = {**default_params, 'config_overrides': {'stop_time': 120}}
+    short_day = run_group_simulation(short_params, 4, rng=5)
+    for params, result in [(default_params, first), (short_params, short_day)]:
+        stop_time = Scenario(params).stop_time
+        for squad in result['blue_squads']:
+            if squad['removal_time'] is None:
+                assert squad['patrol_time'] == stop_time and squad['stock'] > 0
+            else:
+                assert squad['removal_time'] == squad['patrol_time'] <= stop_time
+    assert any(squad['removal_time'] is None for squad in short_day['blue_squads'])
+    assert all(0 <= entry['squad'] < 4 for entry in first['combat_log'])
+    with pytest.raises(ValueError):
+        run_group_simulation(default_params, 0)
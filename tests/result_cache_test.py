@@ -0,0 +1,129 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+import yaml
+
+import app as web
+import models.config
+from models.result_cache import ResultCache, cache_key
+
+def test_cache_key_is_canonical():
+    params = {"blue_stock": 10, "armor_type": "Basilone Ballistic Insert"}
+    key = cache_key("run", params, seed=1, num_runs=100)
+    assert key == cache_key("run", dict(reversed(list(params.items()))), num_runs=100.0, seed=1)
+    assert key == cache_key("run", params, seed=1, num_runs=100, rel_half_width=None)
+    assert key != cache_key("run", params, seed=2, num_runs=100)
+    assert key != cache_key("other", params, seed=1, num_runs=100)
+
+def test_cache_key_follows_config(tmp_path, monkeypatch):
+    path = tmp_path / "simulation.yaml"
+    shutil.copy(models.config.config_path, path)
+    monkeypatch.setattr(models.config, "config_path", str(path))
+    params = {"blue_stock": 10}
+    key = cache_key("run", params, seed=1)
+    assert key == cache_key("run", params, seed=1)
+    config = yaml.safe_load(path.read_text(encoding="utf-8"))
+    config['stop_time'] += 1
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert key != cache_key("run", params, seed=1)
+
+def test_lru_evicts_by_size():
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", "text/plain", b"1234")
+    cache.put("b", "text/plain", b"1234")
+    assert cache.get("a") == ("text/plain", b"1234")
+    cache.put("c", "text/plain", b"1234")
+    # b was used least recently.
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.nbytes == 8
+    cache.put("big", "text/plain", b"x" * 11)
+    assert cache.get("big") is None
+
+def test_disk_tier_is_shared(tmp_path):
+    first = ResultCache(directory=str(tmp_path))
+    first.put("k" * 64, "application/json", b'{"a":\n1}')
+    second = ResultCache(directory=str(tmp_path))
+    assert second.get("k" * 64) == ("application/json", b'{"a":\n1}')
+    assert second.stats["disk_hits"] == 1
+
+def test_disk_tier_is_bounded(tmp_path):
+    # Entries are 111 bytes on disk, so three fit.
+    cache = ResultCache(max_bytes=0, directory=str(tmp_path), max_disk_bytes=350)
+    for i, key in enumerate("abc"):
+        cache.put(key * 64, "text/plain", b"x" * 100)
+        os.utime(cache._path(key * 64), ns=(0, i * 10**9))
+    # Reading a refreshes it, so b is now the least recently used.
+    assert cache.get("a" * 64) is not None
+    cache.put("d" * 64, "text/plain", b"x" * 100)
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None and cache.get("d" * 64) is not None
+    assert cache.stats["disk_evictions"] == 1
+    assert ResultCache(directory=str(tmp_path), max_disk_bytes=120)._disk_bytes <= 120
+
+def test_disk_errors_still_serve(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    cache = ResultCache(directory=str(directory))
+    # A file where the cache directory should be makes every disk write fail, even as root.
+    directory.rmdir()
+    directory.write_bytes(b"")
+    assert cache.get_or_compute("k" * 64, lambda: ("text/plain", b"ok")) == ("text/plain", b"ok", False)
+    assert cache.stats["disk_errors"] == 1
+    assert cache.get("k" * 64) == ("text/plain", b"ok")
+    monkeypatch.setattr(web, "result_cache", cache)
+    response = web.app.test_client().get("/run_simulation?seed=4")
+    assert response.status_code == 200 and response.headers["X-Cache"] == "miss"
+    assert cache.stats["disk_errors"] == 2
+
+def test_disk_write_failure_removes_partial(tmp_path, monkeypatch):
+    cache = ResultCache(directory=str(tmp_path))
+    def full_disk(source, target):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(os, "replace", full_disk)
+    cache.put("k" * 64, "text/plain", b"ok")
+    assert cache.stats["disk_errors"] == 1
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == []
+
+def test_concurrent_requests_coalesce():
+    cache = ResultCache()
+    calls = []
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "text/plain", b"done"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(hit for _, _, hit in results) == [False] + [True] * 5
+    assert all(body == b"done" for _, body, _ in results)
+
+def test_errors_are_not_cached():
+    cache = ResultCache()
+    def fail():
+        raise ValueError("bad params")
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: ("text/plain", b"ok")) == ("text/plain", b"ok", False)
+
+def test_endpoints_cache_seeded_requests(monkeypatch):
+    monkeypatch.setattr(web, "result_cache", ResultCache())
+    client = web.app.test_client()
+    url = "/run_monte_carlo?num_runs=50&workers=1&seed=3"
+    first = client.get(url)
+    again = client.get(url + "&workers=2")
+    assert (first.headers["X-Cache"], again.headers["X-Cache"]) == ("miss", "hit")
+    assert first.data == again.data
+    assert client.get("/run_monte_carlo?num_runs=50&workers=1").headers["X-Cache"] == "bypass"
+    simulation = client.get("/run_simulation?seed=4&format=binary")
+    assert client.get("/run_simulation?seed=4&format=binary").data == simulation.data
+    assert client.get("/run_simulation?seed=4").headers["X-Cache"] == "miss"
+    assert client.get("/run_simulation?seed=4&armor_type=Cardboard").status_code == 400
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from models.results_store import ResultsStore
+
+def _columns(cell, armor, size, start=0):
+    return {
+        'cell': np.full(size, cell, dtype=np.int32),
+        'armor_type': [armor] * size,
+        'replication': np.arange(start, start + size, dtype=np.int32),
+        'blue_kills': np.arange(size, dtype=np.int32) + cell,
+    }
+
+def test_append_and_read(tmp_path):
+    store = ResultsStore(str(tmp_path / 'store'))
+    store.append(_columns(0, 'Basilone', 5), tag=[0, 0])
+    store.append(_columns(1, 'Hathcock', 3), tag=[1, 0])
+    reopened = ResultsStore(str(tmp_path / 'store'))
+    assert len(reopened) == 8
+    assert reopened.tags() == [[0, 0], [1, 0]]
+    data = reopened.read()
+    assert data['armor_type'].tolist() == ['Basilone'] * 5 + ['Hathcock'] * 3
+    assert reopened.read(decode=False)['armor_type'].dtype == np.int16
+    assert isinstance(reopened.read(['blue_kills'])['blue_kills'], np.ndarray)
+    with pytest.raises(ValueError):
+        reopened.append({'cell': [0]})
+
+def test_filtered_read(tmp_path):
+    store = ResultsStore(str(tmp_path / 'store'))
+    for cell, armor in enumerate(['Basilone', 'Hathcock', 'Basilone']):
+        store.append(_columns(cell, armor, 4))
+    assert store.read(['cell'], where={'cell': 1})['cell'].tolist() == [1] * 4
+    assert store.read(['cell'], where={'armor_type': 'Basilone'})['cell'].tolist() == [0] * 4 + [2] * 4
+    assert store.read(['cell'], where={'armor_type': 'Cardboard'})['cell'].size == 0
+    groups = store.groups(['cell'], ['blue_kills'])
+    assert list(groups) == [(0,), (1,), (2,)]
+    assert groups[(2,)]['blue_kills'].tolist() == [2, 3, 4, 5]
+
+def test_trajectories_and_compact(tmp_path):
+    store = ResultsStore(str(tmp_path / 'store'))
+    paths = [np.random.default_rng(i).random((i + 2, 2)) for i in range(6)]
+    store.append(_columns(0, 'Basilone', 3), trajectories=paths[:3], tag=[0, 0])
+    store.append(_columns(1, 'Hathcock', 3), trajectories=paths[3:], tag=[1, 0])
+    before = store.read()
+    store.compact()
+    assert len(store.manifest['chunks']) == 1
+    assert store.tags() == [[0, 0], [1, 0]]
+    for column, values in store.read().items():
+        assert values.tolist() == before[column].tolist()
+    loaded = store.trajectories(where={'cell': 1})
+    assert len(loaded) == 3
+    for expected, path in zip(paths[3:], loaded):
+        np.testing.assert_allclose(path, expected.astype(np.float32))
+    store.append(_columns(2, 'Basilone', 1))
+    assert len(store) == 7
@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+import os
+import yaml
+from models.scenario import Scenario, _filter_probability
+from models.squad_simulation import _draw_threat
+
+yaml_path = os.path.join(os.path.dirname(__file__), "../config/simulation.yaml")
+with open(yaml_path, "r") as f:
+    config = yaml.safe_load(f)
+
+@pytest.fixture
+def scenario():
+    return Scenario({
+        "armor_type": "Chesty Ballistic Insert",
+        "environment": "Pershing’s Ghost",
+        "map_size": 1500
+    })
+
+def test_scenario_tables_match_config(scenario):
+    assert scenario.map_size == 1500
+    assert scenario.terrain_names == list(config['terrain_library'])
+    for i, name in enumerate(scenario.threat_names):
+        assert scenario.velocity_rows[i] == config['threat_library'][name]
+        assert scenario.defeat_rows[i] == config['armor_profiles']['Chesty Ballistic Insert'][name]
+        assert scenario.threat_p[i] == config['threat_probs']['Pershing’s Ghost'][name]
+    assert scenario.soldier_load == pytest.approx(20.6497926 + config['armor_profiles']['Chesty Ballistic Insert']['Mass'])
+
+def test_scenario_closed_forms(scenario):
+    c1, c2, c3 = config['threat_library']['Garnet']
+    beta0, beta1 = config['armor_profiles']['Chesty Ballistic Insert']['Garnet']
+    garnet = scenario.threat_names.index('Garnet')
+    velocity = scenario.projectile_velocity(garnet, 300)
+    assert velocity == pytest.approx(c1 * 300**2 + c2 * 300 + c3)
+    exponent = beta0 + velocity * beta1
+    assert scenario.defeat_probability(garnet, velocity) == pytest.approx(np.exp(exponent) / (1 + np.exp(exponent)))
+
+def test_scenario_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        Scenario({"armor_type": "Cardboard"})
+    with pytest.raises(ValueError):
+        Scenario({"armor_type": "Chesty Ballistic Insert", "environment": "Moon"})
+
+def test_draw_threat_follows_probabilities(scenario):
+    rolls = np.random.default_rng(0).random(50000)
+    counts = np.bincount([_draw_threat(scenario, r) for r in rolls], minlength=len(scenario.threat_names))
+    assert counts / len(rolls) == pytest.approx(scenario.threat_p, abs=0.01)
+    assert all(counts[scenario.threat_p == 0] == 0)
+    assert _draw_threat(scenario, 0.9999999999) < len(scenario.threat_names)
+
+def test_filter_probability():
+    assert _filter_probability(0.75, 0.05) == pytest.approx(0.75, abs=1e-6)
+    assert _filter_probability(0.25, 0.05) == pytest.approx(0.25, abs=1e-6)
+    draws = np.random.default_rng(0).normal(0.5, 0.4, 200000) > np.random.default_rng(1).random(200000)
+    assert _filter_probability(0.5, 0.4) == pytest.approx(draws.mean(), abs=0.005)
+
+def test_defeat_table_interpolation_error(scenario):
+    distances = np.random.default_rng(3).uniform(0, 1000, 2000).tolist() + [0.0, 1000.0]
+    worst = 0
+    for threat in range(len(scenario.threat_names)):
+        for distance in distances:
+            exact = scenario.defeat_probability(threat, scenario.projectile_velocity(threat, distance))
+            worst = max(worst, abs(scenario.defeat_at_distance(threat, distance) - exact))
+    assert worst < 1e-4
+    threats = np.arange(len(distances)) % len(scenario.threat_names)
+    assert scenario.defeat_at_distances(threats, distances) == pytest.approx(
+        [scenario.defeat_at_distance(t, d) for t, d in zip(threats.tolist(), distances)]
+    )
+
+def test_defeat_off_grid_uses_closed_form(scenario):
+    for distance in [-5.0, 1000.5, 1500.0]:
+        exact = scenario.defeat_probability(0, scenario.projectile_velocity(0, distance))
+        assert scenario.defeat_at_distance(0, distance) == pytest.approx(exact)
+        assert scenario.defeat_at_distances([0], [distance])[0] == pytest.approx(exact)
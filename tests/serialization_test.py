@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+import pytest
+
+from models.serialization import dumps, pack, pack_simulation, unpack
+from models.squad_simulation import make_json_safe, run_simulation
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 20,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War",
+        "map_size": 2000
+    }
+
+def test_dumps_matches_make_json_safe():
+    data = {
+        'removal_time': float('inf'),
+        'history': [[1.5, float('nan')], (2, 3)],
+        'array': np.array([[1.0, np.nan], [np.inf, 4.0]]),
+        'ints': np.arange(3),
+        'scalar': np.float64(2.5),
+        'count': np.int64(7),
+        'flag': np.bool_(True),
+    }
+    assert json.loads(dumps(data)) == make_json_safe(data)
+    assert json.loads(dumps(data))['array'] == [[1.0, None], [None, 4.0]]
+
+def test_pack_round_trip():
+    arrays = {'path': np.arange(10, dtype=float).reshape(5, 2), 'ids': np.arange(3, dtype=np.int16)}
+    data, unpacked = unpack(pack({'stock': 3, 'removal_time': float('inf')}, arrays))
+    assert data == {'stock': 3, 'removal_time': None}
+    assert unpacked['path'].dtype == np.float32
+    np.testing.assert_array_equal(unpacked['path'], arrays['path'])
+    np.testing.assert_array_equal(unpacked['ids'], arrays['ids'])
+    with pytest.raises(ValueError):
+        unpack(b'JSON' + bytes(8))
+
+def test_pack_simulation(default_params):
+    result = run_simulation(default_params, full_log=True, rng=3)
+    data, arrays = unpack(pack_simulation(result))
+    blue = result['blue']
+    np.testing.assert_allclose(arrays['blue.position_history'], blue['position_history'], rtol=1e-6)
+    exhaustion = arrays['blue.exhaustion_data']
+    assert len(exhaustion) == len(blue['exhaustion_data']) - 1
+    for row, expected in zip(exhaustion, blue['exhaustion_data'][1:], strict=True):
+        np.testing.assert_allclose(row[~np.isnan(row)], expected, rtol=1e-6)
+    assert 'position_history' not in data['blue']
+    assert data['blue']['stock'] == blue['stock']
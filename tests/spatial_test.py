@@ -0,0 +1,35 @@
+import math
+
+import numpy as np
+
+from models.spatial import UniformGrid
+
+
+def test_query_covers_every_point_in_range():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 10000, (500, 2))
+    grid = UniformGrid(1000)
+    for key, (x, y) in enumerate(points):
+        grid.insert(key, x, y)
+    for x, y in rng.uniform(0, 10000, (50, 2)):
+        near = {key for key, point in enumerate(points) if math.dist((x, y), point) <= 1000}
+        assert near <= set(grid.query(x, y))
+        assert len(grid.query(x, y)) < len(points)
+
+def test_nearest_matches_brute_force_after_moves():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 6000, (40, 2))
+    grid = UniformGrid(1000)
+    for key, (x, y) in enumerate(points):
+        grid.insert(key, x, y)
+    points[::3] = rng.uniform(0, 6000, (len(points[::3]), 2))
+    for key in range(0, len(points), 3):
+        grid.move(key, *points[key])
+    grid.remove(5)
+    live = [key for key in range(len(points)) if key != 5]
+    for x, y in rng.uniform(-500, 6500, (100, 2)):
+        key, distance = grid.nearest(x, y, points)
+        expected = min(live, key=lambda k: math.dist((x, y), points[k]))
+        assert distance == math.dist((x, y), points[expected])
+    assert len(grid) == len(points) - 1
+    assert UniformGrid(1000).nearest(0, 0, points) == (None, math.inf)
@@ -1,5 +1,7 @@
 import pytest
-from models.squad_simulation import run_simulation
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from models.squad_simulation import run_simulation, _attack, _attack_binomial
 
 @pytest.fixture
 def default_params():
@@ -32,4 +34,94 @@ def test_run_simulation_handles_minimal_params():
         "environment": "Krulak’s Three Block War"
     }
     result = run_simulation(params, full_log=False)
-    assert isinstance(result, dict)
\ No newline at end of file
+    assert isinstance(result, dict)
+
+def _engagement_samples(attack, blue_stock, red_stock, env, armor, distance, runs):
+    from models.blue_patrol import Patrol
+    blue_patrol = Patrol({'armor_type': armor, 'blue_stock': blue_stock}, full_log=False)
+    blue, red = [], []
+    for _ in range(runs):
+        result = attack(blue_patrol, {'stock': red_stock}, env, armor, distance)
+        blue.append(result['blue_casualites'])
+        red.append(result['red_casualites'])
+    return np.array(blue), np.array(red)
+
+@pytest.mark.parametrize("env", ["Krulak’s Three Block War", "Pershing’s Ghost", "Nightmare from Mattis Street"])
+def test_binomial_resolver_matches_per_shot(env):
+    armor = "Hathcock Ballistic Insert"
+    per_shot_rng = np.random.default_rng(4)
+    per_shot = _engagement_samples(lambda *args: _attack(*args, rng=per_shot_rng), 10, 25, env, armor, 150, 1500)
+    rng = np.random.default_rng(5)
+    binomial = _engagement_samples(lambda *args: _attack_binomial(*args, rng=rng), 10, 25, env, armor, 150, 1500)
+    for old, new in zip(per_shot, binomial):
+        standard_error = np.sqrt(old.var() / len(old) + new.var() / len(new)) + 1e-9
+        assert abs(old.mean() - new.mean()) < 5 * standard_error
+        assert new.var() == pytest.approx(old.var(), rel=0.25, abs=0.05)
+
+def test_run_simulation_binomial_resolver(default_params):
+    result = run_simulation(default_params, full_log=False, resolver='binomial')
+    assert isinstance(result, dict)
+    with pytest.raises(ValueError):
+        run_simulation(default_params, resolver='volley')
+
+def test_run_simulation_is_reproducible(default_params):
+    first = run_simulation(default_params, full_log=True, rng=42)
+    second = run_simulation(default_params, full_log=True, rng=np.random.SeedSequence(42))
+    assert first == second
+    assert run_simulation(default_params, full_log=True, rng=43) != first
+
+def test_run_simulation_common_random_numbers(default_params):
+    # Same seed, different armor: spawns and the first minute of movement are identical.
+    light = run_simulation(default_params, full_log=True, rng=9)
+    default_params['armor_type'] = 'Hathcock Ballistic Insert'
+    heavy = run_simulation(default_params, full_log=True, rng=9)
+    assert light['red_patrols'][-1]['current_position'] == heavy['red_patrols'][-1]['current_position']
+    assert light['blue']['position_history'][:2] == heavy['blue']['position_history'][:2]
+
+def test_skip_idle_matches_minute_by_minute(default_params):
+    default_params['map_size'] = 5000
+    for seed in range(40):
+        minute = run_simulation(default_params, full_log=False, rng=seed)
+        skipped = run_simulation(default_params, full_log=False, rng=seed, skip_idle=True)
+        for key in ['patrol_time', 'stock', 'hostiles_killed', 'removal_time']:
+            assert skipped['blue'][key] == minute['blue'][key]
+        for key in ['patrol_distance', 'exhaustion']:
+            assert skipped['blue'][key] == pytest.approx(minute['blue'][key], rel=1e-9)
+        assert skipped['blue']['current_position'] == pytest.approx(minute['blue']['current_position'])
+    with pytest.raises(ValueError):
+        run_simulation(default_params, full_log=True, skip_idle=True)
+
+def test_multiple_moving_red_patrols(default_params):
+    default_params.update(map_size=8000, red_patrols=12, red_speed=40, red_stock=2)
+    for seed in range(10):
+        minute = run_simulation(default_params, full_log=False, rng=seed)
+        skipped = run_simulation(default_params, full_log=False, rng=seed, skip_idle=True)
+        assert len(minute['red_patrols']) >= 12
+        assert sum(patrol['removal_time'] is None for patrol in minute['red_patrols']) == 12
+        assert minute['red'] == minute['red_patrols'][0]
+        for patrol in minute['red_patrols']:
+            assert all(0 <= v <= 8000 for v in patrol['current_position'])
+        for key in ['patrol_time', 'stock', 'hostiles_killed']:
+            assert skipped['blue'][key] == minute['blue'][key]
+        assert skipped['blue']['current_position'] == pytest.approx(minute['blue']['current_position'])
+        np.testing.assert_allclose([p['current_position'] for p in skipped['red_patrols']],
+                                   [p['current_position'] for p in minute['red_patrols']])
+    with pytest.raises(ValueError):
+        run_simulation(dict(default_params, red_patrols=0))
+
+def test_concurrent_runs_keep_their_own_map(default_params):
+    # Small and large maps side by side in threads; each run must stay on its own map and match a serial run.
+    jobs = [(dict(default_params, map_size=size, red_speed=20), seed)
+            for seed in range(12) for size in (300, 8000)]
+    def run(job):
+        params, seed = job
+        return run_simulation(params, full_log=True, rng=seed)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(run, jobs))
+    for (params, seed), result in zip(jobs, results):
+        size = params['map_size']
+        path = np.array(result['blue']['position_history'])
+        assert ((path >= 0) & (path <= size)).all()
+        for patrol in result['red_patrols']:
+            assert all(0 <= c <= size for c in patrol['current_position'])
+        assert result == run_simulation(params, full_log=True, rng=seed)
@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+from models.blue_patrol import Patrol
+from models.squad_state import SquadState, exhaustion_thresholds, pandolf_santee, pandolf_santee_terms
+
+def reference_power(mass, load, speed, grade, terrain_factor):
+    # Scalar Pandolf-Santee, as the per-soldier loop used to compute it.
+    downhill_adjustment = 1 if grade < 0 else 0
+    return (
+        1.5 * mass +
+        2.0 * (mass + load) * (load / mass)**2 +
+        terrain_factor * (mass + load) * (1.5 * speed**2 + 0.35 * speed * grade) -
+        downhill_adjustment * terrain_factor * (
+            (grade * speed * (mass + load) / 3.5) -
+            ((mass + load) * (grade + 6)**2 / mass) +
+            (25 - speed**2)
+        )
+    )
+
+@pytest.mark.parametrize("grade", [-4.0, 0.0, 2.5])
+def test_pandolf_santee_matches_scalar(grade):
+    mass = np.array([60.0, 75.0, 92.5])
+    power = pandolf_santee(mass, 28.9, 70.0, grade, 1.5)
+    for m, p in zip(mass, power):
+        assert p == pytest.approx(reference_power(m, 28.9, 70.0, grade, 1.5))
+
+def test_remove_marks_first_living_soldiers():
+    squad = SquadState([70, 80, 90, 100], 25)
+    squad.remove(2, 5)
+    assert squad.count == 2
+    assert [r['soldier'] for r in squad.records()] == [90, 100]
+    assert [r['removal_time'] for r in squad.records(alive=False)] == [5, 5]
+    squad.remove(10, 6)
+    assert squad.count == 0
+    assert len(squad.records(alive=False)) == 4
+
+def test_expend_only_living_soldiers():
+    squad = SquadState([70, 80, 90], 25)
+    squad.remove(1, 1)
+    levels = squad.expend(60.0, 1.0, 1.2, 10, 500.0)
+    assert len(levels) == 2
+    assert squad.joules[0] == 0
+    assert squad.joules[1] == pytest.approx(reference_power(80, 25, 60.0, 1.0, 1.2) * 60)
+    assert squad.exhaustion[1] == pytest.approx(squad.joules[1] * 60 / 10 / 4184 / 500.0)
+
+def test_records_round_trip():
+    squad = SquadState([70, 80], 25)
+    squad.expend(60.0, 1.0, 1.2, 1, 500.0)
+    copy = SquadState.from_records(squad.records())
+    assert copy.records() == squad.records()
+
+def test_pandolf_santee_terms_decomposition():
+    rng = np.random.default_rng(1)
+    squad = SquadState(rng.normal(76, 11, 8), 30.0)
+    for grade in [-4.0, 0.0, 2.5]:
+        x1, x2, x3 = pandolf_santee_terms(1.1, grade, 1.5)
+        total = squad.mass + squad.load
+        base = 1.5 * squad.mass + 2.0 * total * (squad.load / squad.mass)**2
+        expected = pandolf_santee(squad.mass, squad.load, 1.1, grade, 1.5)
+        np.testing.assert_allclose(base + total * x1 + total / squad.mass * x2 + x3, expected)
+
+def test_expend_terms_matches_expend():
+    rng = np.random.default_rng(2)
+    mass = rng.normal(76, 11, 6)
+    stepwise, summed = SquadState(mass, 25.0), SquadState(mass, 25.0)
+    sums = np.zeros(3)
+    for minute in range(1, 11):
+        speed, grade, terrain = rng.uniform(0.5, 1.4), rng.normal(0, 3), rng.choice([1.0, 1.2, 2.1])
+        threshold = 715.0154 * (minute / 60) ** -0.3869002
+        levels = stepwise.expend(speed, grade, terrain, minute, threshold)
+        sums += pandolf_santee_terms(speed, grade, terrain)
+    np.testing.assert_allclose(summed.expend_terms(10, *sums, 10, threshold), levels)
+    np.testing.assert_allclose(summed.joules, stepwise.joules)
+
+def test_incremental_exhaustion_matches_full_evaluation():
+    # Regression: cached per soldier factors, the threshold table and the reused mean row must give
+    # bit for bit what pandolf_santee and np.mean of [threshold, *levels] gave every minute.
+    rng = np.random.default_rng(5)
+    mass = rng.normal(76.6571, 11.06765, 12)
+    squad = SquadState(mass, 31.2)
+    joules = np.zeros(12)
+    alive = np.ones(12, dtype=bool)
+    thresholds = exhaustion_thresholds(480)
+    for minute in range(1, 481):
+        speed, grade, terrain = rng.uniform(0.3, 1.4), rng.normal(0, 3), rng.choice([1.0, 1.1, 1.5, 2.1])
+        threshold = 715.0154 * (minute / 60) ** -0.3869002
+        assert thresholds[minute] == threshold
+        if minute % 97 == 0:
+            squad.remove(2, minute)
+            alive[np.flatnonzero(alive)[:2]] = False
+        joules[alive] += pandolf_santee(mass[alive], squad.load[alive], speed, grade, terrain) * 60
+        expected = (joules[alive] * 60 / minute / 4184) / threshold
+        levels = squad.expend(speed, grade, terrain, minute, threshold)
+        assert levels.tolist() == expected.tolist()
+        assert squad.mean_exhaustion(threshold, levels) == float(np.mean([threshold] + expected.tolist()))
+    assert squad.joules.tolist() == joules.tolist()
+
+def test_patrol_threshold_table_matches_formula():
+    patrol = Patrol({"blue_stock": 4, "armor_type": "Basilone Ballistic Insert"}, rng=1)
+    for patrol_time in [1, 2, 59, 60, 479, 480, 481, 1000, 90.5]:
+        patrol.patrol_time = patrol_time
+        assert patrol.get_exhaustion_threshold() == 715.0154 * (patrol_time / 60) ** -0.3869002
+        patrol.squad_exhaustion = patrol.get_exhaustion_threshold()
+        assert patrol.is_exhausted()
+        patrol.squad_exhaustion = np.nextafter(patrol.squad_exhaustion, 0)
+        assert not patrol.is_exhausted()
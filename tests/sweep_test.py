@@ -0,0 +1,76 @@
+import json
+
+import pytest
+import app as web
+from models.monte_carlo import run_monte_carlo, summarize_run
+from models.sweep import expand_grid, run_sweep, stream_sweep, table_columns
+
+def test_expand_grid_defaults():
+    cells = expand_grid({'blue_stock': [8, 12]})
+    assert len(cells) == 3 * 3 * 2
+    assert cells[0]['blue_stock'] == 8 and cells[1]['blue_stock'] == 12
+    assert all(cell['red_stock'] == 10 for cell in cells)
+    with pytest.raises(ValueError):
+        expand_grid({'armor_type': ['Cardboard']})
+    with pytest.raises(ValueError):
+        expand_grid({'weather': ['rain']})
+    with pytest.raises(ValueError):
+        expand_grid({'direction_deviation': [5, 7.5]})
+    assert expand_grid({'direction_deviation': 8.0})[0]['direction_deviation'] == 8
+
+def test_sweep_cell_matches_monte_carlo():
+    grid = {'armor_type': ['Hathcock Ballistic Insert'], 'environment': ['Pershing’s Ghost'], 'red_stock': [5, 15]}
+    sweep = run_sweep(grid, 30, seed=4, max_workers=1, chunk_size=10)
+    assert len(sweep['rows']) == 60
+    for index, cell in enumerate(sweep['cells']):
+        expected = run_monte_carlo(cell, 30, seed=4, max_workers=1, chunk_size=10, raw=True)['results']
+        rows = [row for row in sweep['rows'] if row['cell'] == index]
+        assert [row['replication'] for row in rows] == list(range(30))
+        for row, result in zip(rows, expected):
+            assert {key: row[key] for key in summarize_run(result)} == summarize_run(result)
+
+def test_sweep_resume(tmp_path):
+    grid = {'armor_type': ['Basilone Ballistic Insert'], 'environment': ['Krulak’s Three Block War'],
+            'direction_deviation': [5, 20]}
+    out_dir = str(tmp_path / 'sweep')
+    complete = run_sweep(grid, 40, seed=2, max_workers=1, chunk_size=10)['rows']
+
+    def interrupt(done, total):
+        if done == 3:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(grid, 40, out_dir=out_dir, seed=2, max_workers=1, chunk_size=10, on_unit=interrupt)
+
+    resumed = run_sweep(grid, 40, out_dir=out_dir, seed=2, max_workers=2, chunk_size=10)
+    assert (resumed['units_run'], resumed['units_skipped']) == (5, 3)
+    table = resumed['store'].read()
+    assert list(table) == table_columns
+    assert [dict(zip(table, values)) for values in zip(*(column.tolist() for column in table.values()))] == complete
+
+    with pytest.raises(ValueError):
+        run_sweep(grid, 40, out_dir=out_dir, seed=3, max_workers=1, chunk_size=10)
+
+def test_stream_sweep_matches_monte_carlo():
+    cells = expand_grid({'environment': ['Pershing’s Ghost'], 'red_stock': [5]})
+    updates = [(cell, aggregate.count) for cell, aggregate in stream_sweep(cells, 25, 4, max_workers=1, chunk_size=10)]
+    # Round robin: every cell's first chunk before any second chunk.
+    assert updates[:3] == [(0, 10), (1, 10), (2, 10)]
+    assert len(updates) == 3 * 3
+    finals = {}
+    for cell, aggregate in stream_sweep(cells, 25, 4, max_workers=2, chunk_size=10):
+        finals[cell] = aggregate.to_dict()
+    for index, cell in enumerate(cells):
+        expected = run_monte_carlo(cell, 25, seed=4, max_workers=1, chunk_size=10)['aggregate'].to_dict()
+        assert finals[index] == expected
+
+def test_stream_sweep_endpoint():
+    client = web.app.test_client()
+    response = client.get('/stream_sweep?num_runs=20&chunk_size=10&workers=1&seed=2'
+                          '&armor_type=Hathcock Ballistic Insert&environment=Pershing’s Ghost')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+    assert [line['type'] for line in lines] == ['start', 'progress', 'progress', 'end']
+    assert lines[0]['cells'] == [{'armor_type': 'Hathcock Ballistic Insert', 'environment': 'Pershing’s Ghost'}]
+    assert lines[2]['aggregates']['count'] == 20
+    assert sum(lines[2]['aggregates']['histograms']['red_kills']['counts']) <= 20
+    assert client.get('/stream_sweep?armor_type=Cardboard').status_code == 400
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from models.squad_simulation import run_simulation
+from models.trace import DEBUG, INFO, JsonlSink, RingBufferSink, Tracer, null_tracer
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 20,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War",
+        "map_size": 1000
+    }
+
+def test_import_does_not_configure_logging():
+    # Fresh interpreter, since pytest installs its own root handlers.
+    code = "import logging, models.squad_simulation; print(len(logging.getLogger().handlers))"
+    root = os.path.join(os.path.dirname(__file__), "..")
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "0"
+
+def test_null_tracer_is_disabled():
+    assert not null_tracer.enabled(DEBUG)
+    assert not null_tracer.enabled(INFO)
+
+def test_ring_buffer_records_run(default_params):
+    sink = RingBufferSink(capacity=1000)
+    run_simulation(default_params, full_log=False, tracer=Tracer(sink, level=INFO))
+    events = [event['event'] for event in sink.events]
+    assert events[0] == 'start'
+    assert events[-1] == 'end'
+    assert all(event['level'] == 'INFO' for event in sink.events)
+
+def test_ring_buffer_is_bounded(default_params):
+    sink = RingBufferSink(capacity=5)
+    run_simulation(default_params, full_log=False, tracer=Tracer(sink, level=DEBUG))
+    assert len(sink.events) == 5
+    assert sink.events[-1]['event'] == 'end'
+
+def test_jsonl_sink(default_params, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    sink = JsonlSink(str(path))
+    run_simulation(default_params, full_log=False, tracer=Tracer(sink, level=INFO))
+    sink.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0]['event'] == 'start'
+    assert lines[-1]['event'] == 'end'
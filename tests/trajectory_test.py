@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from models.squad_simulation import run_simulation
+from models.trajectory import TrajectoryRecorder
+
+@pytest.fixture
+def default_params():
+    return {
+        "blue_stock": 10,
+        "red_stock": 10,
+        "direction_deviation": 10,
+        "armor_type": "Basilone Ballistic Insert",
+        "environment": "Krulak’s Three Block War",
+        "map_size": 2000
+    }
+
+def test_recorder_decimation():
+    recorder = TrajectoryRecorder(4, 2, every=3, events=('engagement',))
+    recorder.start([0, 0], 0, [0.0, 0.0])
+    for step in range(1, 11):
+        recorder.step([step, step], 1)
+        recorder.set_exhaustion(100.0 + step, np.array([step, step]), np.array([True, True]))
+        if step == 5:
+            recorder.mark('engagement')
+    # Spawn, every third step, the engagement at step 5 and the latest step.
+    assert [p[0] for p in recorder.position_list()] == [0, 3, 5, 6, 9, 10]
+    assert [row[0] for row in recorder.exhaustion_list()[1:]] == [103, 105, 106, 109, 110]
+    assert recorder.exhaustion_list()[0] == [0.0, 0.0]
+    with pytest.raises(ValueError):
+        TrajectoryRecorder(4, 2, events=('weather',))
+
+def test_recorder_drops_removed_soldiers():
+    recorder = TrajectoryRecorder(2, 3)
+    recorder.start([0, 0], 0, [0.0] * 3)
+    recorder.step([1, 1], 0)
+    recorder.set_exhaustion(50.0, np.array([1.0, 2.0, 3.0]), np.array([True, True, True]))
+    recorder.step([2, 2], 0)
+    recorder.set_exhaustion(40.0, np.array([2.0, 4.0]), np.array([False, True, True]))
+    assert recorder.exhaustion_list() == [[0.0] * 3, [50.0, 1.0, 2.0, 3.0], [40.0, 2.0, 4.0]]
+
+def test_run_simulation_record_every(default_params):
+    full = run_simulation(default_params, full_log=True, rng=3)
+    sparse = run_simulation(default_params, full_log=True, rng=3, record_every=10)
+    positions = full['blue']['position_history']
+    assert sparse['blue']['position_history'][:-1] == positions[:-1:10]
+    assert sparse['blue']['position_history'][-1] == positions[-1]
+    assert sparse['blue']['patrol_distance'] == full['blue']['patrol_distance']
+    assert len(positions) == full['blue']['patrol_time'] + 1